@@ -16,7 +16,7 @@ import hammer_config
 from hammer_logging import HammerVLSILoggingContext
 
 import python_jsonschema_objects  # type: ignore
-from hammer_utils import deeplist, get_or_else, optional_map
+from hammer_utils import deeplist, get_or_else, optional_map, shared_stat_cache
 from hammer_config import load_yaml
 
 builder = python_jsonschema_objects.ObjectBuilder(json.loads(open(os.path.dirname(__file__) + "/schema.json").read()))
@@ -372,6 +372,7 @@ class HammerTechnology:
         """Check that the all directories for a pre-installed technology actually exist.
 
         :return: Return True if the directories is OK, False otherwise."""
+        install_paths = []  # type: List[str]
         for install in self.config.installs:
             base_var = str(install.base_var)
 
@@ -379,11 +380,12 @@ class HammerTechnology:
                 # Blank install_path is okay to reference the current technology directory.
                 pass
             else:
-                install_path = str(self.get_setting(base_var))
-                if not os.path.exists(install_path):
-                    self.logger.error("installs {path} does not exist".format(path=install_path))
-                    return False
-        return True
+                install_paths.append(str(self.get_setting(base_var)))
+        # Check all the installs at once and report every missing one.
+        missing = shared_stat_cache().find_missing(install_paths)
+        for install_path in missing:
+            self.logger.error("installs {path} does not exist".format(path=install_path))
+        return len(missing) == 0
 
     def extract_tarballs(self) -> None:
         """Extract tarballs to the given cache_dir, or verify that they've been extracted."""
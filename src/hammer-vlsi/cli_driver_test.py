@@ -361,6 +361,61 @@ class CLIDriverTest(unittest.TestCase):
         # Cleanup
         shutil.rmtree(syn_rundir)
 
+    def test_hierarchical_overlay(self) -> None:
+        """
+        Test that hierarchical actions only overlay the module config for the duration of the run.
+        """
+
+        class CapturingDriver(CLIDriver):
+            driver = None  # type: Optional[HammerDriver]
+
+            def args_to_driver(self, args: dict, default_options=None):  # type: ignore
+                driver, errors = super().args_to_driver(args, default_options)
+                CapturingDriver.driver = driver
+                return driver, errors
+
+        # Set up some temporary folders for the unit test.
+        obj_dir = tempfile.mkdtemp()
+
+        # Generate a hierarchical config for testing.
+        config_path = os.path.join(obj_dir, "run_config.json")
+        config = self.generate_dummy_config(obj_dir, config_path, "top")
+        config.update({
+            "vlsi.inputs.hierarchical.mode": "hierarchical",
+            "vlsi.inputs.hierarchical.top_module": "top",
+            "vlsi.inputs.hierarchical.config_source": "manual",
+            "vlsi.inputs.hierarchical.manual_modules": [{"top": ["leaf"]}],
+            "vlsi.inputs.hierarchical.manual_placement_constraints": [{"top": [], "leaf": []}]
+        })
+        with open(config_path, "w") as f:
+            f.write(json.dumps(config, indent=4))
+
+        # Check that running the CLIDriver executes successfully (code 0).
+        with self.assertRaises(SystemExit) as cm:  # type: ignore
+            CapturingDriver().main(args=[
+                "syn-leaf",  # action
+                "-p", config_path,
+                "--obj_dir", obj_dir,
+                "--output", os.path.join(obj_dir, "output.json")
+            ])
+        self.assertEqual(cm.exception.code, 0)
+
+        # The module config was used for the run...
+        with open(os.path.join(obj_dir, "syn-leaf", "full_config.json"), "r") as f:
+            full_config = json.loads(f.read())
+        self.assertEqual(full_config["synthesis.inputs.top_module"], "leaf")
+        self.assertEqual(full_config["vlsi.inputs.hierarchical.mode"], "leaf")
+
+        # ...and removed afterwards.
+        driver = CapturingDriver.driver
+        assert driver is not None
+        self.assertEqual(driver.database.overlay, [])
+        self.assertEqual(driver.database.get_setting("synthesis.inputs.top_module"), "top")
+        self.assertEqual(driver.project_config["vlsi.inputs.hierarchical.mode"], "hierarchical")
+
+        # Cleanup
+        shutil.rmtree(obj_dir)
+
     def test_bad_override(self) -> None:
         """Test that a bad override of e.g. synthesis_action is caught."""
         with self.assertRaises(TypeError):
@@ -15,6 +15,11 @@ InterfaceVar = namedtuple("InterfaceVar", 'name type desc')
 
 Interface = namedtuple("Interface", 'module inputs outputs')
 
+# Setting (key) which is parsed into a typed value by converter (or each element by converter, if is_list).
+TypedSetting = namedtuple("TypedSetting", 'name key type converter is_list desc')
+
+TypedSettings = namedtuple("TypedSettings", 'module settings')
+
 def isinstance_check(t: str) -> str:
     return "isinstance(value, {t})".format(t=t)
 
@@ -71,6 +76,21 @@ def {var_name}(self, value: {var_type}) -> None:
     output.extend(generate_from_list(template, interface.outputs))
     return output
 
+def generate_typed_settings(typed_settings: TypedSettings):
+    template = """
+def {name}(self) -> {type}:
+    \"""
+    Get the {desc}, as specified in {key}.
+    The parsed value is cached until the database changes.
+    \"""
+    return self.get_typed_setting("{key}", {converter}, is_list={is_list})
+"""
+
+    output = []
+    output.append("### Generated typed settings %s ###" % (typed_settings.module))
+    output.extend(map(lambda setting: template.format(**setting._asdict()), typed_settings.settings))
+    return output
+
 def main(args):
     HammerSynthesisTool = Interface(module="HammerSynthesisTool",
         inputs=[
@@ -100,10 +120,27 @@ def main(args):
         ]
     )
 
+    HammerTool = TypedSettings(module="HammerTool",
+        settings=[
+            TypedSetting("get_clock_ports", "vlsi.inputs.clocks", "List[ClockPort]", "ClockPort.from_setting", True,
+                         "clock ports of the top-level module"),
+            TypedSetting("get_placement_constraints", "vlsi.inputs.placement_constraints", "List[PlacementConstraint]",
+                         "PlacementConstraint.from_dict", True, "list of placement constraints"),
+            TypedSetting("get_mmmc_corners", "vlsi.inputs.mmmc_corners", "List[MMMCCorner]", "MMMCCorner.from_setting",
+                         True, "list of MMMC corners"),
+            TypedSetting("get_input_ilms", "vlsi.inputs.ilms", "List[ILMStruct]", "ILMStruct.from_setting", True,
+                         "list of input ILM modules for hierarchical mode"),
+            TypedSetting("get_output_load_constraints", "vlsi.inputs.output_loads", "List[OutputLoadConstraint]",
+                         "OutputLoadConstraint.from_setting", True, "list of output load constraints")
+        ]
+    )
+
     output = []
     output.extend(generate_interface(HammerSynthesisTool))
     output.append("")
     output.extend(generate_interface(HammerPlaceAndRouteTool))
+    output.append("")
+    output.extend(generate_typed_settings(HammerTool))
     print("\n".join(output))
  
     return 0
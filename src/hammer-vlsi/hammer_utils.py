@@ -6,13 +6,20 @@
 #
 #  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
 
+from concurrent.futures import ThreadPoolExecutor
 import copy
 from functools import reduce
 import inspect
-from typing import List, Any, Set, Dict, Tuple, TypeVar, Callable, Iterable, Optional
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import List, Any, Set, Dict, Tuple, TypeVar, Callable, Hashable, Iterable, Optional
 
 __all__ = ['deepdict', 'deeplist', 'add_lists', 'add_dicts', 'reverse_dict', 'in_place_unique', 'topological_sort',
-           'reduce_named', 'get_or_else', 'optional_map', 'check_function_type']
+           'critical_path', 'reduce_named', 'get_or_else', 'optional_map', 'check_function_type', 'cacheable_function',
+           'function_cache_key', 'write_file_atomically', 'CacheStatistics', 'StatCache', 'shared_stat_cache']
 
 
 def deepdict(x: dict) -> dict:
@@ -136,6 +143,36 @@ def topological_sort(graph: Dict[str, Tuple[List[str], List[str]]], starting_nod
     return output
 
 
+def critical_path(order: List[str], dependencies: Dict[str, List[str]],
+                  durations: Dict[str, float]) -> Tuple[float, List[str]]:
+    """
+    Find the longest (critical) path through a dependency graph, i.e. the shortest possible time to run every node
+    with unlimited parallelism.
+
+    :param order: Nodes in a valid topological order (dependencies before dependents).
+    :param dependencies: Dictionary of each node to the nodes it depends on.
+    :param durations: Dictionary of each node to its duration. Missing nodes take no time.
+    :return: Tuple of (length of the critical path, nodes on the critical path in order).
+    """
+    # finish[node] = (earliest finish time of node, previous node on its longest path)
+    finish = {}  # type: Dict[str, Tuple[float, Optional[str]]]
+    for node in order:
+        start, prev = 0.0, None  # type: Tuple[float, Optional[str]]
+        for dependency in dependencies.get(node, []):
+            if finish[dependency][0] > start:
+                start, prev = finish[dependency][0], dependency
+        finish[node] = (start + durations.get(node, 0.0), prev)
+    if len(finish) == 0:
+        return 0.0, []
+    last = max(order, key=lambda node: finish[node][0])  # type: Optional[str]
+    length = finish[last][0]  # type: ignore
+    path = []  # type: List[str]
+    while last is not None:
+        path.insert(0, last)
+        last = finish[last][1]
+    return length, path
+
+
 def reduce_named(function: Callable, sequence: Iterable, initial: Any = None) -> Any:
     """
     Version of functools.reduce with named arguments.
@@ -285,3 +322,262 @@ def check_function_type(function: Callable, args: List[type], return_type: type)
         return_type_name = get_name_from_type(return_type)
         raise TypeError(msg("Got return type {got}, expected {expected}".format(got=inspected_return_name,
                                                                                 expected=return_type_name)))
+
+
+def cacheable_function(func: _T) -> _T:
+    """
+    Mark the given function as safe to cache results derived from (see function_cache_key).
+    Only mark functions whose results depend on nothing but their arguments, the values they close over and (for
+    methods) the identity of their object, since the key ignores the globals of the function and changes to mutable
+    state which it can reach.
+    Builtins and bound methods cannot be marked (mark the function of a method instead).
+
+    :param func: Function to mark.
+    :return: The same function.
+    """
+    try:
+        setattr(func, "hammer_cacheable", True)
+    except AttributeError:
+        pass
+    return func
+
+
+def function_cache_key(func: Callable) -> Optional[Hashable]:
+    """
+    Get a key which identifies what the given function computes, for caching results derived from it.
+    Functions are identified by their code and the values they close over (so closures created by the same code over
+    equal values get equal keys), and bound methods by their function and object.
+    Only functions marked with cacheable_function are identified.
+
+    :param func: Function to identify.
+    :return: The key, or None if the function is not marked as cacheable or cannot be identified (e.g. it closes over
+             unhashable values).
+    """
+    if not getattr(func, "hammer_cacheable", False):
+        return None
+    if inspect.ismethod(func):
+        function_key = function_cache_key(func.__func__)  # type: ignore
+        key = None if function_key is None else (function_key, func.__self__)  # type: Optional[Hashable]
+    elif hasattr(func, "__code__"):
+        try:
+            cells = tuple(cell.cell_contents for cell in (func.__closure__ or ()))  # type: ignore
+        except ValueError:
+            # Empty cell (e.g. a variable which is not assigned yet).
+            return None
+        kwdefaults = tuple(sorted((func.__kwdefaults__ or {}).items()))  # type: ignore
+        key = (func.__code__, cells, func.__defaults__, kwdefaults)  # type: ignore
+    else:
+        key = func
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def write_file_atomically(path: str, contents: bytes) -> None:
+    """
+    Write the given contents to the given path by writing a temporary file in the same folder and renaming it over
+    the destination, so that concurrent readers see either the old file or the new one but never a partial file.
+
+    :param path: Path to write to.
+    :param contents: Contents of the file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                     prefix="." + os.path.basename(path) + ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp creates the file as private to the user; use the usual permissions instead.
+            os.chmod(temp_path, 0o644)
+            f.write(contents)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CacheStatistics:
+    """
+    Hit/miss counters for a cache.
+    Use record_hit()/record_miss() for caches which may be used from several threads.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0  # type: int
+        self.misses = 0  # type: int
+        self._lock = threading.Lock()
+
+    def record_hit(self) -> None:
+        """Count a hit (thread-safe)."""
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        """Count a miss (thread-safe)."""
+        with self._lock:
+            self.misses += 1
+
+    @property
+    def lookups(self) -> int:
+        """Total number of lookups."""
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups which were hits (0 if there were no lookups)."""
+        return 0.0 if self.lookups == 0 else self.hits / self.lookups
+
+    def reset(self) -> None:
+        """Reset all the counters to zero."""
+        self.hits = 0
+        self.misses = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def __str__(self) -> str:
+        return "{hits} hits, {misses} misses ({rate:.1%} hit rate)".format(hits=self.hits, misses=self.misses,
+                                                                          rate=self.hit_rate)
+
+
+class StatCache:
+    """
+    Cache of file system lookups (os.stat) for checking that many paths exist, e.g. library files on a network file
+    system where each lookup is slow.
+    Only paths which exist are cached, so a path created after a failed lookup is found by the next lookup.
+    Results expire after ttl seconds; call invalidate() after removing or replacing paths.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_workers: int = 16) -> None:
+        """
+        :param ttl: Number of seconds for which lookups are cached.
+        :param max_workers: Maximum number of threads used to look up batches of paths (see prefetch()).
+        """
+        self.ttl = ttl  # type: float
+        self.max_workers = max_workers  # type: int
+        self.stats = CacheStatistics()
+        self._entries = {}  # type: Dict[str, Tuple[float, os.stat_result]]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stat(path: str) -> Optional[os.stat_result]:
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def _get(self, path: str) -> Tuple[bool, Optional[os.stat_result]]:
+        """Get the cached lookup of the given path as (found, result)."""
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return False, None
+        return True, entry[1]
+
+    def _put(self, path: str, result: Optional[os.stat_result]) -> None:
+        with self._lock:
+            if result is None:
+                self._entries.pop(path, None)
+            else:
+                self._entries[path] = (time.monotonic(), result)
+
+    def stat(self, path: str) -> Optional[os.stat_result]:
+        """
+        Look up the given path.
+
+        :return: The os.stat() result, or None if the path does not exist.
+        """
+        found, result = self._get(path)
+        if found:
+            self.stats.record_hit()
+            return result
+        self.stats.record_miss()
+        result = self._stat(path)
+        self._put(path, result)
+        return result
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        """
+        Look up all the given paths which are not cached yet, in parallel.
+
+        :param paths: Paths to look up.
+        """
+        self._lookup_all(paths)
+
+    def _lookup_all(self, paths: Iterable[str]) -> Dict[str, Optional[os.stat_result]]:
+        """
+        Look up all the given paths, looking up the ones which are not cached in parallel.
+
+        :return: Dictionary of each path to its os.stat() result, or None if it does not exist.
+        """
+        results = {}  # type: Dict[str, Optional[os.stat_result]]
+        uncached = []  # type: List[str]
+        for path in set(paths):
+            found, result = self._get(path)
+            if found:
+                results[path] = result
+            else:
+                uncached.append(path)
+        if len(uncached) <= 1 or self.max_workers <= 1:
+            looked_up = list(map(self._stat, uncached))
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(uncached))) as executor:
+                looked_up = list(executor.map(self._stat, uncached))
+        for path, result in zip(uncached, looked_up):
+            self._put(path, result)
+            results[path] = result
+        return results
+
+    def exists(self, path: str) -> bool:
+        return self.stat(path) is not None
+
+    def isfile(self, path: str) -> bool:
+        result = self.stat(path)
+        return result is not None and stat.S_ISREG(result.st_mode)
+
+    def isdir(self, path: str) -> bool:
+        result = self.stat(path)
+        return result is not None and stat.S_ISDIR(result.st_mode)
+
+    def find_missing(self, paths: Iterable[str], kind: str = "exists") -> List[str]:
+        """
+        Find the paths which do not exist (or are not of the given kind), looking up the paths in parallel.
+
+        :param paths: Paths to check.
+        :param kind: "file" (regular files), "dir" (directories) or "exists" (anything).
+        :return: Paths which failed the check, in the given order.
+        """
+        checks = {
+            "file": stat.S_ISREG,
+            "dir": stat.S_ISDIR,
+            "exists": lambda mode: True
+        }  # type: Dict[str, Callable[[int], bool]]
+        if kind not in checks:
+            raise ValueError("Unknown kind of path {kind}".format(kind=kind))
+        paths = list(paths)
+        # Use the results directly, since missing paths are not cached.
+        results = self._lookup_all(paths)
+        return [path for path in paths if results[path] is None or not checks[kind](results[path].st_mode)]
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Forget the cached lookups.
+
+        :param path: Path to forget, or None to forget all paths.
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+_shared_stat_cache = StatCache()
+
+
+def shared_stat_cache() -> StatCache:
+    """Get the StatCache shared by hammer-vlsi and the technology (e.g. for library and install paths)."""
+    return _shared_stat_cache
@@ -14,6 +14,18 @@ from .hooks import *
 
 from .hammer_vlsi_impl import *
 
+from .library_index import *
+
+from .subprocess_executor import *
+
+from .slot_manager import *
+
+from .step_manifest import *
+
+from .step_metrics import *
+
+from .tcl_writer import *
+
 from .hammer_tool import *
 
 from .constraints import *
@@ -19,7 +19,7 @@ from .driver import HammerDriver, HammerDriverOptions
 
 from typing import List, Dict, Tuple, Any, Callable, Optional
 
-from hammer_utils import add_dicts, deeplist, deepdict, get_or_else, check_function_type
+from hammer_utils import add_dicts, deepdict, get_or_else, check_function_type
 
 
 def parse_optional_file_list_from_args(args_list: Any, append_error_func: Callable[[str], None]) -> List[str]:
@@ -469,7 +469,16 @@ class CLIDriver:
         to_step = get_nonempty_str(args['to_step'])
         only_step = get_nonempty_str(args['only_step'])
 
-        driver = HammerDriver(options, config)
+        # Incremental mode: skip up-to-date steps.
+        # (optional)
+        if args.get('incremental', False):
+            config['vlsi.core.incremental_steps'] = True
+
+        # Config database profile report.
+        # (optional)
+        config_profile = get_nonempty_str(args.get('config_profile'))
+
+        driver = HammerDriver(options, config, config_profile_path=config_profile)
         if from_step is not None or to_step is not None:
             driver.set_post_custom_syn_tool_hooks(HammerTool.make_from_to_hooks(from_step, to_step))
             driver.set_post_custom_par_tool_hooks(HammerTool.make_from_to_hooks(from_step, to_step))
@@ -489,23 +498,16 @@ class CLIDriver:
                 # Create a new context (this def) per module, otherwise when these higher-order funcs run they'll all
                 # use the last iteration of the loop.
 
-                # TODO(edwardw): this is a bit of a hack.
-                # Should really add an API to allow a run to have a bit of temporary project config
-                base_project_config = [[]]  # type: List[List[dict]]
-
+                # The module config is overlaid on the project config for the duration of the run.
                 def syn_pre_func(d: HammerDriver) -> None:
                     self.syn_rundir = os.path.join(d.obj_dir, "syn-{module}".format(
                         module=module))  # TODO(edwardw): fix this ugly os.path.join; it doesn't belong here.
-                    # TODO(edwardw): remove ugly hack to store stuff in parent context
-                    base_project_config[0] = deeplist(driver.project_configs)
-                    d.update_project_configs(deeplist(base_project_config[0]) + [config])
+                    d.push_project_overlay(config)
 
                 def par_pre_func(d: HammerDriver) -> None:
                     self.par_rundir = os.path.join(d.obj_dir, "par-{module}".format(
                         module=module))  # TODO(edwardw): fix this ugly os.path.join; it doesn't belong here.
-                    # TODO(edwardw): remove ugly hack to store stuff in parent context
-                    base_project_config[0] = deeplist(driver.project_configs)
-                    d.update_project_configs(deeplist(base_project_config[0]) + [config])
+                    d.push_project_overlay(config)
 
                 def post_run(d: HammerDriver, rundir: str) -> None:
                     # Write out the configs used/generated for logging/debugging.
@@ -516,7 +518,7 @@ class CLIDriver:
                         new_output_json = json.dumps(config, indent=4)
                         f.write(new_output_json)
 
-                    d.update_project_configs(deeplist(base_project_config[0]))
+                    d.pop_project_overlay()
 
                 def syn_post_run(d: HammerDriver) -> None:
                     post_run(d, get_or_else(self.syn_rundir, ""))
@@ -643,6 +645,10 @@ class CLIDriver:
                             help="Run the given action to the given step (inclusive).")
         parser.add_argument("--only_step", dest="only_step", required=False,
                             help="Run only the given step. Not compatible with --from_step or --to_step.")
+        parser.add_argument("--incremental", dest="incremental", action='store_true', required=False,
+                            help="Skip the steps which are up to date since they last ran in the run directory (see vlsi.core.incremental_steps).")
+        parser.add_argument("--config_profile", dest="config_profile", required=False,
+                            help="Profile setting accesses and merges of the hammer database and write a JSON report to the given file at exit.")
         # Required arguments for CLI hammer driver.
         parser.add_argument("-o", "--output", default="output.json", required=False,
                             help='Output JSON file for results and modular use of hammer-vlsi. Default: output.json.')
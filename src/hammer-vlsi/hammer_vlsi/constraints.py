@@ -43,17 +43,36 @@ class ILMStruct(NamedTuple('ILMStruct', [
         )
 
 
-ClockPort = NamedTuple('ClockPort', [
+class ClockPort(NamedTuple('ClockPort', [
     ('name', str),
     ('period', TimeValue),
     ('port', Optional[str]),
     ('uncertainty', Optional[TimeValue])
-])
+])):
+    __slots__ = ()
+
+    @staticmethod
+    def from_setting(clock_port: dict) -> "ClockPort":
+        return ClockPort(
+            name=clock_port["name"],
+            period=TimeValue(clock_port["period"]),
+            port=clock_port.get("port"),
+            uncertainty=TimeValue(clock_port["uncertainty"]) if "uncertainty" in clock_port else None
+        )
+
 
-OutputLoadConstraint = NamedTuple('OutputLoadConstraint', [
+class OutputLoadConstraint(NamedTuple('OutputLoadConstraint', [
     ('name', str),
     ('load', float)
-])
+])):
+    __slots__ = ()
+
+    @staticmethod
+    def from_setting(load_src: dict) -> "OutputLoadConstraint":
+        return OutputLoadConstraint(
+            name=str(load_src["name"]),
+            load=float(load_src["load"])
+        )
 
 
 class ObstructionType(Enum):
@@ -214,9 +233,19 @@ class MMMCCornerType(Enum):
             raise ValueError("Invalid mmmc corner type '{}'".format(s))
 
 
-MMMCCorner = NamedTuple('MMMCCorner', [
+class MMMCCorner(NamedTuple('MMMCCorner', [
     ('name', str),
     ('type', MMMCCornerType),
     ('voltage', VoltageValue),
     ('temp', TemperatureValue),
-])
+])):
+    __slots__ = ()
+
+    @staticmethod
+    def from_setting(corner: dict) -> "MMMCCorner":
+        return MMMCCorner(
+            name=str(corner["name"]),
+            type=MMMCCornerType.from_string(str(corner["type"])),
+            voltage=VoltageValue(str(corner["voltage"])),
+            temp=TemperatureValue(str(corner["temp"])),
+        )
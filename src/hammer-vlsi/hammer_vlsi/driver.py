@@ -48,7 +48,8 @@ class HammerDriver:
             obj_dir=HammerVLSISettings.hammer_vlsi_path
         )
 
-    def __init__(self, options: HammerDriverOptions, extra_project_config: dict = {}) -> None:
+    def __init__(self, options: HammerDriverOptions, extra_project_config: dict = {},
+                 config_profile_path: Optional[str] = None) -> None:
         """
         Create a hammer-vlsi driver, which is a higher level convenience function
         for quickly using hammer-vlsi. It imports and uses the hammer-vlsi blocks.
@@ -57,6 +58,8 @@ class HammerDriver:
 
         :param options: Driver options.
         :param extra_project_config: An extra flattened config for the project. Optional.
+        :param config_profile_path: If given, profile the hammer database and write the report (JSON) to this
+                                    path at exit. Optional.
         """
 
         # Create global logging context.
@@ -66,6 +69,8 @@ class HammerDriver:
 
         # Create a new hammer database.
         self.database = hammer_config.HammerDatabase()  # type: hammer_config.HammerDatabase
+        if config_profile_path is not None:
+            self.database.enable_profiling(config_profile_path)
 
         self.log.info("Loading hammer-vlsi libraries and reading settings")
 
@@ -89,11 +94,18 @@ class HammerDriver:
         for config in options.environment_configs:
             if not os.path.exists(config):
                 self.log.error("Environment config %s does not exist!" % (config))
-        self.database.update_environment(hammer_config.load_config_from_paths(options.environment_configs, strict=True))
+        # Load the user configs concurrently unless a backend was requested in the environment.
+        config_load_backend = os.environ.get(hammer_config.CONFIG_LOAD_BACKEND_ENV, "thread")
+        self.database.update_environment(hammer_config.load_config_from_paths(options.environment_configs, strict=True,
+                                                                              backend=config_load_backend))
 
         # Read in the project config to find the syn, par, and tech.
-        project_configs = hammer_config.load_config_from_paths(options.project_configs, strict=True)
+        project_configs = hammer_config.load_config_from_paths(options.project_configs, strict=True,
+                                                               backend=config_load_backend)
         project_configs.append(extra_project_config)
+        config_cache = hammer_config.get_config_cache()
+        if config_cache is not None:
+            self.log.debug("Config parse cache: " + str(config_cache.stats))
         self.project_configs = []  # type: List[dict]
         self.update_project_configs(project_configs)
 
@@ -115,7 +127,11 @@ class HammerDriver:
 
     @property
     def project_config(self) -> dict:
-        return hammer_config.combine_configs(self.project_configs)
+        """
+        Get the merged project config, including any overlays currently pushed (see push_project_overlay()).
+        """
+        overlays = [dict(overlay) for overlay in self.database.overlay]  # type: List[dict]
+        return hammer_config.combine_configs(self.project_configs + overlays)
 
     def update_project_configs(self, project_configs: List[dict]) -> None:
         """
@@ -124,6 +140,19 @@ class HammerDriver:
         self.project_configs = project_configs
         self.database.update_project(self.project_configs)
 
+    def push_project_overlay(self, overlay_config: dict) -> None:
+        """
+        Temporarily overlay the given config on top of the project configs (e.g. a module's config in hierarchical
+        flows), without re-merging the rest of the database. Undo with pop_project_overlay().
+        """
+        self.database.push_overlay(overlay_config)
+
+    def pop_project_overlay(self) -> None:
+        """
+        Remove the most recently pushed project overlay.
+        """
+        self.database.pop_overlay()
+
     def load_technology(self, cache_dir: str = "") -> None:
         tech_str = self.database.get_setting("vlsi.core.technology")  # type: str
 
@@ -7,14 +7,15 @@
 #  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
 
 from abc import ABCMeta, abstractmethod
-import atexit
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import reduce
+import hashlib
 import inspect
 from numbers import Number
 import os
-import re
 import shlex
-import subprocess
+import threading
+import time
 from typing import Callable, Iterable, List, Tuple, Optional, Dict, Any, Union, Set, cast, NamedTuple
 import warnings
 
@@ -24,20 +25,33 @@ import hammer_tech
 from hammer_logging import HammerVLSILoggingContext
 from .constraints import *
 
-from .hooks import HammerToolHookAction, HammerToolStep, HammerStepFunction, HookLocation
+from .hooks import HammerToolHookAction, HammerToolStep, HammerStepFunction, HookLocation, StepTiming
 
 from .hammer_vlsi_impl import HierarchicalMode, LibraryFilter, HammerToolPauseException
+from .library_index import LibraryCornerIndex
+from .step_manifest import StepFingerprint, StepManifest, hash_function, hash_value
+from .slot_manager import SlotManager, shared_slot_manager
+from .step_metrics import StepMetrics, SubprocessMetrics, thread_rusage, write_step_metrics
+from .subprocess_executor import SubprocessCommand, SubprocessExecutor, SubprocessResult
+from .tcl_writer import TCLWriter, replace_tcl_sets, tcl_puts
 from .units import TimeValue, VoltageValue, TemperatureValue
-from hammer_utils import (add_lists, check_function_type, get_or_else, in_place_unique,
-                          optional_map, reduce_named, reduce_list_str)
+from hammer_utils import (add_lists, cacheable_function, check_function_type, critical_path, function_cache_key,
+                          get_or_else,
+                          in_place_unique, optional_map, reduce_named, reduce_list_str, write_file_atomically,
+                          CacheStatistics, shared_stat_cache)
 
 __all__ = ['HammerTool', 'ExtraLibrary']
 
+# State of the step running in the current thread (see HammerTool._run_step): the settings it read (if they are being
+# recorded) and the subprocesses it ran.
+_current_step = threading.local()
 
-def make_raw_hammer_tool_step(func: HammerStepFunction, name: str) -> HammerToolStep:
+
+def make_raw_hammer_tool_step(func: HammerStepFunction, name: str,
+                              depends_on: Optional[List[str]] = None) -> HammerToolStep:
     # Check the type of the HammerStepFunction
     check_hammer_step_function(func)
-    return HammerToolStep(func, name)
+    return HammerToolStep(func, name, depends_on)
 
 
 def check_hammer_step_function(func: HammerStepFunction) -> None:
@@ -144,6 +158,11 @@ class HammerTool(metaclass=ABCMeta):
         # Ensure that the run_dir exists.
         os.makedirs(self.run_dir, exist_ok=True)
 
+        # Earlier tools may have created (or removed) files since the paths were last checked.
+        shared_stat_cache().invalidate()
+        # Pick up changes to the environment of hammer-vlsi itself.
+        self.get_generation_cache("environment").clear()
+
         # Run the list of steps defined for this tool.
         if not self.run_steps(self.steps, hook_actions):
             return False
@@ -204,13 +223,78 @@ class HammerTool(metaclass=ABCMeta):
         """
         Internal helper function to set the environment variables for
         self.run_executable().
+        The environment of hammer-vlsi merged with the tool environment variables (see tool_env_vars) is computed once
+        per database generation (and run()); the database dumps are checked on every call, which is cheap when nothing
+        changed and re-dumps them if they were modified or deleted.
         """
-        env = os.environ.copy()
-        # Add HAMMER_DATABASE to the environment for the script.
-        env.update({"HAMMER_DATABASE": self.dump_database()})
-        env.update(self.env_vars)
+        env = dict(self._base_subprocess_env)
+        env.update(self._database_env_vars())
         return env
 
+    @property
+    def _base_subprocess_env(self) -> Dict[str, str]:
+        """
+        The environment of hammer-vlsi with the tool environment variables on top, cached per database generation.
+        Callers must not modify it.
+        """
+        cache = self.get_generation_cache("environment")
+        if "base_env" not in cache:
+            env = os.environ.copy()
+            env.update(self.tool_env_vars)
+            cache["base_env"] = env
+        return cache["base_env"]
+
+    def _database_env_vars(self) -> Dict[str, str]:
+        """Dump the database if needed and get the environment variables pointing to the dumps."""
+        return {
+            # Add HAMMER_DATABASE to the environment for the script.
+            "HAMMER_DATABASE": self.dump_database(),
+            # Add the binary snapshot of the database too for fast lookups.
+            "HAMMER_DATABASE_SNAPSHOT": self.dump_database_snapshot()
+        }
+
+    @property
+    def tool_env_vars(self) -> Dict[str, str]:
+        """
+        Get the environment variables required for this tool (see env_vars), computed once per database generation.
+        """
+        try:
+            cache = self.get_generation_cache("environment")
+        except ValueError:
+            # No database, so nothing to cache against.
+            return dict(self.env_vars)
+        if "env_vars" not in cache:
+            cache["env_vars"] = dict(self.env_vars)
+        return dict(cache["env_vars"])
+
+    def environment_diff(self) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """
+        Get the differences between the environment of hammer-vlsi and the environment that this tool's subprocesses
+        are launched with, for debugging.
+        The differences of the base environment (see _base_subprocess_env) are computed once per database generation.
+
+        :return: Mapping of each variable which differs to (value in hammer-vlsi, value in the tool), where None means
+                 that the variable is not set.
+        """
+        cache = self.get_generation_cache("environment")
+        if "base_env_diff" not in cache:
+            base_env = self._base_subprocess_env
+            base_diff = {}  # type: Dict[str, Tuple[Optional[str], Optional[str]]]
+            for key in set(os.environ.keys()) | set(base_env.keys()):
+                parent_value = os.environ.get(key)
+                tool_value = base_env.get(key)
+                if parent_value != tool_value:
+                    base_diff[key] = (parent_value, tool_value)
+            cache["base_env_diff"] = base_diff
+        diff = dict(cache["base_env_diff"])  # type: Dict[str, Tuple[Optional[str], Optional[str]]]
+        for key, tool_value in self._database_env_vars().items():
+            parent_value = os.environ.get(key)
+            if parent_value != tool_value:
+                diff[key] = (parent_value, tool_value)
+            else:
+                diff.pop(key, None)
+        return {key: diff[key] for key in sorted(diff.keys())}
+
     # Properties.
     @property
     def name(self) -> str:
@@ -410,12 +494,20 @@ class HammerTool(metaclass=ABCMeta):
             if action.location == HookLocation.ReplaceStep:
                 assert action.step is not None, "ReplaceStep requires a step"
                 assert action.target_name == action.step.name, "Replacement step should have the same name"
-                new_steps[step_id] = action.step
+                if action.step.depends_on is None:
+                    # Keep the dependencies of the replaced step.
+                    new_steps[step_id] = action.step._replace(depends_on=new_steps[step_id].depends_on)
+                else:
+                    new_steps[step_id] = action.step
             elif action.location == HookLocation.InsertPreStep:
                 assert action.step is not None, "InsertPreStep requires a step"
                 if has_step(action.step.name):
                     self.logger.error("New step '{step}' already exists".format(step=action.step.name))
                     return False
+                target = new_steps[step_id]
+                if target.depends_on is not None:
+                    # The target step must still run after the inserted step.
+                    new_steps[step_id] = target._replace(depends_on=target.depends_on + [action.step.name])
                 new_steps.insert(step_id, action.step)
                 names.add(action.step.name)
             elif action.location == HookLocation.InsertPostStep:
@@ -443,7 +535,130 @@ class HammerTool(metaclass=ABCMeta):
                 step = cast(HammerToolStep, step)
                 check_hammer_step_function(step.func)
 
+        # Work out the dependencies of each step.
+        dependencies = {}  # type: Dict[str, List[str]]
+        earlier_steps = []  # type: List[str]
+        last_pause = None  # type: Optional[str]
+        for step in new_steps:
+            if step.depends_on is None:
+                dependencies[step.name] = list(earlier_steps)
+            else:
+                for dependency in step.depends_on:
+                    if dependency not in earlier_steps:
+                        self.logger.error("Step '{step}' depends on '{dep}' which is not an earlier step".format(
+                            step=step.name, dep=dependency))
+                        return False
+                dependencies[step.name] = list(step.depends_on)
+                # Nothing after a pause may run before it.
+                if last_pause is not None and last_pause not in step.depends_on:
+                    dependencies[step.name].append(last_pause)
+            earlier_steps.append(step.name)
+            if self._is_pause_step(step):
+                last_pause = step.name
+
+        # Incremental mode: skip steps which are up to date (see _run_step).
+        manifest = None  # type: Optional[StepManifest]
+        if self._database.has_setting("vlsi.core.incremental_steps") and self.get_setting(
+                "vlsi.core.incremental_steps"):
+            manifest = StepManifest(self.run_dir, ignored_files=[os.path.join(self.run_dir, "config_db_tmp.json"),
+                                                                 os.path.join(self.run_dir, "config_db_tmp.hdb")])
+
         # Run steps.
+        durations = {}  # type: Dict[str, float]
+        start_time = time.perf_counter()
+        max_workers = 1  # type: int
+        if any(step.depends_on is not None for step in new_steps) and self._database.has_setting(
+                "vlsi.core.max_step_workers"):
+            max_workers = int(self.get_setting("vlsi.core.max_step_workers"))
+        if manifest is not None and max_workers > 1:
+            # The outputs of a step are the files that changed while it ran, which would include the files written by
+            # concurrently running steps.
+            self.logger.info("Running steps serially since incremental steps are enabled")
+            max_workers = 1
+        self.attr_setter("_step_metrics", [])
+        try:
+            if max_workers > 1:
+                success = self._run_steps_concurrently(new_steps, dependencies, resume_step, resume_step_pre,
+                                                       max_workers, manifest, durations)
+            else:
+                success = self._run_steps_serially(new_steps, dependencies, resume_step, resume_step_pre, manifest,
+                                                   durations)
+        finally:
+            self.write_step_metrics()
+        if not success:
+            return False
+
+        serial_time = sum(durations.values())
+        critical_path_time, critical_path_steps = critical_path(earlier_steps, dependencies, durations)
+        self.attr_setter("_step_timing", StepTiming(
+            durations=durations,
+            dependencies=dependencies,
+            wall_time=time.perf_counter() - start_time,
+            serial_time=serial_time,
+            critical_path_time=critical_path_time,
+            critical_path=critical_path_steps
+        ))
+        self.logger.info("Steps took {serial:.2f} s in total; the critical path ({path}) takes {critical:.2f} s".format(
+            serial=serial_time, path=", ".join(critical_path_steps), critical=critical_path_time))
+
+        # Run post-steps hook.
+        self.do_post_steps()
+
+        return True
+
+    @property
+    def step_timing(self) -> Optional[StepTiming]:
+        """Timing of the steps in the last successful run_steps(), or None if there was none."""
+        return getattr(self, "_step_timing", None)
+
+    @property
+    def _step_metrics_list(self) -> List[StepMetrics]:
+        return self.attr_getter("_step_metrics", [])
+
+    @property
+    def _other_subprocess_metrics(self) -> List[SubprocessMetrics]:
+        return self.attr_getter("_other_subprocess_metrics_list", [])
+
+    @property
+    def step_metrics(self) -> List[StepMetrics]:
+        """Resource usage of each step which was run or skipped in the last run_steps(), in the order they finished."""
+        return list(self._step_metrics_list)
+
+    @property
+    def subprocess_metrics(self) -> List[SubprocessMetrics]:
+        """Resource usage of the subprocesses run by this tool outside of run_steps()."""
+        return list(self._other_subprocess_metrics)
+
+    def write_step_metrics(self) -> None:
+        """
+        Write the resource usage of the steps and subprocesses of this tool to <run_dir>/step-metrics.json.
+        Does nothing if the run_dir is not set or does not exist.
+        """
+        try:
+            run_dir = self.run_dir
+        except ValueError:
+            return
+        if os.path.isdir(run_dir):
+            write_step_metrics(os.path.join(run_dir, "step-metrics.json"), self.step_metrics,
+                               self.subprocess_metrics)
+
+    @staticmethod
+    def _is_pause_step(step: HammerToolStep) -> bool:
+        """Check if the given step is a pause hook (see make_pause_function())."""
+        # TODO: find a cleaner way of detecting a pause hook
+        return step.name == "pause"
+
+    def _run_steps_serially(self, new_steps: List[HammerToolStep], dependencies: Dict[str, List[str]],
+                            resume_step: Optional[str], resume_step_pre: bool, manifest: Optional[StepManifest],
+                            durations: Dict[str, float]) -> bool:
+        """
+        Run the given steps one after another in order (see run_steps()).
+
+        :param dependencies: Dictionary of each step name to the names of the steps it depends on.
+        :param manifest: Step manifest in incremental mode, else None.
+        :param durations: Dictionary to fill with the duration of each step which was run.
+        :return: Returns true if all the steps are successful.
+        """
         prev_step = None  # type: Optional[HammerToolStep]
 
         for step_index in range(len(new_steps)):
@@ -473,14 +688,15 @@ class HammerTool(metaclass=ABCMeta):
                         # Run pre-step hook.
                         self.do_pre_steps(step)
                     else:
-                        # TODO: find a cleaner way of detecting a pause hook
-                        if step.name == "pause":
+                        if self._is_pause_step(step):
                             # Don't include "pause" for do_between_steps
                             if step_index + 1 < len(new_steps):
                                 self.do_between_steps(prev_step, new_steps[step_index + 1])
                         else:
                             self.do_between_steps(prev_step, step)
-                    func_out = step.func(self)  # type: bool
+                    step_start = time.perf_counter()
+                    func_out = self._run_step(step, dependencies[step.name], manifest)  # type: bool
+                    durations[step.name] = time.perf_counter() - step_start
                     prev_step = step
                 except HammerToolPauseException:
                     self.logger.info("Sub-step '{step}' paused the tool execution".format(step=step.name))
@@ -494,18 +710,246 @@ class HammerTool(metaclass=ABCMeta):
                     self.logger.info("Resuming after '{step}' due to resume hook".format(step=step.name))
                     resume_step = None
 
-        # Run post-steps hook.
-        self.do_post_steps()
-
         return True
 
+    def _run_steps_concurrently(self, new_steps: List[HammerToolStep], dependencies: Dict[str, List[str]],
+                                resume_step: Optional[str], resume_step_pre: bool, max_workers: int,
+                                manifest: Optional[StepManifest], durations: Dict[str, float]) -> bool:
+        """
+        Run the given steps on a pool of worker threads, starting each step once the steps it depends on are done
+        (see run_steps()).
+        do_pre_steps() is called before the first step, and do_between_steps() is called before starting each
+        following step with the step which finished most recently.
+
+        :param dependencies: Dictionary of each step name to the names of the steps it depends on.
+        :param max_workers: Maximum number of steps to run at once.
+        :param manifest: Step manifest in incremental mode, else None.
+        :param durations: Dictionary to fill with the duration of each step which was run.
+        :return: Returns true if all the steps are successful.
+        """
+        # Steps skipped due to a resume hook count as done.
+        done = set()  # type: Set[str]
+        pending = []  # type: List[HammerToolStep]
+        for step in new_steps:
+            if resume_step is not None and not (resume_step_pre and resume_step == step.name):
+                self.logger.info("Sub-step '{step}' skipped due to resume hook".format(step=step.name))
+                done.add(step.name)
+                if resume_step == step.name:
+                    self.logger.info("Resuming after '{step}' due to resume hook".format(step=step.name))
+                    resume_step = None
+            else:
+                if resume_step is not None:
+                    self.logger.info("Resuming before '{step}' due to resume hook".format(step=step.name))
+                    resume_step = None
+                pending.append(step)
+
+        def run_step(step: HammerToolStep) -> Tuple[bool, float]:
+            step_start = time.perf_counter()
+            func_out = self._run_step(step, dependencies[step.name], manifest)  # type: bool
+            assert isinstance(func_out, bool)
+            return func_out, time.perf_counter() - step_start
+
+        started = False
+        prev_step = None  # type: Optional[HammerToolStep]
+        stop = False
+        success = True
+        running = {}  # type: Dict[Future, HammerToolStep]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while len(running) > 0 or (not stop and len(pending) > 0):
+                if not stop:
+                    for step in list(pending):
+                        if len(running) >= max_workers:
+                            break
+                        if not all(dependency in done for dependency in dependencies[step.name]):
+                            continue
+                        pending.remove(step)
+                        self.logger.debug("Running sub-step '{step}'".format(step=step.name))
+                        if not started:
+                            # Run pre-step hook.
+                            self.do_pre_steps(step)
+                            started = True
+                        elif prev_step is not None and not self._is_pause_step(step):
+                            self.do_between_steps(prev_step, step)
+                        running[executor.submit(run_step, step)] = step
+                finished, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        func_out, duration = future.result()
+                    except HammerToolPauseException:
+                        self.logger.info("Sub-step '{step}' paused the tool execution".format(step=step.name))
+                        stop = True
+                        continue
+                    except BaseException:
+                        # Let the running steps finish before raising.
+                        stop = True
+                        wait(list(running.keys()))
+                        raise
+                    durations[step.name] = duration
+                    done.add(step.name)
+                    prev_step = step
+                    if not func_out:
+                        stop = True
+                        success = False
+        return success
+
+    def is_step_restartable(self, step: HammerToolStep) -> bool:
+        """
+        Whether the given step can be skipped in incremental mode (vlsi.core.incremental_steps) when it is up to date.
+        This is only safe for steps whose results are entirely in files in the run_dir (and settings), i.e. which
+        don't leave any state in the tool which later steps need (e.g. TCL commands accumulated in memory).
+        Tools should override this for the steps for which it is safe.
+
+        :param step: Step to check.
+        :return: True if the step is restartable.
+        """
+        return False
+
+    def _step_fingerprint(self, step: HammerToolStep, dependencies: List[str], manifest: StepManifest,
+                          settings: Iterable[str]) -> StepFingerprint:
+        """
+        Get the current fingerprint of the given step.
+
+        :param settings: Keys of the settings which the step reads (keys ending in "*" are prefixes).
+        """
+        version_key = self.tool_config_prefix() + ".version"
+        version = self.get_setting(version_key) if self._database.has_setting(version_key) else None
+        code = hash_value([type(self).__module__, type(self).__qualname__, version, hash_function(step.func)])
+
+        def setting_hash(key: str) -> str:
+            if key.endswith("*"):
+                return hash_value(self._database.get_settings_with_prefix(key[:-1]))
+            elif self._database.has_setting(key):
+                return hash_value(self._database.get_setting(key))
+            else:
+                return "missing"
+
+        try:
+            input_files = list(self.input_files)
+        except ValueError:
+            input_files = []
+        return StepFingerprint(
+            code=code,
+            settings={key: setting_hash(key) for key in settings},
+            input_files={path: manifest.file_hash(path) for path in input_files},
+            dependencies={name: manifest.output_hash(name) for name in dependencies}
+        )
+
     @staticmethod
-    def make_step_from_method(func: Callable[[], bool], name: str = "") -> HammerToolStep:
+    def _record_setting_read(key: str) -> None:
+        """Record that the step running in this thread read the given setting (see _run_step)."""
+        keys = getattr(_current_step, "settings_read", None)  # type: Optional[Set[str]]
+        if keys is not None:
+            keys.add(key)
+
+    def _get_cached(self, cache: Dict[Any, Any], key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Get the value stored under the given key of a generation cache (see get_generation_cache), computing and
+        storing it first if needed.
+        The settings read while computing the value are stored with it and recorded again whenever the cached value
+        is used, so that incremental steps (see _run_step_incremental) depend on them even on a cache hit.
+        """
+        if key not in cache:
+            outer_keys = getattr(_current_step, "settings_read", None)  # type: Optional[Set[str]]
+            _current_step.settings_read = set()
+            try:
+                value = compute()
+            finally:
+                keys = _current_step.settings_read  # type: Set[str]
+                _current_step.settings_read = outer_keys
+            cache[key] = (value, frozenset(keys))
+        value, keys = cache[key]
+        for setting in keys:
+            self._record_setting_read(setting)
+        return value
+
+    def _run_step(self, step: HammerToolStep, dependencies: List[str], manifest: Optional[StepManifest]) -> bool:
+        """
+        Run the given step (see _run_step_incremental) and record its resource usage (see step_metrics).
+
+        :param dependencies: Names of the steps which this step depends on.
+        :param manifest: Step manifest in incremental mode, else None.
+        :return: Result of the step (True if it was skipped).
+        """
+        subprocesses = []  # type: List[SubprocessMetrics]
+        _current_step.subprocesses = subprocesses
+        ran = True  # type: bool
+        start_time = time.perf_counter()
+        start_usage = thread_rusage()
+        try:
+            func_out, ran = self._run_step_incremental(step, dependencies, manifest)
+        finally:
+            end_usage = thread_rusage()
+            _current_step.subprocesses = None
+            self._step_metrics_list.append(StepMetrics(
+                name=step.name,
+                ran=ran,
+                wall_time=time.perf_counter() - start_time,
+                user_time=end_usage.ru_utime - start_usage.ru_utime,
+                system_time=end_usage.ru_stime - start_usage.ru_stime,
+                max_rss_kb=end_usage.ru_maxrss,
+                subprocesses=subprocesses
+            ))
+        return func_out
+
+    def _run_step_incremental(self, step: HammerToolStep, dependencies: List[str],
+                              manifest: Optional[StepManifest]) -> Tuple[bool, bool]:
+        """
+        Run the given step.
+        In incremental mode (i.e. with a manifest), restartable steps (see is_step_restartable) are skipped if their
+        fingerprint (the settings they read, the input files, their code and the tool version, and the outputs of the
+        steps they depend on) and their outputs are unchanged since they last ran in this run_dir.
+        The decision is recorded in the manifest along with the new fingerprint and outputs of the step.
+
+        :param dependencies: Names of the steps which this step depends on.
+        :param manifest: Step manifest in incremental mode, else None.
+        :return: Result of the step (True if it was skipped), and whether the step was run.
+        """
+        if manifest is None:
+            return step.func(self), True
+
+        if not self.is_step_restartable(step):
+            reason = "step is not restartable"
+        else:
+            previous = manifest.steps.get(step.name)
+            previous_settings = [] if previous is None else list(previous["fingerprint"]["settings"].keys())
+            out_of_date_reason = manifest.check(step.name, self._step_fingerprint(step, dependencies, manifest,
+                                                                                  previous_settings))
+            if out_of_date_reason is None:
+                self.logger.info("Sub-step '{step}' skipped since it is up to date".format(step=step.name))
+                manifest.record_decision(step.name, ran=False, reason="up to date")
+                manifest.save()
+                return True, False
+            reason = out_of_date_reason
+        self.logger.info("Running sub-step '{step}' ({reason})".format(step=step.name, reason=reason))
+
+        before = manifest.snapshot()
+        _current_step.settings_read = set()
+        try:
+            func_out = step.func(self)
+        finally:
+            settings = _current_step.settings_read  # type: Set[str]
+            _current_step.settings_read = None
+        after = manifest.snapshot()
+
+        if func_out and self.is_step_restartable(step):
+            outputs = sorted(path for path, st in after.items() if before.get(path) != st)
+            manifest.record_step(step.name, self._step_fingerprint(step, dependencies, manifest, settings), outputs)
+        else:
+            manifest.forget_step(step.name)
+        manifest.record_decision(step.name, ran=True, reason=reason)
+        manifest.save()
+        return func_out, True
+
+    @staticmethod
+    def make_step_from_method(func: Callable[[], bool], name: str = "",
+                              depends_on: Optional[List[str]] = None) -> HammerToolStep:
         """
         Create a HammerToolStep from a method.
 
         :param func: Method for the given substep (e.g. self.elaborate)
         :param name: Name of the hook. If unspecified, defaults to func.__name__.
+        :param depends_on: Names of the earlier steps this step depends on. If unspecified, depends on all earlier steps.
         :return: A HammerToolStep defining this step.
         """
         if not callable(func):
@@ -522,7 +966,7 @@ class HammerTool(metaclass=ABCMeta):
 
         if name == "":
             name = func.__name__
-        return make_raw_hammer_tool_step(func=wrapper, name=name)
+        return make_raw_hammer_tool_step(func=wrapper, name=name, depends_on=depends_on)
 
     @staticmethod
     def make_steps_from_methods(funcs: List[Callable[[], bool]]) -> List[HammerToolStep]:
@@ -535,19 +979,21 @@ class HammerTool(metaclass=ABCMeta):
         return list(map(lambda x: HammerTool.make_step_from_method(x), funcs))
 
     @staticmethod
-    def make_step_from_function(func: HammerStepFunction, name: str = "") -> HammerToolStep:
+    def make_step_from_function(func: HammerStepFunction, name: str = "",
+                                depends_on: Optional[List[str]] = None) -> HammerToolStep:
         """
         Create a HammerToolStep from a function.
 
         :param func: Class function for the given substep
         :param name: Name of the hook. If unspecified, defaults to func.__name__.
+        :param depends_on: Names of the earlier steps this step depends on. If unspecified, depends on all earlier steps.
         :return: A HammerToolStep defining this step.
         """
         if hasattr(func, "__self__"):
             raise ValueError("This function does not take bound methods")
         if name == "":
             name = func.__name__
-        return make_raw_hammer_tool_step(func=func, name=name)
+        return make_raw_hammer_tool_step(func=func, name=name, depends_on=depends_on)
 
     @staticmethod
     def make_pause_function() -> HammerStepFunction:
@@ -572,9 +1018,11 @@ class HammerTool(metaclass=ABCMeta):
         )
 
     @staticmethod
-    def make_insertion_hook(step: str, location: HookLocation, func: HammerStepFunction) -> HammerToolHookAction:
+    def make_insertion_hook(step: str, location: HookLocation, func: HammerStepFunction,
+                            depends_on: Optional[List[str]] = None) -> HammerToolHookAction:
         """
         Create a hook action is inserted relative to the given step.
+        The inserted step depends on all earlier steps unless depends_on is given.
         """
         if location != HookLocation.InsertPreStep and location != HookLocation.InsertPostStep:
             raise ValueError("Insertion hook location must be Insert*")
@@ -582,7 +1030,7 @@ class HammerTool(metaclass=ABCMeta):
         return HammerToolHookAction(
             target_name=step,
             location=location,
-            step=HammerTool.make_step_from_function(func)
+            step=HammerTool.make_step_from_function(func, depends_on=depends_on)
         )
 
     @staticmethod
@@ -647,18 +1095,20 @@ class HammerTool(metaclass=ABCMeta):
         return output
 
     @staticmethod
-    def make_pre_insertion_hook(step: str, func: HammerStepFunction) -> HammerToolHookAction:
+    def make_pre_insertion_hook(step: str, func: HammerStepFunction,
+                                depends_on: Optional[List[str]] = None) -> HammerToolHookAction:
         """
         Create a hook action is inserted prior to the given step.
         """
-        return HammerTool.make_insertion_hook(step, HookLocation.InsertPreStep, func)
+        return HammerTool.make_insertion_hook(step, HookLocation.InsertPreStep, func, depends_on)
 
     @staticmethod
-    def make_post_insertion_hook(step: str, func: HammerStepFunction) -> HammerToolHookAction:
+    def make_post_insertion_hook(step: str, func: HammerStepFunction,
+                                 depends_on: Optional[List[str]] = None) -> HammerToolHookAction:
         """
         Create a hook action is inserted after the given step.
         """
-        return HammerTool.make_insertion_hook(step, HookLocation.InsertPostStep, func)
+        return HammerTool.make_insertion_hook(step, HookLocation.InsertPostStep, func, depends_on)
 
     @staticmethod
     def make_removal_hook(step: str) -> HammerToolHookAction:
@@ -683,14 +1133,61 @@ class HammerTool(metaclass=ABCMeta):
     def set_database(self, database: hammer_config.HammerDatabase) -> None:
         """Set the settings database for use by the tool."""
         self._database = database # type: hammer_config.HammerDatabase
+        # Track the settings read by each step in incremental mode, including reads by the technology.
+        database.read_listener = self._record_setting_read
+
+    def _get_database_dump(self, path: str) -> Optional[Tuple[int, str, Tuple[int, int]]]:
+        """
+        Get the (database generation, content hash, (mtime, size)) of the last dump written to the given path by
+        this tool from the current database, if the file was not modified since.
+        """
+        dumps = self.attr_getter("_database_dumps", {})  # type: Dict[str, Tuple[Any, int, str, Tuple[int, int]]]
+        if path not in dumps:
+            return None
+        database, generation, content_hash, stat = dumps[path]
+        if database is not self._database:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if (st.st_mtime_ns, st.st_size) != stat:
+            return None
+        return generation, content_hash, stat
+
+    def _record_database_dump(self, path: str, content_hash: str) -> None:
+        """Record that the given path holds a dump of the current database generation."""
+        st = os.stat(path)
+        dumps = self.attr_getter("_database_dumps", {})  # type: Dict[str, Tuple[Any, int, str, Tuple[int, int]]]
+        dumps[path] = (self._database, self._database.generation, content_hash, (st.st_mtime_ns, st.st_size))
 
     def dump_database(self) -> str:
         """Dump the current database JSON in a temporary file in the run_dir and return the path.
+        The database is only re-serialized if it changed since the last dump, and the file is only rewritten if its
+        contents changed. The file is replaced atomically so running subprocesses never see a partial file.
         """
         path = os.path.join(self.run_dir, "config_db_tmp.json")
-        db_contents = self._database.get_database_json()
-        with open(path, 'w') as f:
-            f.write(db_contents)
+        last_dump = self._get_database_dump(path)
+        if last_dump is not None and last_dump[0] == self._database.generation:
+            return path
+        db_contents = self._database.get_database_json(transclude_by_reference=True).encode("utf-8")
+        content_hash = hashlib.sha256(db_contents).hexdigest()
+        if last_dump is None or last_dump[1] != content_hash:
+            write_file_atomically(path, db_contents)
+        self._record_database_dump(path, content_hash)
+        return path
+
+    def dump_database_snapshot(self) -> str:
+        """Dump the current database as a binary snapshot (see hammer_config.write_snapshot) in the run_dir and
+        return the path.
+        Like dump_database(), the snapshot is only rewritten if the database changed since the last dump.
+        """
+        path = os.path.join(self.run_dir, "config_db_tmp.hdb")
+        last_dump = self._get_database_dump(path)
+        if last_dump is not None and last_dump[0] == self._database.generation:
+            return path
+        hammer_config.write_snapshot(self._database.get_unresolved_config(), path)
+        self._record_database_dump(path, "")
         return path
 
     @property
@@ -722,6 +1219,86 @@ class HammerTool(metaclass=ABCMeta):
         except AttributeError:
             raise ValueError("Internal error: no database set by hammer-vlsi")
 
+    def get_settings_with_prefix(self, prefix: str, nullvalue: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get all the settings whose keys start with the given prefix from the database.
+
+        :param prefix: Prefix of the keys (e.g. "vlsi.inputs.").
+        :param nullvalue: Value to return in case of null (leave as None to use the default).
+        :return: Dictionary of the matching keys to their values.
+        """
+        try:
+            if nullvalue is None:
+                return self._database.get_settings_with_prefix(prefix)
+            else:
+                return self._database.get_settings_with_prefix(prefix, nullvalue)
+        except AttributeError:
+            raise ValueError("Internal error: no database set by hammer-vlsi")
+
+    def get_tool_settings(self) -> Dict[str, Any]:
+        """
+        Get all the tool specific settings (see tool_config_prefix()).
+
+        :return: Dictionary of the setting names relative to tool_config_prefix() (e.g. "version") to their values.
+        """
+        prefix = self.tool_config_prefix() + "."
+        return {key[len(prefix):]: value for key, value in self.get_settings_with_prefix(prefix).items()}
+
+    def get_typed_setting(self, key: str, converter: Callable[[Any], Any], is_list: bool = False) -> Any:
+        """
+        Get a setting parsed into a typed value (e.g. constraint objects) by the given converter.
+        The parsed value is cached until the database changes (see HammerDatabase.generation), so the converter only
+        runs once per key per database generation.
+
+        :param key: Key of the setting.
+        :param converter: Function to parse the setting, or each element of the setting if is_list is True.
+        :param is_list: True if the setting is a list whose elements should be parsed individually.
+        :return: The parsed setting. Lists are returned as fresh copies which callers can modify.
+        """
+        self._record_setting_read(key)
+        cache = self.get_generation_cache("typed_settings")
+        cache_key = (key, converter, is_list)
+        if cache_key not in cache:
+            value = self.get_setting(key)
+            if is_list:
+                if not isinstance(value, list):
+                    raise ValueError("Setting {key} must be a list".format(key=key))
+                value = tuple(map(converter, value))
+            else:
+                value = converter(value)
+            cache[cache_key] = value
+        value = cache[cache_key]
+        return list(value) if is_list else value
+
+    def get_generation_cache(self, name: str) -> Dict[Any, Any]:
+        """
+        Get the cache with the given name for values derived from the database and technology.
+        The cache is emptied whenever the database changes (see HammerDatabase.generation) or a different database or
+        technology is set.
+
+        :param name: Name of the cache.
+        :return: Cache dictionary, to be filled by the caller.
+        """
+        try:
+            database = self._database
+            generation = database.generation
+        except AttributeError:
+            raise ValueError("Internal error: no database set by hammer-vlsi")
+        technology = getattr(self, "_technology", None)
+        caches = self.attr_getter("_generation_caches", {})  # type: Dict[str, Tuple[Any, int, Any, Dict[Any, Any]]]
+        if name in caches:
+            cached_database, cached_generation, cached_technology, cache = caches[name]
+            if cached_database is database and cached_generation == generation and cached_technology is technology:
+                return cache
+        cache = {}
+        caches[name] = (database, generation, technology, cache)
+        return cache
+
+    @property
+    def library_cache_stats(self) -> CacheStatistics:
+        """Hit/miss counters for the library selection cache (see filter_and_select_libs())."""
+        return self.attr_getter("_library_cache_stats", CacheStatistics())
+
     def set_setting(self, key: str, value: Any) -> None:
         """
         Set a runtime setting in the database.
@@ -752,7 +1329,7 @@ class HammerTool(metaclass=ABCMeta):
 
         if enter_script_location == "":
             enter_script_location = os.path.join(self.run_dir, "enter")
-        enter_script = "\n".join(map(lambda k_v: "export {0}={1}".format(k_v[0], escape_value(k_v[1])), sorted(self.env_vars.items())))
+        enter_script = "\n".join(map(lambda k_v: "export {0}={1}".format(k_v[0], escape_value(k_v[1])), sorted(self.tool_env_vars.items())))
         with open(enter_script_location, "w") as f:
             f.write(enter_script)
 
@@ -762,13 +1339,15 @@ class HammerTool(metaclass=ABCMeta):
         :param extensions: List of extensions e.g. [".v", ".sv"]
         :return: True if all files exist and have the specified extensions.
         """
-        verilog_args = self.input_files
+        verilog_args = list(self.input_files)
         error = False
+        stat_cache = shared_stat_cache()
+        stat_cache.prefetch(verilog_args)
         for v in verilog_args:
             if not v.endswith(tuple(extensions)):
                 self.logger.error("Input of unsupported type {0} detected!".format(v))
                 error = True
-            if not os.path.isfile(v):
+            if not stat_cache.isfile(v):
                 self.logger.error("Input file {0} does not exist!".format(v))
                 error = True
         return not error
@@ -793,10 +1372,21 @@ class HammerTool(metaclass=ABCMeta):
         """
         Get all available IP libraries. Currently this consists of IP libraries from the technology as well as
         extra IP libraries specified in the config (see get_extra_libraries).
+        The list is cached until the database or technology changes.
         :return: List of all available IP libraries.
         """
-        return list(self.technology.tech_defined_libraries) + list(
-            map(lambda el: el.store_into_library(), self.get_extra_libraries()))
+        cache = self.get_generation_cache("libraries")
+        return list(self._get_cached(cache, "available", lambda: tuple(self.technology.tech_defined_libraries) + tuple(
+            map(lambda el: el.store_into_library(), self.get_extra_libraries()))))
+
+    def get_library_index(self) -> LibraryCornerIndex:
+        """
+        Get the index of the available libraries by corner and supplies (see get_available_libraries).
+        The index is built once and kept until the database or technology changes.
+        :return: Index of all available IP libraries.
+        """
+        cache = self.get_generation_cache("libraries")
+        return self._get_cached(cache, "corner_index", lambda: LibraryCornerIndex(self.get_available_libraries()))
 
     # TODO: should some of these live in hammer_tech instead?
     def filter_and_select_libs(self,
@@ -808,6 +1398,11 @@ class HammerTool(metaclass=ABCMeta):
         """
         Generate a list by filtering the list of libraries and selecting some parts of it.
 
+        The result is cached until the database or technology changes if all the filter, sort and extraction functions
+        are marked with hammer_utils.cacheable_function (e.g. filter_for_supplies, filter_for_mmmc and the functions of
+        LibraryFilters created with cacheable=True). This assumes that such functions only depend on the library, their
+        arguments, the values they close over and the settings; other functions are called every time.
+
         :param lib_filters: Filters to filter the list of libraries before selecting desired results from them.
                             e.g. remove libraries of the wrong type
         :param sort_func: Sort function to re-order the resultant components.
@@ -821,12 +1416,51 @@ class HammerTool(metaclass=ABCMeta):
         if extraction_func is None:
             raise TypeError("extraction_func is required")
 
+        # The selected items only depend on the libraries (i.e. the database and technology) and the functions.
+        # Results are not cached if any function is not marked as cacheable or can't be used as a cache key (e.g.
+        # closures over unhashable values).
+        cache = self.get_generation_cache("library_selections")
+        func_keys = [function_cache_key(func) for func in lib_filters] + [
+            function_cache_key(sort_func) if sort_func is not None else (), function_cache_key(extraction_func)]
+        cache_key = None if None in func_keys else tuple(func_keys)
+        if cache_key is None:
+            self.library_cache_stats.record_miss()
+            lib_results = self._select_libs(lib_filters, sort_func, extraction_func)  # type: List[str]
+        else:
+            if cache_key in cache:
+                self.library_cache_stats.record_hit()
+            else:
+                self.library_cache_stats.record_miss()
+            lib_results = list(self._get_cached(cache, cache_key, lambda: tuple(
+                self._select_libs(lib_filters, sort_func, extraction_func))))
+
+        # Extra functions (e.g. existence checks) are always re-run.
+        lib_results_with_extra_funcs = reduce(lambda arr, extra_func: list(map(extra_func, arr)), extra_funcs, lib_results)
+
+        return lib_results_with_extra_funcs
+
+    def _select_libs(self,
+                     lib_filters: List[Callable[[hammer_tech.Library], bool]],
+                     sort_func: Optional[Callable[[hammer_tech.Library], Union[Number, str, tuple]]],
+                     extraction_func: Callable[[hammer_tech.Library], List[str]]) -> List[str]:
+        """
+        Uncached implementation of filter_and_select_libs() (without extra_funcs).
+        """
         filtered_libs = reduce_named(
             sequence=lib_filters,
             initial=self.get_available_libraries(),
             function=lambda libs, func: filter(func, libs)
         )  # type: List[hammer_tech.Library]
+        return self._extract_libs(filtered_libs, sort_func, extraction_func)
 
+    def _extract_libs(self,
+                      filtered_libs: Iterable[hammer_tech.Library],
+                      sort_func: Optional[Callable[[hammer_tech.Library], Union[Number, str, tuple]]],
+                      extraction_func: Callable[[hammer_tech.Library], List[str]]) -> List[str]:
+        """
+        Sort the given (already filtered) libraries and extract the desired components from them (see
+        filter_and_select_libs()).
+        """
         if sort_func is not None:
             filtered_libs = sorted(filtered_libs, key=sort_func)
 
@@ -848,10 +1482,9 @@ class HammerTool(metaclass=ABCMeta):
         # lib, etc).
         in_place_unique(lib_results)
 
-        lib_results_with_extra_funcs = reduce(lambda arr, extra_func: list(map(extra_func, arr)), extra_funcs, lib_results)
-
-        return lib_results_with_extra_funcs
+        return lib_results
 
+    @cacheable_function
     def filter_for_supplies(self, lib: hammer_tech.Library) -> bool:
         """Function to help filter a list of libraries to find libraries which have matching supplies.
         Will also use libraries with no supplies annotation.
@@ -864,26 +1497,32 @@ class HammerTool(metaclass=ABCMeta):
             # always be used.
             self.logger.warning("Lib %s has no supplies annotation! Using anyway." % (lib.serialize()))
             return True
-        return self.get_setting("vlsi.inputs.supplies.VDD") == lib.supplies.VDD and self.get_setting("vlsi.inputs.supplies.GND") == lib.supplies.GND
+        cache = self.get_generation_cache("libraries")
+        VDD, GND = self._get_cached(cache, "supplies", lambda: (
+            self.get_setting("vlsi.inputs.supplies.VDD"), self.get_setting("vlsi.inputs.supplies.GND")))
+        index = self.get_library_index()
+        if lib in index and isinstance(VDD, str) and isinstance(GND, str):
+            return index.matches(lib, VDD=VDD, GND=GND)
+        return VDD == lib.supplies.VDD and GND == lib.supplies.GND
 
     def filter_for_mmmc(self, voltage: VoltageValue, temp: TemperatureValue) -> Callable[[hammer_tech.Library],bool]:
         """
         Selecting libraries that match given temp and voltage.
         """
+        @cacheable_function
         def extraction_func(lib: hammer_tech.Library) -> bool:
+            index = self.get_library_index()
+            if lib in index:
+                return index.matches(lib, temperature=temp, voltage=voltage)
             if lib.corner is None or lib.corner.temperature is None:
                 return False
             if lib.supplies is None or lib.supplies.VDD is None:
                 return False
-            lib_temperature = TemperatureValue(str(lib.corner.temperature))
-            lib_VDD = VoltageValue(str(lib.supplies.VDD))
-            if lib_temperature == temp:
-                if lib_VDD == voltage:
-                    return True
-                else:
-                    return False
-            else:
+            # Unit parsing is memoized, so these are cheap for the corners/supplies shared by many libraries.
+            # Only parse the voltage if the temperature matches.
+            if TemperatureValue(str(lib.corner.temperature)) != temp:
                 return False
+            return VoltageValue(str(lib.supplies.VDD)) == voltage
         return extraction_func
 
     @staticmethod
@@ -892,7 +1531,7 @@ class HammerTool(metaclass=ABCMeta):
         Utility function to generate functions which check whether a path exists.
         """
         def check_isdir(path: str) -> str:
-            if not os.path.isdir(path):
+            if not shared_stat_cache().isdir(path):
                 raise ValueError("%s %s is not a directory or does not exist" % (description, path))
             else:
                 return path
@@ -904,12 +1543,28 @@ class HammerTool(metaclass=ABCMeta):
         Utility function to generate functions which check whether a path exists.
         """
         def check_isfile(path: str) -> str:
-            if not os.path.isfile(path):
+            if not shared_stat_cache().isfile(path):
                 raise ValueError("%s %s is not a file or does not exist" % (description, path))
             else:
                 return path
         return check_isfile
 
+    @staticmethod
+    def check_paths_exist(paths: List[str], is_file: bool = True, description: str = "Path") -> None:
+        """
+        Check that all the given paths exist, looking them up in parallel (see hammer_utils.StatCache).
+        Unlike make_check_isfile/make_check_isdir, all the missing paths are reported in a single error.
+
+        :param paths: Paths to check.
+        :param is_file: True if the paths must be files, False if they must be directories.
+        :param description: Description of the paths for the error message (e.g. "Timing lib").
+        """
+        missing = shared_stat_cache().find_missing(paths, "file" if is_file else "dir")
+        if len(missing) > 0:
+            kind = "a file" if is_file else "a directory"
+            raise ValueError("\n".join("%s %s is not %s or does not exist" % (description, path, kind)
+                                       for path in missing))
+
     @staticmethod
     def replace_tcl_set(variable: str, value: str, tcl_path: str, quotes: bool = True) -> None:
         """
@@ -921,35 +1576,125 @@ class HammerTool(metaclass=ABCMeta):
         :param tcl_path: Path to the TCL script.
         :param quotes: (optional) Set to False to disable quoting of the value.
         """
-        with open(tcl_path, "r") as f:
-            tcl_contents = f.read() # type: str
+        replace_tcl_sets({variable: value}, tcl_path, quotes)
 
-        value_string = value
-        if quotes:
-            value_string = '"' + value_string + '"'
-        replacement_string = "set %s %s;" % (variable, value_string)
-
-        regex = r'^set +%s.*' % (re.escape(variable))
-        if re.search(regex, tcl_contents, flags=re.MULTILINE) is None:
-            raise ValueError("set %s line not found in tcl file %s!" % (variable, tcl_path))
-
-        new_tcl_contents = re.sub(regex, replacement_string, tcl_contents, flags=re.MULTILINE) # type: str
+    @staticmethod
+    def replace_tcl_sets(values: Dict[str, str], tcl_path: str, quotes: bool = True) -> None:
+        """
+        Utility function to replace several "set VARIABLE ..." lines with set VARIABLE "value" in the given TCL script
+        file in a single pass (see replace_tcl_set).
 
-        with open(tcl_path, "w") as f:
-            f.write(new_tcl_contents)
+        :param values: Value of each variable to replace (default quoted).
+        :param tcl_path: Path to the TCL script.
+        :param quotes: (optional) Set to False to disable quoting of the values.
+        """
+        replace_tcl_sets(values, tcl_path, quotes)
 
     # TODO(edwardw): consider pulling this out so that hammer_tech can also use this
     def run_executable(self, args: List[str], cwd: str = None) -> str:
         """
         Run an executable and log the command to the log while also capturing the output.
+        A non-zero exit status is logged as an error; use run_executables() to check the result.
 
         :param args: Command-line to run; each item in the list is one token. The first token should be the command to run.
         :param cwd: Working directory (leave as None to use the current working directory).
-        :return: Output from the command or an error message.
+        :return: Output from the command. Only the last vlsi.core.subprocess_output_limit bytes (64 KiB by default)
+                 are returned for longer outputs; the full output is in the log.
         """
-        self.logger.debug("Executing subprocess: " + ' '.join(args))
+        return self.run_executables([args], cwd)[0].output
 
-        # Short version for easier display in the log.
+    def run_executables(self, commands: List[List[str]], cwd: str = None) -> List[SubprocessResult]:
+        """
+        Run several executables concurrently, logging their commands and output to the log.
+
+        :param commands: Command-lines to run; each item in a command-line is one token. The first token should be the
+                         command to run.
+        :param cwd: Working directory (leave as None to use the current working directory).
+        :return: Results (exit status, resource usage and tail of the output, see run_executable()) of each command,
+                 in order.
+        """
+        env = self._subprocess_env
+        subprocess_commands = []  # type: List[SubprocessCommand]
+        for args in commands:
+            self.logger.debug("Executing subprocess: " + ' '.join(args))
+            subprocess_logger = self.logger.context("Exec " + self._subprocess_tag(args))
+            subprocess_commands.append(SubprocessCommand(args=args, cwd=cwd, env=env,
+                                                         line_callback=subprocess_logger.debug))
+
+        executor = SubprocessExecutor()
+        if self._database.has_setting("vlsi.core.subprocess_output_limit"):
+            executor.capture_limit = int(self.get_setting("vlsi.core.subprocess_output_limit"))
+        slot_wait_time = 0.0  # type: float
+        slot_manager = self.slot_manager
+        if slot_manager is None:
+            results = executor.run(subprocess_commands)
+        else:
+            # Take the slots of all the commands before launching any of them.
+            tokens = {}  # type: Dict[str, int]
+            for args in commands:
+                for name, count in self.executable_slots(args).items():
+                    tokens[name] = tokens.get(name, 0) + count
+            with slot_manager.slots(tokens) as slot_wait_time:
+                if slot_wait_time >= 1.0:
+                    self.logger.info("Waited {time:.1f} s for slots {tokens}".format(
+                        time=slot_wait_time, tokens=tokens))
+                results = executor.run(subprocess_commands)
+
+        step_subprocesses = getattr(_current_step, "subprocesses", None)  # type: Optional[List[SubprocessMetrics]]
+        for result in results:
+            if step_subprocesses is not None:
+                step_subprocesses.append(SubprocessMetrics.from_result(result, slot_wait_time))
+            else:
+                self._other_subprocess_metrics.append(SubprocessMetrics.from_result(result, slot_wait_time))
+            if not result.succeeded:
+                self.logger.error("Subprocess {tag} exited with status {status}".format(
+                    tag=self._subprocess_tag(result.args), status=result.returncode))
+        return results
+
+    @property
+    def slot_manager(self) -> Optional[SlotManager]:
+        """
+        Get the SlotManager which limits concurrent tool launches (see vlsi.core.slots), or None if they are not
+        limited.
+        """
+        if not self._database.has_setting("vlsi.core.slots.backend"):
+            return None
+        backend = str(self.get_setting("vlsi.core.slots.backend"))
+        if backend == "none":
+            return None
+        limits = {str(limit["name"]): int(limit["count"])
+                  for limit in self.get_setting("vlsi.core.slots.limits")}  # type: Dict[str, int]
+        return shared_slot_manager(backend, limits, str(self.get_setting("vlsi.core.slots.directory")))
+
+    def executable_slots(self, args: List[str]) -> Dict[str, int]:
+        """
+        Get the slots (e.g. license seats and cores) which the given command needs while it runs.
+        run_executable() waits until these are available before launching the command.
+        Tools which launch licensed CAD tools should override this.
+
+        :param args: Command-line to run.
+        :return: Number of each token needed (e.g. {"innovus": 1, "cores": 8}).
+        """
+        return {}
+
+    def is_tool_executable(self, args: List[str]) -> bool:
+        """
+        Check if the given command launches the tool itself rather than a helper program (e.g. a shell script), e.g.
+        to only take license seats for the tool (see executable_slots).
+        The command is the tool if it is the <tool_config_prefix>.<name>_bin setting (e.g. par.innovus.innovus_bin)
+        or if the program name starts with the name of the tool (e.g. dc_shell for dc).
+
+        :param args: Command-line to run.
+        :return: True if the command launches the tool.
+        """
+        bin_key = "{prefix}.{name}_bin".format(prefix=self.tool_config_prefix(), name=self.name)
+        if self._database.has_setting(bin_key) and args[0] == self.get_setting(bin_key):
+            return True
+        return os.path.basename(args[0]).startswith(self.name)
+
+    @staticmethod
+    def _subprocess_tag(args: List[str]) -> str:
+        """Short version of the command for easier display in the log."""
         PROG_NAME_LEN = 14 # Capture last 14 characters of the command name
         if len(args[0]) <= PROG_NAME_LEN:
             prog_name = args[0]
@@ -960,22 +1705,7 @@ class HammerTool(metaclass=ABCMeta):
             prog_args = remaining_args
         else:
             prog_args = remaining_args[0:15] + "..."
-        prog_tag = prog_name + " " + prog_args
-        subprocess_logger = self.logger.context("Exec " + prog_tag)
-
-        proc = subprocess.Popen(args, shell=False, stderr=subprocess.STDOUT, stdout=subprocess.PIPE, env=self._subprocess_env, cwd=cwd)
-        atexit.register(proc.kill)
-        # Log output and also capture output at the same time.
-        output_buf = ""
-        while True:
-            line = proc.stdout.readline().decode("utf-8")
-            if line != '':
-                subprocess_logger.debug(line.rstrip())
-                output_buf += line
-            else:
-                break
-        # TODO: check errors
-        return line
+        return prog_name + " " + prog_args
 
     # Common convenient filters useful to many different tools.
     @staticmethod
@@ -1017,7 +1747,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("timing_db", "CCS/NLDM timing lib (Synopsys .db)", extraction_func=extraction_func,
-                                 is_file=True)
+                                 is_file=True, cacheable=True)
 
     @property
     def liberty_lib_filter(self) -> LibraryFilter:
@@ -1036,7 +1766,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("timing_lib", "CCS/NLDM timing lib (ASCII .lib)",
-                                 extraction_func=extraction_func, is_file=True)
+                                 extraction_func=extraction_func, is_file=True, cacheable=True)
 
     @property
     def timing_lib_filter(self) -> LibraryFilter:
@@ -1054,7 +1784,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("timing_lib", "CCS/NLDM timing lib (ASCII .lib)",
-                                 extraction_func=extraction_func, is_file=True)
+                                 extraction_func=extraction_func, is_file=True, cacheable=True)
 
     @property
     def timing_lib_with_ecsm_filter(self) -> LibraryFilter:
@@ -1074,7 +1804,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("timing_lib_with_ecsm", "ECSM/CCS/NLDM timing lib (liberty ASCII .lib)",
-                                 extraction_func=extraction_func, is_file=True)
+                                 extraction_func=extraction_func, is_file=True, cacheable=True)
 
     @property
     def qrc_tech_filter(self) -> LibraryFilter:
@@ -1089,7 +1819,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("qrc", "qrc RC corner tech file",
-                                 extraction_func=extraction_func, is_file=True)
+                                 extraction_func=extraction_func, is_file=True, cacheable=True)
 
     @property
     def verilog_synth_filter(self) -> LibraryFilter:
@@ -1105,7 +1835,7 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("verilog_synth", "Synthesizable Verilog wrappers",
-                                 extraction_func=extraction_func, is_file=True)
+                                 extraction_func=extraction_func, is_file=True, cacheable=True)
 
     @property
     def lef_filter(self) -> LibraryFilter:
@@ -1128,7 +1858,7 @@ class HammerTool(metaclass=ABCMeta):
             return 100  # put it behind
 
         return LibraryFilter.new("lef", "LEF physical design layout library", is_file=True, filter_func=filter_func,
-                                 extraction_func=extraction_func, sort_func=sort_func)
+                                 extraction_func=extraction_func, sort_func=sort_func, cacheable=True)
 
     @property
     def gds_filter(self) -> LibraryFilter:
@@ -1144,7 +1874,7 @@ class HammerTool(metaclass=ABCMeta):
             return [lib.gds_file]
 
         return LibraryFilter.new("gds", "GDS opaque physical design layout", is_file=True, filter_func=filter_func,
-                                 extraction_func=extraction_func)
+                                 extraction_func=extraction_func, cacheable=True)
 
     @property
     def milkyway_lib_dir_filter(self) -> LibraryFilter:
@@ -1154,7 +1884,8 @@ class HammerTool(metaclass=ABCMeta):
             else:
                 return []
 
-        return LibraryFilter.new("milkyway_dir", "Milkyway lib", is_file=False, extraction_func=select_milkyway_lib)
+        return LibraryFilter.new("milkyway_dir", "Milkyway lib", is_file=False, extraction_func=select_milkyway_lib,
+                                 cacheable=True)
 
     @property
     def milkyway_techfile_filter(self) -> LibraryFilter:
@@ -1167,7 +1898,8 @@ class HammerTool(metaclass=ABCMeta):
                 return []
 
         return LibraryFilter.new("milkyway_tf", "Milkyway techfile", is_file=True, extraction_func=select_milkyway_tfs,
-                                 extra_post_filter_funcs=[self.create_nonempty_check("Milkyway techfile")])
+                                 extra_post_filter_funcs=[self.create_nonempty_check("Milkyway techfile")],
+                                 cacheable=True)
 
     @property
     def tlu_max_cap_filter(self) -> LibraryFilter:
@@ -1179,7 +1911,8 @@ class HammerTool(metaclass=ABCMeta):
             else:
                 return []
 
-        return LibraryFilter.new("tlu_max", "TLU+ max cap db", is_file=True, extraction_func=select_tlu_max_cap)
+        return LibraryFilter.new("tlu_max", "TLU+ max cap db", is_file=True, extraction_func=select_tlu_max_cap,
+                                 cacheable=True)
 
     @property
     def tlu_min_cap_filter(self) -> LibraryFilter:
@@ -1191,7 +1924,8 @@ class HammerTool(metaclass=ABCMeta):
             else:
                 return []
 
-        return LibraryFilter.new("tlu_min", "TLU+ min cap db", is_file=True, extraction_func=select_tlu_min_cap)
+        return LibraryFilter.new("tlu_min", "TLU+ min cap db", is_file=True, extraction_func=select_tlu_min_cap,
+                                 cacheable=True)
 
     def process_library_filter(self, pre_filts: List[Callable[[hammer_tech.Library], bool]], filt: LibraryFilter, output_func: Callable[[str, LibraryFilter], List[str]],
                                must_exist: bool = True) -> List[str]:
@@ -1211,20 +1945,13 @@ class HammerTool(metaclass=ABCMeta):
         :param must_exist: Must each library item actually exist? Default: True (yes, they must exist)
         :return: Resultant items from the filter and post-processed. (e.g. --timing foo.db --timing bar.db)
         """
-        if must_exist:
-            existence_check_func = self.make_check_isfile(filt.description) if filt.is_file else self.make_check_isdir(
-                filt.description)
-        else:
-            existence_check_func = lambda x: x  # everything goes
-
         lib_filters = pre_filts
         if filt.filter_func is not None:
             lib_filters.append(filt.filter_func)
         lib_items = self.filter_and_select_libs(
             lib_filters=lib_filters,
             sort_func=filt.sort_func,
-            extraction_func=filt.extraction_func,
-            extra_funcs=[existence_check_func])  # type: List[str]
+            extraction_func=filt.extraction_func)  # type: List[str]
 
         # Quickly check that lib_items is actually a List[str].
         if not isinstance(lib_items, List):
@@ -1233,6 +1960,10 @@ class HammerTool(metaclass=ABCMeta):
             if not isinstance(i, str):
                 raise TypeError("lib_items is a List but not a List[str]")
 
+        if must_exist:
+            # Check all the items at once rather than one by one.
+            self.check_paths_exist(lib_items, is_file=filt.is_file, description=filt.description)
+
         # Apply any list-level functions.
         after_post_filter = reduce_named(
             sequence=filt.extra_post_filter_funcs,
@@ -1275,25 +2006,61 @@ class HammerTool(metaclass=ABCMeta):
             )
         )
 
-    # TODO: these helper functions might get a bit out of hand, put them somewhere more organized?
-    def get_clock_ports(self) -> List[ClockPort]:
+    def read_libs_for_corners(self, library_types: Iterable[LibraryFilter],
+                              output_func: Callable[[str, LibraryFilter], List[str]],
+                              corners: List[MMMCCorner], must_exist: bool = True) -> List[List[str]]:
         """
-        Get the clock ports of the top-level module, as specified in vlsi.inputs.clocks.
-        """
-        clocks = self.get_setting("vlsi.inputs.clocks")
-        output = [] # type: List[ClockPort]
-        for clock_port in clocks:
-            clock = ClockPort(
-                name=clock_port["name"], period=TimeValue(clock_port["period"]),
-                uncertainty=None, port=None
-            )
-            if "port" in clock_port:
-                clock = clock._replace(port=clock_port["port"])
-            if "uncertainty" in clock_port:
-                clock = clock._replace(uncertainty=TimeValue(clock_port["uncertainty"]))
-            output.append(clock)
-        return output
+        Read the given libraries for each of the given corners, with the same results as calling read_libs() with
+        filter_for_mmmc() of each corner as the pre-filter.
+        The libraries are only scanned once for all the corners, corners which select the same libraries share the
+        extracted results, and the existence of the items is checked once for all the corners.
+
+        :param library_types: List of libraries to filter, specified as a list of LibraryFilter elements.
+        :param output_func: Function which processes the outputs, taking in the filtered lib and the library filter
+                            which generated it.
+        :param corners: Corners to select libraries for.
+        :param must_exist: Must each library item actually exist? Default: True (yes, they must exist)
+        :return: List of filtered libraries processed according to output_func for each corner, in the same order as
+                 the corners.
+        """
+        mmmc_filters = [self.filter_for_mmmc(voltage=corner.voltage, temp=corner.temp) for corner in corners]
+        libraries = self.get_available_libraries()
+        results = [[] for _ in corners]  # type: List[List[str]]
+        for filt in library_types:
+            # Scan the libraries once, noting the corners which each library matches.
+            libs_per_corner = [[] for _ in corners]  # type: List[List[hammer_tech.Library]]
+            for lib in libraries:
+                if filt.filter_func is not None and not filt.filter_func(lib):
+                    continue
+                for i, mmmc_filter in enumerate(mmmc_filters):
+                    if mmmc_filter(lib):
+                        libs_per_corner[i].append(lib)
+
+            # Extract each distinct set of libraries only once.
+            extracted = {}  # type: Dict[Tuple[int, ...], List[str]]
+            items_per_corner = []  # type: List[List[str]]
+            for libs in libs_per_corner:
+                key = tuple(id(lib) for lib in libs)
+                if key not in extracted:
+                    extracted[key] = self._extract_libs(libs, filt.sort_func, filt.extraction_func)
+                items_per_corner.append(extracted[key])
+
+            if must_exist:
+                all_items = [item for items in extracted.values() for item in items]
+                in_place_unique(all_items)
+                self.check_paths_exist(all_items, is_file=filt.is_file, description=filt.description)
+
+            for i, lib_items in enumerate(items_per_corner):
+                after_post_filter = reduce_named(
+                    sequence=filt.extra_post_filter_funcs,
+                    initial=list(lib_items),
+                    function=lambda libs, func: func(list(libs)),
+                )
+                results[i].extend(reduce_list_str(
+                    add_lists, list(map(lambda item: output_func(item, filt), after_post_filter)), []))
+        return results
 
+    # TODO: these helper functions might get a bit out of hand, put them somewhere more organized?
     def get_gds_map_file(self) -> Optional[str]:
         """
         Get a GDS map in accordance with settings in the Hammer IR.
@@ -1327,52 +2094,42 @@ class HammerTool(metaclass=ABCMeta):
 
         return map_file
 
+    ### Generated typed settings HammerTool ###
+
+    def get_clock_ports(self) -> List[ClockPort]:
+        """
+        Get the clock ports of the top-level module, as specified in vlsi.inputs.clocks.
+        The parsed value is cached until the database changes.
+        """
+        return self.get_typed_setting("vlsi.inputs.clocks", ClockPort.from_setting, is_list=True)
+
     def get_placement_constraints(self) -> List[PlacementConstraint]:
         """
-        Get a list of placement constraints as specified in the config.
+        Get the list of placement constraints, as specified in vlsi.inputs.placement_constraints.
+        The parsed value is cached until the database changes.
         """
-        constraints = self.get_setting("vlsi.inputs.placement_constraints")
-        assert isinstance(constraints, list)
-        return list(map(PlacementConstraint.from_dict, constraints))
+        return self.get_typed_setting("vlsi.inputs.placement_constraints", PlacementConstraint.from_dict, is_list=True)
 
     def get_mmmc_corners(self) -> List[MMMCCorner]:
         """
-        Get a list of MMMC corners as specified in the config.
-        """
-        corners = self.get_setting("vlsi.inputs.mmmc_corners")
-        output = []  # type: List[MMMCCorner]
-        for corner in corners:
-            corner_type = MMMCCornerType.from_string(str(corner["type"]))
-            corn = MMMCCorner(
-                name=str(corner["name"]),
-                type=corner_type,
-                voltage=VoltageValue(str(corner["voltage"])),
-                temp=TemperatureValue(str(corner["temp"])),
-            )
-            output.append(corn)
-        return output
+        Get the list of MMMC corners, as specified in vlsi.inputs.mmmc_corners.
+        The parsed value is cached until the database changes.
+        """
+        return self.get_typed_setting("vlsi.inputs.mmmc_corners", MMMCCorner.from_setting, is_list=True)
 
     def get_input_ilms(self) -> List[ILMStruct]:
         """
-        Get a list of input ILM modules for hierarchical mode.
+        Get the list of input ILM modules for hierarchical mode, as specified in vlsi.inputs.ilms.
+        The parsed value is cached until the database changes.
         """
-        ilms = self.get_setting("vlsi.inputs.ilms")  # type: List[dict]
-        assert isinstance(ilms, list)
-        return list(map(ILMStruct.from_setting, ilms))
+        return self.get_typed_setting("vlsi.inputs.ilms", ILMStruct.from_setting, is_list=True)
 
     def get_output_load_constraints(self) -> List[OutputLoadConstraint]:
         """
-        Get a list of output load constraints as specified in the config.
+        Get the list of output load constraints, as specified in vlsi.inputs.output_loads.
+        The parsed value is cached until the database changes.
         """
-        output_loads = self.get_setting("vlsi.inputs.output_loads")
-        output = []  # type: List[OutputLoadConstraint]
-        for load_src in output_loads:
-            load = OutputLoadConstraint(
-                name=str(load_src["name"]),
-                load=float(load_src["load"])
-            )
-            output.append(load)
-        return output
+        return self.get_typed_setting("vlsi.inputs.output_loads", OutputLoadConstraint.from_setting, is_list=True)
 
     @staticmethod
     def append_contents_to_path(content_to_append: str, target_path: str) -> None:
@@ -1393,24 +2150,24 @@ class HammerTool(metaclass=ABCMeta):
                 f.write("\n".join(content_lines))
 
     @staticmethod
-    def tcl_append(cmd: str, output_buffer: List[str]) -> None:
+    def tcl_append(cmd: str, output_buffer: Union[List[str], TCLWriter]) -> None:
         """
         Helper function to echo and run a command.
 
         :param cmd: TCL command to run
-        :param output_buffer: Buffer in which to enqueue the resulting TCL lines.
+        :param output_buffer: Buffer in which to enqueue the resulting TCL lines, or a TCLWriter to write them to.
         """
         output_buffer.append(cmd)
 
     @staticmethod
-    def verbose_tcl_append(cmd: str, output_buffer: List[str]) -> None:
+    def verbose_tcl_append(cmd: str, output_buffer: Union[List[str], TCLWriter]) -> None:
         """
         Helper function to echo and run a command.
 
         :param cmd: TCL command to run
-        :param output_buffer: Buffer in which to enqueue the resulting TCL lines.
+        :param output_buffer: Buffer in which to enqueue the resulting TCL lines, or a TCLWriter to write them to.
         """
-        output_buffer.append("""puts "{0}" """.format(cmd.replace('"', '\"')))
+        output_buffer.append(tcl_puts(cmd))
         output_buffer.append(cmd)
 
 
@@ -7,15 +7,15 @@
 #  Copyright 2017-2018 Edward Wang <edward.c.wang@compdigitec.com>
 
 from abc import abstractmethod
+from collections import OrderedDict
 from enum import Enum
-from functools import reduce
 import importlib
 from numbers import Number
 import os
 import sys
-from typing import Callable, Iterable, List, NamedTuple, Optional, Dict, Any, Union
+from typing import Callable, Iterable, List, NamedTuple, Optional, Dict, Any, Tuple, Union
 
-from hammer_utils import reverse_dict, deepdict, optional_map
+from hammer_utils import reverse_dict, deepdict, optional_map, cacheable_function
 
 from .constraints import *
 
@@ -115,13 +115,22 @@ class LibraryFilter(NamedTuple('LibraryFilter', [
             extraction_func: Callable[[hammer_tech.Library], List[str]],
             filter_func: Optional[Callable[[hammer_tech.Library], bool]] = None,
             sort_func: Optional[Callable[[hammer_tech.Library], Union[Number, str, tuple]]] = None,
-            extra_post_filter_funcs: List[Callable[[List[str]], List[str]]] = []) -> "LibraryFilter":
-        """Convenience "constructor" with some default arguments."""
+            extra_post_filter_funcs: List[Callable[[List[str]], List[str]]] = [],
+            cacheable: bool = False) -> "LibraryFilter":
+        """
+        Convenience "constructor" with some default arguments.
+
+        :param cacheable: Mark the extraction, filter and sort functions with hammer_utils.cacheable_function, so
+                          that the libraries they select are cached (see HammerTool.filter_and_select_libs()).
+                          Only set this if the functions depend on nothing but the library, the values they close
+                          over and the settings.
+        """
+        mark = cacheable_function if cacheable else (lambda func: func)  # type: Callable[[Any], Any]
         return LibraryFilter(
             tag, description, is_file,
-            extraction_func,
-            filter_func,
-            sort_func,
+            mark(extraction_func),
+            optional_map(filter_func, mark),
+            optional_map(sort_func, mark),
             list(extra_post_filter_funcs)
         )
 
@@ -406,12 +415,17 @@ class CadenceTool(HasSDCSupport, HammerTool):
             "CADENCE_HOME": self.get_setting("cadence.cadence_home")
         }
 
-        def update_dict(old: dict, new: dict) -> dict:
-            tmp = deepdict(old)
-            tmp.update(new)
-            return tmp
+        result = dict(super().env_vars)
+        for extra_vars in list_of_vars:
+            result.update(extra_vars)
+        result.update(cadence_vars)
+        return result
 
-        return reduce(update_dict, [dict(super().env_vars)] + list_of_vars + [cadence_vars], {})
+    def executable_slots(self, args: List[str]) -> Dict[str, int]:
+        # One license seat of this tool and the cores it may use, but nothing for helper programs.
+        if not self.is_tool_executable(args):
+            return {}
+        return {self.name: 1, "cores": int(self.get_setting("vlsi.core.max_threads"))}
 
     def version_number(self, version: str) -> int:
         """
@@ -494,7 +508,9 @@ class CadenceTool(HasSDCSupport, HammerTool):
             )
         else:
             blank_sdc = os.path.join(self.run_dir, "blank.sdc")
-            self.run_executable(["touch", blank_sdc])
+            # Not run_executable() since that would wait for a license of this tool (see executable_slots).
+            with open(blank_sdc, "a"):
+                pass
             sdc_files_arg = "-sdc_files {{ {} }}".format(blank_sdc)
         append_mmmc("create_constraint_mode -name {name} {sdc_files_arg}".format(
             name=constraint_mode,
@@ -504,63 +520,64 @@ class CadenceTool(HasSDCSupport, HammerTool):
         corners = self.get_mmmc_corners()  # type: List[MMMCCorner]
         # In parallel, create the delay corners
         if corners:
-            setup_corner = corners[0]  # type: MMMCCorner
-            hold_corner = corners[0]  # type: MMMCCorner
-            # TODO(colins): handle more than one corner and do something with extra corners
-            for corner in corners:
-                if corner.type is MMMCCornerType.Setup:
-                    setup_corner = corner
-                if corner.type is MMMCCornerType.Hold:
-                    hold_corner = corner
-
-            # First, create Innovus library sets
-            append_mmmc("create_library_set -name {name} -timing [list {list}]".format(
-                name="{n}.setup_set".format(n=setup_corner.name),
-                list=self.get_timing_libs(setup_corner)
-            ))
-            append_mmmc("create_library_set -name {name} -timing [list {list}]".format(
-                name="{n}.hold_set".format(n=hold_corner.name),
-                list=self.get_timing_libs(hold_corner)
-            ))
+            # Every setup and hold corner gets its own analysis view. If there are no corners of a type, the first
+            # corner is used for that type.
+            setup_corners = [c for c in corners if c.type is MMMCCornerType.Setup] or [corners[0]]
+            hold_corners = [c for c in corners if c.type is MMMCCornerType.Hold] or [corners[0]]
+            # Extra corners get views but are not made active.
+            extra_corners = [c for c in corners if c.type is MMMCCornerType.Extra]
+            views = [("{n}.setup".format(n=c.name), c) for c in setup_corners] + \
+                    [("{n}.hold".format(n=c.name), c) for c in hold_corners] + \
+                    [("{n}.extra".format(n=c.name), c) for c in extra_corners]  # type: List[Tuple[str, MMMCCorner]]
+
+            # Select the libraries of all corners at once.
+            distinct_corners = list(OrderedDict((c, None) for _, c in views).keys())  # type: List[MMMCCorner]
+            timing_libs = dict(zip(distinct_corners, map(" ".join, self.read_libs_for_corners(
+                [self.timing_lib_with_ecsm_filter], self.to_plain_item, distinct_corners))))  # type: Dict[MMMCCorner, str]
+            qrc_files = dict(zip(distinct_corners, map(" ".join, self.read_libs_for_corners(
+                [self.qrc_tech_filter], self.to_plain_item, distinct_corners))))  # type: Dict[MMMCCorner, str]
+
+            # First, create Innovus library sets, sharing identical sets between views so that each is only loaded
+            # once.
+            library_set_names = OrderedDict()  # type: Dict[str, str]
+            view_library_sets = {}  # type: Dict[str, str]
+            for name, corner in views:
+                libs = timing_libs[corner]
+                if libs not in library_set_names:
+                    library_set_names[libs] = "{name}_set".format(name=name)
+                    append_mmmc("create_library_set -name {name} -timing [list {list}]".format(
+                        name=library_set_names[libs],
+                        list=libs
+                    ))
+                view_library_sets[name] = library_set_names[libs]
             # Skip opconds for now
             # Next, create Innovus timing conditions
-            append_mmmc("create_timing_condition -name {name} -library_sets [list {list}]".format(
-                name="{n}.setup_cond".format(n=setup_corner.name),
-                list="{n}.setup_set".format(n=setup_corner.name)
-            ))
-            append_mmmc("create_timing_condition -name {name} -library_sets [list {list}]".format(
-                name="{n}.hold_cond".format(n=hold_corner.name),
-                list="{n}.hold_set".format(n=hold_corner.name)
-            ))
-            # Next, create Innovus rc corners from qrc tech files
-            append_mmmc("create_rc_corner -name {name} -temperature {tempInCelsius} {qrc}".format(
-                name="{n}.setup_rc".format(n=setup_corner.name),
-                tempInCelsius=str(setup_corner.temp.value),
-                qrc="-qrc_tech {}".format(self.get_mmmc_qrc(setup_corner)) if self.get_mmmc_qrc(setup_corner) != '' else ''
-            ))
-            append_mmmc("create_rc_corner -name {name} -temperature {tempInCelsius} {qrc}".format(
-                name="{n}.hold_rc".format(n=hold_corner.name),
-                tempInCelsius=str(hold_corner.temp.value),
-                qrc="-qrc_tech {}".format(self.get_mmmc_qrc(hold_corner)) if self.get_mmmc_qrc(hold_corner) != '' else ''
-            ))
-            # Next, create an Innovus delay corner.
-            append_mmmc(
-                "create_delay_corner -name {name}_delay -timing_condition {name}_cond -rc_corner {name}_rc".format(
-                    name="{n}.setup".format(n=setup_corner.name)
+            for name, corner in views:
+                append_mmmc("create_timing_condition -name {name} -library_sets [list {list}]".format(
+                    name="{name}_cond".format(name=name),
+                    list=view_library_sets[name]
                 ))
-            append_mmmc(
-                "create_delay_corner -name {name}_delay -timing_condition {name}_cond -rc_corner {name}_rc".format(
-                    name="{n}.hold".format(n=hold_corner.name)
+            # Next, create Innovus rc corners from qrc tech files
+            for name, corner in views:
+                append_mmmc("create_rc_corner -name {name} -temperature {tempInCelsius} {qrc}".format(
+                    name="{name}_rc".format(name=name),
+                    tempInCelsius=str(corner.temp.value),
+                    qrc="-qrc_tech {}".format(qrc_files[corner]) if qrc_files[corner] != '' else ''
                 ))
+            # Next, create Innovus delay corners.
+            for name, corner in views:
+                append_mmmc(
+                    "create_delay_corner -name {name}_delay -timing_condition {name}_cond -rc_corner {name}_rc".format(
+                        name=name
+                    ))
             # Next, create the analysis views
-            append_mmmc("create_analysis_view -name {name}_view -delay_corner {name}_delay -constraint_mode {constraint}".format(
-                name="{n}.setup".format(n=setup_corner.name), constraint=constraint_mode))
-            append_mmmc("create_analysis_view -name {name}_view -delay_corner {name}_delay -constraint_mode {constraint}".format(
-                name="{n}.hold".format(n=hold_corner.name), constraint=constraint_mode))
-            # Finally, apply the analysis view.
-            append_mmmc("set_analysis_view -setup {{ {setup_view} }} -hold {{ {hold_view} }}".format(
-                setup_view="{n}.setup_view".format(n=setup_corner.name),
-                hold_view="{n}.hold_view".format(n=hold_corner.name)
+            for name, corner in views:
+                append_mmmc("create_analysis_view -name {name}_view -delay_corner {name}_delay -constraint_mode {constraint}".format(
+                    name=name, constraint=constraint_mode))
+            # Finally, apply the analysis views.
+            append_mmmc("set_analysis_view -setup {{ {setup_views} }} -hold {{ {hold_views} }}".format(
+                setup_views=" ".join("{n}.setup_view".format(n=c.name) for c in setup_corners),
+                hold_views=" ".join("{n}.hold_view".format(n=c.name) for c in hold_corners)
             ))
         else:
             # First, create an Innovus library set.
@@ -620,6 +637,12 @@ class SynopsysTool(HasSDCSupport, HammerTool):
         })
         return result
 
+    def executable_slots(self, args: List[str]) -> Dict[str, int]:
+        # One license seat of this tool and the cores it may use, but nothing for helper programs.
+        if not self.is_tool_executable(args):
+            return {}
+        return {self.name: 1, "cores": int(self.get_setting("vlsi.core.max_threads"))}
+
     def version_number(self, version: str) -> int:
         """
         Assumes versions look like NAME-YYYY.MM-SPMINOR.
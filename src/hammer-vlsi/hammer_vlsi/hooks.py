@@ -7,9 +7,9 @@
 #  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
 
 from enum import Enum
-from typing import Callable, NamedTuple, Optional, TYPE_CHECKING
+from typing import Callable, Dict, List, NamedTuple, Optional, TYPE_CHECKING
 
-__all__ = ['HammerStepFunction', 'HammerToolStep', 'HookLocation', 'HammerToolHookAction']
+__all__ = ['HammerStepFunction', 'HammerToolStep', 'HookLocation', 'HammerToolHookAction', 'StepTiming']
 
 # Necessary for mypy to learn about HammerTool.
 if TYPE_CHECKING:
@@ -21,8 +21,13 @@ HammerToolStep = NamedTuple('HammerToolStep', [
     # Function to call to execute this step
     ('func', HammerStepFunction),
     # Name of the step
-    ('name', str)
+    ('name', str),
+    # Names of the (earlier) steps which this step depends on, or None to depend on all the earlier steps.
+    # Steps which only depend on some earlier steps may be run concurrently with the others
+    # (see vlsi.core.max_step_workers).
+    ('depends_on', Optional[List[str]])
 ])
+HammerToolStep.__new__.__defaults__ = (None,)  # type: ignore
 
 
 # Where to insert/replace the given step.
@@ -44,3 +49,20 @@ HammerToolHookAction = NamedTuple('HammerToolHookAction', [
     # Step to insert/replace
     ('step', Optional[HammerToolStep])
 ])
+
+
+# Timing of the steps run by HammerTool.run_steps().
+StepTiming = NamedTuple('StepTiming', [
+    # Duration in seconds of each step which was run
+    ('durations', Dict[str, float]),
+    # Names of the steps which each step depended on
+    ('dependencies', Dict[str, List[str]]),
+    # Time in seconds from the start of the first step to the end of the last step
+    ('wall_time', float),
+    # Sum of the durations of the steps, i.e. the time to run them one after another
+    ('serial_time', float),
+    # Sum of the durations of the steps on the critical path, i.e. the time to run them with unlimited workers
+    ('critical_path_time', float),
+    # Names of the steps on the critical path, in order
+    ('critical_path', List[str])
+])
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  library_index.py
+#  Index of IP libraries by corner and supplies for fast library selection.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import hammer_tech
+
+from .units import TemperatureValue, VoltageValue
+
+__all__ = ['LibraryCornerKey', 'LibraryCornerIndex']
+
+
+class LibraryCornerKey(NamedTuple('LibraryCornerKey', [
+    ('VDD', Optional[str]),
+    ('GND', Optional[str]),
+    ('temperature', Optional[str]),
+    ('nmos', Optional[str]),
+    ('pmos', Optional[str]),
+    ('lib_types', FrozenSet[str])
+])):
+    """
+    Corner and supplies of a library as annotated in the technology (i.e. the unparsed strings).
+    All libraries with the same key are selected together.
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def from_library(lib: hammer_tech.Library) -> "LibraryCornerKey":
+        def to_str(value) -> Optional[str]:
+            return None if value is None else str(value)
+
+        corner = lib.corner
+        supplies = lib.supplies
+        provides = lib.provides
+        return LibraryCornerKey(
+            VDD=None if supplies is None else to_str(supplies.VDD),
+            GND=None if supplies is None else to_str(supplies.GND),
+            temperature=None if corner is None else to_str(corner.temperature),
+            nmos=None if corner is None else to_str(corner.nmos),
+            pmos=None if corner is None else to_str(corner.pmos),
+            lib_types=frozenset() if provides is None else frozenset(
+                str(p.lib_type) for p in provides if p.lib_type is not None)
+        )
+
+
+class LibraryCornerIndex:
+    """
+    Index of libraries grouped by LibraryCornerKey.
+    Queries only compare each distinct corner once (technologies typically have many libraries per corner), and the
+    results of each query are cached, so repeated queries (e.g. one per library when used as a filter) are
+    dictionary lookups.
+    The libraries are indexed by identity, so the index should be rebuilt when the list of libraries changes.
+    """
+
+    def __init__(self, libraries: Iterable[hammer_tech.Library]) -> None:
+        self.libraries = tuple(libraries)  # type: Tuple[hammer_tech.Library, ...]
+        self._key_by_id = {}  # type: Dict[int, LibraryCornerKey]
+        self._ids_by_key = {}  # type: Dict[LibraryCornerKey, List[int]]
+        for lib in self.libraries:
+            key = LibraryCornerKey.from_library(lib)
+            self._key_by_id[id(lib)] = key
+            self._ids_by_key.setdefault(key, []).append(id(lib))
+        self._query_cache = {}  # type: Dict[tuple, FrozenSet[int]]
+
+    @property
+    def keys(self) -> List[LibraryCornerKey]:
+        """Distinct corners in the index."""
+        return list(self._ids_by_key.keys())
+
+    def __contains__(self, lib: hammer_tech.Library) -> bool:
+        return id(lib) in self._key_by_id
+
+    def key_of(self, lib: hammer_tech.Library) -> LibraryCornerKey:
+        """
+        Get the corner of the given library.
+
+        :param lib: Library, which must be in the index.
+        """
+        return self._key_by_id[id(lib)]
+
+    def _select_ids(self, query: tuple) -> FrozenSet[int]:
+        """
+        Get the ids of the libraries whose corner matches the given query.
+
+        :param query: (VDD, GND, temperature, voltage, nmos, pmos, lib_type), where None matches anything.
+                      VDD and GND are compared as strings, while voltage (against VDD) and temperature are compared as
+                      parsed values.
+        """
+        if query not in self._query_cache:
+            VDD, GND, temperature, voltage, nmos, pmos, lib_type = query
+            ids = set()  # type: set
+            for key, key_ids in self._ids_by_key.items():
+                if VDD is not None and key.VDD != VDD:
+                    continue
+                if GND is not None and key.GND != GND:
+                    continue
+                if nmos is not None and key.nmos != nmos:
+                    continue
+                if pmos is not None and key.pmos != pmos:
+                    continue
+                if lib_type is not None and lib_type not in key.lib_types:
+                    continue
+                if temperature is not None and (
+                        key.temperature is None or TemperatureValue(key.temperature) != temperature):
+                    continue
+                if voltage is not None and (key.VDD is None or VoltageValue(key.VDD) != voltage):
+                    continue
+                ids.update(key_ids)
+            self._query_cache[query] = frozenset(ids)
+        return self._query_cache[query]
+
+    def select(self, VDD: Optional[str] = None, GND: Optional[str] = None,
+               temperature: Optional[TemperatureValue] = None, voltage: Optional[VoltageValue] = None,
+               nmos: Optional[str] = None, pmos: Optional[str] = None,
+               lib_type: Optional[str] = None) -> List[hammer_tech.Library]:
+        """
+        Get the libraries matching the given corner, in their original order.
+        Criteria which are None match any library; libraries which are missing an annotation never match a
+        criterion on that annotation.
+
+        :param VDD: Exact VDD annotation (e.g. "1.0 V").
+        :param GND: Exact GND annotation (e.g. "0 V").
+        :param temperature: Temperature of the corner.
+        :param voltage: Voltage of the corner, compared against the VDD annotation.
+        :param nmos: NMOS corner (e.g. "slow").
+        :param pmos: PMOS corner (e.g. "slow").
+        :param lib_type: Type which the library must provide (e.g. "stdcell").
+        :return: Matching libraries.
+        """
+        ids = self._select_ids((VDD, GND, temperature, voltage, nmos, pmos, lib_type))
+        return [lib for lib in self.libraries if id(lib) in ids]
+
+    def matches(self, lib: hammer_tech.Library, VDD: Optional[str] = None, GND: Optional[str] = None,
+                temperature: Optional[TemperatureValue] = None, voltage: Optional[VoltageValue] = None,
+                nmos: Optional[str] = None, pmos: Optional[str] = None, lib_type: Optional[str] = None) -> bool:
+        """
+        Check if the given library matches the given corner (see select()).
+
+        :param lib: Library, which must be in the index.
+        """
+        if lib not in self:
+            raise ValueError("Library {lib} is not in the index".format(lib=lib))
+        return id(lib) in self._select_ids((VDD, GND, temperature, voltage, nmos, pmos, lib_type))
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  slot_manager.py
+#  Limits the number of concurrent tool launches (e.g. license seats and cores), possibly across processes.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+from abc import ABCMeta, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+import fcntl
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+__all__ = ['SlotBackend', 'LocalSlotBackend', 'FlockSlotBackend', 'SlotWait', 'SlotStatistics', 'SlotManager',
+           'register_slot_backend', 'make_slot_backend', 'shared_slot_manager']
+
+
+class SlotBackend(metaclass=ABCMeta):
+    """
+    Pool of named tokens (e.g. {"innovus": 2, "cores": 16}).
+    Tokens which have no limit are always available.
+    """
+
+    def __init__(self, limits: Dict[str, int]) -> None:
+        """
+        :param limits: Number of each token in the pool.
+        """
+        self.limits = dict(limits)  # type: Dict[str, int]
+
+    def check_request(self, tokens: Dict[str, int]) -> Dict[str, int]:
+        """
+        Get the limited tokens of the given request, checking that the request can ever be satisfied.
+
+        :param tokens: Number of each token requested.
+        :return: Number of each limited token requested.
+        """
+        limited = {name: count for name, count in tokens.items() if name in self.limits and count > 0}
+        for name, count in limited.items():
+            if count > self.limits[name]:
+                raise ValueError("Requested {count} of token {name} but only {limit} exist".format(
+                    count=count, name=name, limit=self.limits[name]))
+        return limited
+
+    @abstractmethod
+    def acquire(self, tokens: Dict[str, int]) -> Any:
+        """
+        Wait until the given tokens are available and take them.
+        Requests are served roughly in the order they were made, so large requests are not starved by small ones.
+
+        :param tokens: Number of each token requested.
+        :return: Handle to pass to release().
+        """
+        pass
+
+    @abstractmethod
+    def release(self, handle: Any) -> None:
+        """
+        Return the tokens taken by acquire().
+
+        :param handle: Handle returned by acquire().
+        """
+        pass
+
+
+class LocalSlotBackend(SlotBackend):
+    """
+    Pool of tokens shared by the threads of this process (e.g. concurrent steps).
+    Requests are served first-come first-served.
+    """
+
+    def __init__(self, limits: Dict[str, int]) -> None:
+        super().__init__(limits)
+        self._available = dict(self.limits)  # type: Dict[str, int]
+        self._queue = deque()  # type: Deque[object]
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens: Dict[str, int]) -> Any:
+        limited = self.check_request(tokens)
+        ticket = object()
+        with self._condition:
+            self._queue.append(ticket)
+            try:
+                self._condition.wait_for(lambda: self._queue[0] is ticket and all(
+                    self._available[name] >= count for name, count in limited.items()))
+            finally:
+                self._queue.remove(ticket)
+                self._condition.notify_all()
+            for name, count in limited.items():
+                self._available[name] -= count
+        return limited
+
+    def release(self, handle: Any) -> None:
+        with self._condition:
+            for name, count in handle.items():
+                self._available[name] += count
+            self._condition.notify_all()
+
+
+class FlockSlotBackend(SlotBackend):
+    """
+    Pool of tokens shared by all processes (and threads) using the same directory, e.g. several hammer-vlsi flows on
+    one machine or on machines sharing a filesystem with working flock().
+    Each token is a lock file (<name>.<i>.slot), so tokens held by a process which dies are released by the OS.
+    Requests wait in line for a queue lock, and only the request at the head of the line takes tokens.
+    """
+
+    def __init__(self, limits: Dict[str, int], directory: str, poll_interval: float = 0.5) -> None:
+        """
+        :param directory: Directory of the lock files, which is created if necessary.
+        :param poll_interval: Time to wait between attempts to take the tokens in seconds.
+        """
+        super().__init__(limits)
+        if directory == "":
+            raise ValueError("The flock slot backend needs a directory for its lock files (vlsi.core.slots.directory)")
+        self.directory = directory  # type: str
+        self.poll_interval = poll_interval  # type: float
+        os.makedirs(directory, exist_ok=True)
+
+    def _open(self, filename: str) -> int:
+        return os.open(os.path.join(self.directory, filename), os.O_RDWR | os.O_CREAT, 0o666)
+
+    def _try_take(self, limited: Dict[str, int]) -> Optional[List[int]]:
+        """Take the given tokens without waiting, or return None if they are not all available."""
+        taken = []  # type: List[int]
+        for name, count in sorted(limited.items()):
+            taken_of_token = 0
+            for i in range(self.limits[name]):
+                if taken_of_token == count:
+                    break
+                fd = self._open("{name}.{i}.slot".format(name=name, i=i))
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                taken.append(fd)
+                taken_of_token += 1
+            if taken_of_token < count:
+                for fd in taken:
+                    os.close(fd)
+                return None
+        return taken
+
+    def acquire(self, tokens: Dict[str, int]) -> Any:
+        limited = self.check_request(tokens)
+        if len(limited) == 0:
+            return []
+        queue_fd = self._open("queue.lock")
+        try:
+            fcntl.flock(queue_fd, fcntl.LOCK_EX)
+            while True:
+                taken = self._try_take(limited)
+                if taken is not None:
+                    return taken
+                time.sleep(self.poll_interval)
+        finally:
+            # Closing the file releases the queue lock.
+            os.close(queue_fd)
+
+    def release(self, handle: Any) -> None:
+        for fd in handle:
+            os.close(fd)
+
+
+# Factories of the slot backends by name, taking the limits and the directory.
+_slot_backends = {
+    "local": lambda limits, directory: LocalSlotBackend(limits),
+    "flock": lambda limits, directory: FlockSlotBackend(limits, directory)
+}  # type: Dict[str, Callable[[Dict[str, int], str], SlotBackend]]
+
+
+def register_slot_backend(name: str, factory: Callable[[Dict[str, int], str], SlotBackend]) -> None:
+    """
+    Register a slot backend which can be selected with vlsi.core.slots.backend.
+
+    :param name: Name of the backend.
+    :param factory: Function taking the limits and the directory (vlsi.core.slots.directory) and returning the backend.
+    """
+    _slot_backends[name] = factory
+
+
+def make_slot_backend(name: str, limits: Dict[str, int], directory: str) -> SlotBackend:
+    """
+    Create the slot backend with the given name (e.g. "local" or "flock").
+    """
+    if name not in _slot_backends:
+        raise ValueError("Unknown slot backend {name}; must be one of {names}".format(
+            name=name, names=", ".join(sorted(_slot_backends.keys()))))
+    return _slot_backends[name](limits, directory)
+
+
+class SlotWait(NamedTuple('SlotWait', [
+    ('tokens', Dict[str, int]),
+    ('wait_time', float)
+])):
+    """
+    Tokens taken from a SlotManager and the time spent waiting for them in seconds.
+    """
+    __slots__ = ()
+
+
+class SlotStatistics(NamedTuple('SlotStatistics', [
+    ('requests', int),
+    ('total_wait_time', float),
+    ('max_wait_time', float)
+])):
+    """
+    Number of requests for a token and the time spent waiting for them in seconds.
+    """
+    __slots__ = ()
+
+
+class SlotManager:
+    """
+    Takes tokens from a SlotBackend for the duration of a tool launch and keeps track of the time spent waiting.
+    """
+
+    def __init__(self, backend: SlotBackend) -> None:
+        self.backend = backend  # type: SlotBackend
+        self._lock = threading.Lock()
+        self._waits = []  # type: List[SlotWait]
+
+    @contextmanager
+    def slots(self, tokens: Dict[str, int]) -> Iterator[float]:
+        """
+        Take the given tokens, waiting for them if necessary, and return them on exit.
+
+        :param tokens: Number of each token to take (e.g. {"innovus": 1, "cores": 8}).
+        :return: Context manager yielding the time spent waiting in seconds.
+        """
+        tokens = {name: count for name, count in tokens.items() if count > 0}
+        start = time.monotonic()
+        handle = self.backend.acquire(tokens)
+        wait_time = time.monotonic() - start
+        with self._lock:
+            self._waits.append(SlotWait(tokens=tokens, wait_time=wait_time))
+        try:
+            yield wait_time
+        finally:
+            self.backend.release(handle)
+
+    @property
+    def waits(self) -> List[SlotWait]:
+        """All requests made so far, in order."""
+        with self._lock:
+            return list(self._waits)
+
+    def statistics(self) -> Dict[str, SlotStatistics]:
+        """Get the number of requests and wait times of each token."""
+        stats = {}  # type: Dict[str, SlotStatistics]
+        for wait in self.waits:
+            for name in wait.tokens:
+                old = stats.get(name, SlotStatistics(requests=0, total_wait_time=0.0, max_wait_time=0.0))
+                stats[name] = SlotStatistics(
+                    requests=old.requests + 1,
+                    total_wait_time=old.total_wait_time + wait.wait_time,
+                    max_wait_time=max(old.max_wait_time, wait.wait_time)
+                )
+        return stats
+
+
+_shared_slot_managers = {}  # type: Dict[Tuple[str, str, Tuple[Tuple[str, int], ...]], SlotManager]
+_shared_slot_managers_lock = threading.Lock()
+
+
+def shared_slot_manager(backend: str, limits: Dict[str, int], directory: str) -> SlotManager:
+    """
+    Get the SlotManager of this process with the given backend, limits and directory, so that all tools in the
+    process share the same pool.
+    """
+    key = (backend, directory, tuple(sorted(limits.items())))
+    with _shared_slot_managers_lock:
+        if key not in _shared_slot_managers:
+            _shared_slot_managers[key] = SlotManager(make_slot_backend(backend, limits, directory))
+        return _shared_slot_managers[key]
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  step_manifest.py
+#  Records fingerprints of tool steps in a run_dir so that unchanged steps can be skipped.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import hashlib
+import json
+import os
+import threading
+import types
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+from hammer_utils import write_file_atomically
+
+__all__ = ['StepFingerprint', 'StepManifest']
+
+
+def hash_value(value: Any) -> str:
+    """Hash a JSON-like value (e.g. a setting)."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _update_code_hash(sha: Any, code: types.CodeType) -> None:
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode("utf-8"))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _update_code_hash(sha, const)
+        else:
+            sha.update(repr(const).encode("utf-8"))
+
+
+def hash_function(func: Callable) -> str:
+    """
+    Hash the code of the given function, so that it stays the same across runs until the code is changed.
+    Functions and bound methods which the function closes over (e.g. the method wrapped by
+    HammerTool.make_step_from_method) are included.
+    """
+    sha = hashlib.sha256()
+    pending = [func]  # type: List[Any]
+    while len(pending) > 0:
+        f = pending.pop(0)
+        if isinstance(f, types.MethodType):
+            f = f.__func__
+        code = getattr(f, "__code__", None)
+        if code is None:
+            sha.update(repr(getattr(f, "__qualname__", type(f).__qualname__)).encode("utf-8"))
+            continue
+        sha.update(f.__qualname__.encode("utf-8"))
+        _update_code_hash(sha, code)
+        for cell in f.__closure__ or ():
+            try:
+                contents = cell.cell_contents
+            except ValueError:
+                continue
+            if isinstance(contents, (types.FunctionType, types.MethodType)) and contents is not f:
+                pending.append(contents)
+    return sha.hexdigest()
+
+
+class StepFingerprint(NamedTuple('StepFingerprint', [
+    # Hash of the step function and the tool (class and version)
+    ('code', str),
+    # Hash of the value of each setting which the step read
+    ('settings', Dict[str, str]),
+    # Hash of the contents of each input file of the tool
+    ('input_files', Dict[str, Optional[str]]),
+    # Hash of the outputs of each step which the step depends on
+    ('dependencies', Dict[str, str])
+])):
+    """
+    Everything which a step's results depend on.
+    """
+    __slots__ = ()
+
+    def to_setting(self) -> dict:
+        return {
+            "code": self.code,
+            "settings": self.settings,
+            "input_files": self.input_files,
+            "dependencies": self.dependencies
+        }
+
+    @staticmethod
+    def from_setting(d: dict) -> "StepFingerprint":
+        return StepFingerprint(
+            code=str(d["code"]),
+            settings=dict(d["settings"]),
+            input_files=dict(d["input_files"]),
+            dependencies=dict(d["dependencies"])
+        )
+
+    def diff(self, previous: "StepFingerprint") -> Optional[str]:
+        """
+        Explain how this fingerprint differs from a previous one.
+
+        :return: Reason for the difference, or None if they are the same.
+        """
+        if self.code != previous.code:
+            return "step or tool changed"
+        hashes = [("setting", self.settings, previous.settings),
+                  ("input file", self.input_files, previous.input_files),
+                  ("dependency", self.dependencies, previous.dependencies)
+                  ]  # type: List[Tuple[str, Mapping[str, Optional[str]], Mapping[str, Optional[str]]]]
+        for kind, current, old in hashes:
+            for key in sorted(set(current.keys()) | set(old.keys())):
+                if current.get(key) != old.get(key):
+                    return "{kind} {key} changed".format(kind=kind, key=key)
+        return None
+
+
+class StepManifest:
+    """
+    Manifest of the steps run in a run_dir (step-manifest.json): the fingerprint and outputs of each step which
+    completed, and why each step in the last run was run or skipped.
+    The outputs of a step are the files in the run_dir which it created or modified.
+    """
+
+    FILENAME = "step-manifest.json"
+
+    def __init__(self, run_dir: str, ignored_files: Optional[List[str]] = None) -> None:
+        """
+        :param run_dir: Run directory of the tool.
+        :param ignored_files: Files in the run_dir which are never outputs of a step (e.g. database dumps).
+        """
+        self.run_dir = run_dir  # type: str
+        self.path = os.path.join(run_dir, self.FILENAME)  # type: str
+        self.ignored_files = {self.path} | set(ignored_files or [])
+        self._lock = threading.Lock()
+        # Step name -> {"fingerprint": ..., "outputs": {path: hash}}
+        self.steps = {}  # type: Dict[str, dict]
+        # Path -> (mtime_ns, size, hash) to avoid re-hashing unchanged files.
+        self._file_hashes = {}  # type: Dict[str, Tuple[int, int, str]]
+        try:
+            with open(self.path, "r") as f:
+                manifest = json.load(f)
+            self.steps = dict(manifest["steps"])
+            self._file_hashes = {path: tuple(entry) for path, entry in manifest["file_hashes"].items()}  # type: ignore
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Missing or unreadable manifest: everything is out of date.
+            pass
+        # Decisions made in this run, in order.
+        self.decisions = []  # type: List[Dict[str, Any]]
+
+    def file_hash(self, path: str) -> Optional[str]:
+        """
+        Get the hash of the contents of the given file.
+
+        :return: The hash, or None if the file does not exist.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._file_hashes.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        sha = hashlib.sha256()
+        try:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(chunk)
+        except OSError:
+            return None
+        with self._lock:
+            self._file_hashes[path] = (st.st_mtime_ns, st.st_size, sha.hexdigest())
+        return sha.hexdigest()
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """Get the (mtime, size) of every file in the run_dir, except the manifest and the ignored files."""
+        files = {}  # type: Dict[str, Tuple[int, int]]
+        for root, _, filenames in os.walk(self.run_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                if path in self.ignored_files or filename.startswith("." + self.FILENAME):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files[path] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def output_hash(self, name: str) -> str:
+        """Get a hash of the recorded outputs of the given step (or of the step's absence)."""
+        with self._lock:
+            entry = self.steps.get(name)
+        return hash_value(None if entry is None else entry["outputs"])
+
+    def check(self, name: str, fingerprint: StepFingerprint) -> Optional[str]:
+        """
+        Check if the given step is up to date.
+
+        :param name: Name of the step.
+        :param fingerprint: Current fingerprint of the step.
+        :return: Reason why the step must be run, or None if its fingerprint and outputs are unchanged.
+        """
+        with self._lock:
+            entry = self.steps.get(name)
+        if entry is None:
+            return "no record of a previous run"
+        try:
+            reason = fingerprint.diff(StepFingerprint.from_setting(entry["fingerprint"]))
+        except (KeyError, TypeError, ValueError):
+            return "unreadable record of a previous run"
+        if reason is not None:
+            return reason
+        for path, output_hash in sorted(entry["outputs"].items()):
+            if self.file_hash(path) != output_hash:
+                return "output {path} changed or is missing".format(path=path)
+        return None
+
+    def record_step(self, name: str, fingerprint: StepFingerprint, outputs: List[str]) -> None:
+        """
+        Record a step which completed successfully.
+
+        :param name: Name of the step.
+        :param fingerprint: Fingerprint of the step when it ran.
+        :param outputs: Files which the step created or modified.
+        """
+        output_hashes = {path: self.file_hash(path) for path in outputs}
+        with self._lock:
+            self.steps[name] = {
+                "fingerprint": fingerprint.to_setting(),
+                "outputs": {path: h for path, h in output_hashes.items() if h is not None}
+            }
+
+    def forget_step(self, name: str) -> None:
+        """Forget the given step (e.g. because it failed)."""
+        with self._lock:
+            self.steps.pop(name, None)
+
+    def record_decision(self, name: str, ran: bool, reason: str) -> None:
+        """
+        Record whether the given step was run in this run and why.
+        """
+        with self._lock:
+            self.decisions.append({"step": name, "ran": ran, "reason": reason})
+
+    def save(self) -> None:
+        """Write the manifest to the run_dir."""
+        with self._lock:
+            # Only keep the hashes of files which are still referenced.
+            referenced = set()  # type: set
+            for entry in self.steps.values():
+                referenced.update(entry["outputs"].keys())
+                referenced.update(entry["fingerprint"]["input_files"].keys())
+            manifest = {
+                "steps": self.steps,
+                "decisions": self.decisions,
+                "file_hashes": {path: h for path, h in self._file_hashes.items() if path in referenced}
+            }
+            contents = json.dumps(manifest, sort_keys=True, indent=4, separators=(',', ': '))
+        write_file_atomically(self.path, contents.encode("utf-8"))
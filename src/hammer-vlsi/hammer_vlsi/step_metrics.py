@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  step_metrics.py
+#  Resource usage (wall/CPU time, memory, output) of tool steps and their subprocesses.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import json
+import resource
+from typing import Any, Dict, List, NamedTuple
+
+from hammer_utils import write_file_atomically
+
+from .subprocess_executor import SubprocessResult
+
+__all__ = ['SubprocessMetrics', 'StepMetrics', 'thread_rusage', 'write_step_metrics']
+
+
+def thread_rusage() -> Any:
+    """
+    Get the resource usage of the current thread if the platform supports it (Linux), else of the whole process.
+    """
+    return resource.getrusage(getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF))
+
+
+class SubprocessMetrics(NamedTuple('SubprocessMetrics', [
+    ('args', List[str]),
+    ('returncode', int),
+    ('wall_time', float),
+    ('user_time', float),
+    ('system_time', float),
+    ('max_rss_kb', int),
+    ('output_bytes', int),
+    ('slot_wait_time', float)
+])):
+    """
+    Resource usage of a subprocess (e.g. from HammerTool.run_executable).
+    Times are in seconds; max_rss_kb is the peak resident memory of the subprocess (kilobytes on Linux) and
+    slot_wait_time is the time spent waiting for slots (e.g. licenses) before launching it (see SlotManager).
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def from_result(result: SubprocessResult, slot_wait_time: float = 0.0) -> "SubprocessMetrics":
+        return SubprocessMetrics(
+            args=list(result.args),
+            returncode=result.returncode,
+            wall_time=result.elapsed,
+            user_time=result.rusage.ru_utime,
+            system_time=result.rusage.ru_stime,
+            max_rss_kb=result.rusage.ru_maxrss,
+            output_bytes=result.output_size,
+            slot_wait_time=slot_wait_time
+        )
+
+    def to_setting(self) -> dict:
+        return dict(self._asdict())
+
+
+class StepMetrics(NamedTuple('StepMetrics', [
+    ('name', str),
+    ('ran', bool),
+    ('wall_time', float),
+    ('user_time', float),
+    ('system_time', float),
+    ('max_rss_kb', int),
+    ('subprocesses', List[SubprocessMetrics])
+])):
+    """
+    Resource usage of a tool step.
+    ran is False if the step was skipped (e.g. in incremental mode). user_time and system_time are the CPU time used
+    by hammer-vlsi itself while running the step, and max_rss_kb is the peak resident memory of hammer-vlsi so far
+    (kilobytes on Linux). The subprocesses run by the step are accounted separately.
+    """
+    __slots__ = ()
+
+    @property
+    def children_user_time(self) -> float:
+        return sum(p.user_time for p in self.subprocesses)
+
+    @property
+    def children_system_time(self) -> float:
+        return sum(p.system_time for p in self.subprocesses)
+
+    @property
+    def children_max_rss_kb(self) -> int:
+        return max([p.max_rss_kb for p in self.subprocesses], default=0)
+
+    @property
+    def output_bytes(self) -> int:
+        return sum(p.output_bytes for p in self.subprocesses)
+
+    def to_setting(self) -> dict:
+        return {
+            "name": self.name,
+            "ran": self.ran,
+            "wall_time": self.wall_time,
+            "user_time": self.user_time,
+            "system_time": self.system_time,
+            "max_rss_kb": self.max_rss_kb,
+            "children_user_time": self.children_user_time,
+            "children_system_time": self.children_system_time,
+            "children_max_rss_kb": self.children_max_rss_kb,
+            "output_bytes": self.output_bytes,
+            "subprocesses": [p.to_setting() for p in self.subprocesses]
+        }
+
+
+def write_step_metrics(path: str, steps: List[StepMetrics], other_subprocesses: List[SubprocessMetrics]) -> None:
+    """
+    Write the given metrics as JSON, along with totals.
+
+    :param path: Path to write to (e.g. <run_dir>/step-metrics.json).
+    :param steps: Metrics of the steps.
+    :param other_subprocesses: Subprocesses which were not run by a step.
+    """
+    subprocesses = [p for step in steps for p in step.subprocesses] + other_subprocesses
+    totals = {
+        "wall_time": sum(step.wall_time for step in steps),
+        "user_time": sum(step.user_time for step in steps),
+        "system_time": sum(step.system_time for step in steps),
+        "max_rss_kb": max([step.max_rss_kb for step in steps], default=0),
+        "children_user_time": sum(p.user_time for p in subprocesses),
+        "children_system_time": sum(p.system_time for p in subprocesses),
+        "children_max_rss_kb": max([p.max_rss_kb for p in subprocesses], default=0),
+        "output_bytes": sum(p.output_bytes for p in subprocesses),
+        "slot_wait_time": sum(p.slot_wait_time for p in subprocesses)
+    }  # type: Dict[str, Any]
+    contents = json.dumps({
+        "steps": [step.to_setting() for step in steps],
+        "other_subprocesses": [p.to_setting() for p in other_subprocesses],
+        "total": totals
+    }, indent=4, separators=(',', ': '))
+    write_file_atomically(path, contents.encode("utf-8"))
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  subprocess_executor.py
+#  Runs (possibly several concurrent) subprocesses while streaming their output.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import atexit
+import os
+import selectors
+import subprocess
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
+__all__ = ['SubprocessCommand', 'SubprocessResult', 'SubprocessExecutor']
+
+# Subprocesses which are still running, killed if hammer-vlsi exits before they finish.
+_running_processes = set()  # type: Set[subprocess.Popen]
+_running_processes_lock = threading.Lock()
+
+
+def _kill_running_processes() -> None:
+    with _running_processes_lock:
+        processes = list(_running_processes)
+    for proc in processes:
+        try:
+            proc.kill()
+        except OSError:
+            pass
+
+
+atexit.register(_kill_running_processes)
+
+
+def _exit_code(status: int) -> int:
+    """Convert a wait status to a return code like subprocess.Popen.returncode (negative for signals)."""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+class SubprocessCommand(NamedTuple('SubprocessCommand', [
+    ('args', List[str]),
+    ('cwd', Optional[str]),
+    ('env', Optional[Dict[str, str]]),
+    ('line_callback', Optional[Callable[[str], None]])
+])):
+    """
+    A subprocess to run.
+    args is the command-line (the first token is the command), cwd and env are passed to subprocess.Popen, and
+    line_callback (if not None) is called with each line of output (without the trailing newline).
+    """
+    __slots__ = ()
+
+
+class SubprocessResult(NamedTuple('SubprocessResult', [
+    ('args', List[str]),
+    ('returncode', int),
+    ('rusage', Any),
+    ('output', str),
+    ('output_size', int),
+    ('elapsed', float)
+])):
+    """
+    Result of a finished subprocess.
+    returncode is negative if the subprocess was killed by a signal, rusage is the resource.struct_rusage of the
+    subprocess, output is the (possibly truncated) tail of the combined stdout/stderr, output_size is the total number
+    of bytes of output and elapsed is the wall-clock time in seconds.
+    """
+    __slots__ = ()
+
+    @property
+    def succeeded(self) -> bool:
+        return self.returncode == 0
+
+    @property
+    def output_truncated(self) -> bool:
+        return len(self.output.encode("utf-8")) < self.output_size
+
+
+class _RunningSubprocess:
+    """State of a running subprocess in SubprocessExecutor."""
+
+    def __init__(self, command: SubprocessCommand, proc: subprocess.Popen, capture_limit: int,
+                 max_line_length: int) -> None:
+        self.command = command
+        self.proc = proc
+        self.capture_limit = capture_limit
+        self.max_line_length = max_line_length
+        self.start = time.monotonic()
+        self.capture = bytearray()
+        self.partial_line = bytearray()
+        self.output_size = 0
+
+    def add_output(self, chunk: bytes) -> None:
+        self.output_size += len(chunk)
+        self.capture += chunk
+        if len(self.capture) > self.capture_limit:
+            del self.capture[:len(self.capture) - self.capture_limit]
+        if self.command.line_callback is not None:
+            self.partial_line += chunk
+            lines = self.partial_line.split(b"\n")
+            self.partial_line = bytearray(lines.pop())
+            for line in lines:
+                self.command.line_callback(line.decode("utf-8", errors="replace").rstrip())
+            if len(self.partial_line) > self.max_line_length:
+                self.flush_line()
+
+    def flush_line(self) -> None:
+        if self.command.line_callback is not None and len(self.partial_line) > 0:
+            self.command.line_callback(self.partial_line.decode("utf-8", errors="replace").rstrip())
+        self.partial_line = bytearray()
+
+    def finish(self) -> SubprocessResult:
+        """Reap the subprocess (once its output is closed) and get its result."""
+        self.flush_line()
+        _, status, rusage = os.wait4(self.proc.pid, 0)
+        # Tell Popen that the process was already reaped.
+        self.proc.returncode = _exit_code(status)
+        with _running_processes_lock:
+            _running_processes.discard(self.proc)
+        return SubprocessResult(
+            args=list(self.command.args),
+            returncode=self.proc.returncode,
+            rusage=rusage,
+            output=self.capture.decode("utf-8", errors="replace"),
+            output_size=self.output_size,
+            elapsed=time.monotonic() - self.start
+        )
+
+
+class SubprocessExecutor:
+    """
+    Runs subprocesses and streams their combined stdout/stderr in large chunks using selectors, so that several
+    subprocesses can run concurrently from a single thread.
+    Only the tail of the output of each subprocess is kept (see capture_limit).
+    """
+
+    def __init__(self, capture_limit: int = 64 * 1024, chunk_size: int = 64 * 1024,
+                 max_line_length: int = 64 * 1024) -> None:
+        """
+        :param capture_limit: Maximum number of bytes of output kept for each subprocess.
+        :param chunk_size: Maximum number of bytes read at once.
+        :param max_line_length: Lines longer than this are passed to line_callback in pieces.
+        """
+        self.capture_limit = capture_limit  # type: int
+        self.chunk_size = chunk_size  # type: int
+        self.max_line_length = max_line_length  # type: int
+
+    def run(self, commands: List[SubprocessCommand]) -> List[SubprocessResult]:
+        """
+        Run the given commands concurrently and wait for all of them to finish.
+
+        :param commands: Commands to run.
+        :return: Results of the commands, in the same order as the commands.
+        """
+        running = []  # type: List[_RunningSubprocess]
+        with selectors.DefaultSelector() as selector:
+            try:
+                for command in commands:
+                    proc = subprocess.Popen(command.args, shell=False, stderr=subprocess.STDOUT,
+                                            stdout=subprocess.PIPE, env=command.env, cwd=command.cwd)
+                    with _running_processes_lock:
+                        _running_processes.add(proc)
+                    state = _RunningSubprocess(command, proc, self.capture_limit, self.max_line_length)
+                    running.append(state)
+                    assert proc.stdout is not None  # type checker technicality: stdout is a pipe
+                    os.set_blocking(proc.stdout.fileno(), False)
+                    selector.register(proc.stdout, selectors.EVENT_READ, state)
+
+                while len(selector.get_map()) > 0:
+                    for key, _ in selector.select():
+                        try:
+                            chunk = os.read(key.fd, self.chunk_size)
+                        except BlockingIOError:
+                            continue
+                        if len(chunk) == 0:
+                            selector.unregister(key.fileobj)
+                            key.fileobj.close()  # type: ignore
+                        else:
+                            key.data.add_output(chunk)
+            except BaseException:
+                for state in running:
+                    state.proc.kill()
+                    state.proc.wait()
+                    with _running_processes_lock:
+                        _running_processes.discard(state.proc)
+                raise
+        return [state.finish() for state in running]
+
+    def run_one(self, command: SubprocessCommand) -> SubprocessResult:
+        """Run the given command and wait for it to finish."""
+        return self.run([command])[0]
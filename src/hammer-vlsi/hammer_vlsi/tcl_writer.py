@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  tcl_writer.py
+#  Helpers to generate TCL scripts and to set variables in existing ones.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import os
+import re
+import stat
+import tempfile
+from typing import Dict, Iterable, List
+
+__all__ = ['tcl_escape', 'tcl_puts', 'TCLWriter', 'replace_tcl_sets']
+
+
+def tcl_escape(text: str) -> str:
+    """
+    Escape the given text for use inside a double-quoted TCL word, so that it is not substituted.
+    """
+    return re.sub(r'([\\"$\[\]])', r'\\\1', text)
+
+
+def tcl_puts(cmd: str) -> str:
+    """
+    Get a TCL command which prints the given command (e.g. before running it).
+    """
+    return """puts "{0}" """.format(tcl_escape(cmd))
+
+
+class TCLWriter:
+    """
+    Writes a TCL script to a file through a large buffer, one command at a time, instead of collecting the whole
+    script in memory first.
+    Has an append() method like a list, so it can be passed as the output_buffer of HammerTool.tcl_append() and
+    HammerTool.verbose_tcl_append(). The file contents are the same as "\\n".join() of the appended commands.
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 20) -> None:
+        """
+        :param path: Path of the script, which is overwritten.
+        :param buffer_size: Number of bytes buffered before writing to the file.
+        """
+        self.path = path  # type: str
+        self._file = open(path, "w", buffering=buffer_size)
+        self._first = True  # type: bool
+
+    def append(self, cmd: str) -> None:
+        """Write the given command."""
+        if not self._first:
+            self._file.write("\n")
+        self._file.write(cmd)
+        self._first = False
+
+    def extend(self, cmds: Iterable[str]) -> None:
+        """Write the given commands."""
+        for cmd in cmds:
+            self.append(cmd)
+
+    def verbose_append(self, cmd: str) -> None:
+        """Write the given command, preceded by a command which prints it."""
+        self.append(tcl_puts(cmd))
+        self.append(cmd)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "TCLWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+# Matches "set VARIABLE ..." lines, capturing the variable name and the rest of the line (i.e. the line ending).
+_tcl_set_regex = re.compile(r'^set +([^\s;]+)[^\r\n]*(.*)$', flags=re.DOTALL)
+
+
+def replace_tcl_sets(values: Dict[str, str], tcl_path: str, quotes: bool = True) -> None:
+    """
+    Replace the "set VARIABLE ..." lines of the given variables in the given TCL script with set VARIABLE "value", in
+    a single pass over the script.
+    The script is replaced atomically, and is left unchanged if any of the variables has no such line.
+
+    :param values: Value of each variable to replace.
+    :param tcl_path: Path to the TCL script.
+    :param quotes: (optional) Set to False to disable quoting of the values.
+    """
+    replacements = {}  # type: Dict[str, str]
+    for variable, value in values.items():
+        value_string = '"' + value + '"' if quotes else value
+        replacements[variable] = "set %s %s;" % (variable, value_string)
+
+    found = set()  # type: set
+    mode = stat.S_IMODE(os.stat(tcl_path).st_mode)
+    with open(tcl_path, "r", newline="") as source:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(tcl_path)),
+                                         prefix="." + os.path.basename(tcl_path) + ".")
+        try:
+            with os.fdopen(fd, "w", newline="") as dest:
+                os.chmod(temp_path, mode)
+                for line in source:
+                    match = _tcl_set_regex.match(line) if line.startswith("set") else None
+                    if match is not None and match.group(1) in replacements:
+                        found.add(match.group(1))
+                        line = replacements[match.group(1)] + match.group(2)
+                    dest.write(line)
+            missing = sorted(set(replacements.keys()) - found)  # type: List[str]
+            if len(missing) > 0:
+                raise ValueError("set %s line not found in tcl file %s!" % (", ".join(missing), tcl_path))
+            os.replace(temp_path, tcl_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
@@ -7,6 +7,8 @@
 #  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
 
 from abc import abstractmethod
+from functools import lru_cache
+import re
 import sys
 try:
     from abc import ABC
@@ -17,12 +19,42 @@ except ImportError:
         import abc
         ABC = abc.ABCMeta('ABC', (object,), {'__slots__': ()})  # type: ignore
 
-from typing import Optional, TypeVar, overload
+from typing import Optional, Tuple, TypeVar, overload
 
 from hammer_utils import get_or_else
 
 _TT = TypeVar('_TT', bound='ValueWithUnit')
 
+
+@lru_cache(maxsize=4096)
+def _parse_value(value: str, unit: str, unit_type: str, default_prefix: str) -> Tuple[float, float]:
+    """
+    Parse the given value string for ValueWithUnit.
+    Memoized since the same strings (e.g. library corners and supplies) get parsed over and over.
+
+    :return: Tuple of (number, prefix multiplier).
+    """
+    regex = r"^(-?[\d.]+) *(.*){}$".format(re.escape(unit))
+    m = re.search(regex, value)
+    if m is None:
+        try:
+            num = str(float(value))
+            value_prefix = default_prefix
+        except ValueError:
+            raise ValueError("Malformed {type} value {value}".format(type=unit_type, value=value))
+    else:
+        num = m.group(1)
+        value_prefix = m.group(2)
+
+    if num.count('.') > 1 or len(value_prefix) > 1:
+        raise ValueError("Malformed {type} value {value}".format(type=unit_type, value=value))
+
+    if value_prefix not in ValueWithUnit._prefix_table:
+        raise ValueError("Bad prefix for {value}".format(value=value))
+
+    return float(num), ValueWithUnit._prefix_table[value_prefix]
+
+
 class ValueWithUnit(ABC):
     """Represents some particular value that has units (e.g. "10 ns", "2000 um", "25 C", etc).
     """
@@ -76,31 +108,13 @@ class ValueWithUnit(ABC):
         :param prefix: If value does not have a prefix (e.g. "0.25"), then use the given prefix, or the default prefix
                        defined by the class if one is not specified.
         """
-        import re
-
         default_prefix = get_or_else(prefix, self.default_prefix)
 
-        regex = r"^(-?[\d.]+) *(.*){}$".format(re.escape(self.unit))
-        m = re.search(regex, value)
-        if m is None:
-            try:
-                num = str(float(value))
-                value_prefix = default_prefix
-            except ValueError:
-                raise ValueError("Malformed {type} value {value}".format(type=self.unit_type, value=value))
-        else:
-            num = m.group(1)
-            value_prefix = m.group(2)
-
-        if num.count('.') > 1 or len(value_prefix) > 1:
-            raise ValueError("Malformed {type} value {value}".format(type=self.unit_type, value=value))
+        num, value_prefix = _parse_value(value, self.unit, self.unit_type, default_prefix)
 
-        if value_prefix not in self._prefix_table:
-            raise ValueError("Bad prefix for {value}".format(value=value))
-
-        self._value = float(num)  # type: float
+        self._value = num  # type: float
         # Preserve the prefix too to preserve precision
-        self._prefix = self._prefix_table[value_prefix]  # type: float
+        self._prefix = value_prefix  # type: float
 
     @property
     def value(self) -> float:
@@ -153,6 +167,12 @@ class ValueWithUnit(ABC):
         """
         return self.eq(other)  # type: ignore
 
+    def __hash__(self) -> int:
+        """
+        Hash consistently with equality (values are immutable), so that values can be used in cache keys.
+        """
+        return hash((type(self), self.value_in_units(self.default_prefix)))
+
     def ne(self: _TT, other: _TT) -> bool:
         """
         Compare inequality of this value with another.
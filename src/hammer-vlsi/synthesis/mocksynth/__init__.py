@@ -40,6 +40,10 @@ class MockSynth(HammerSynthesisTool, DummyHammerTool):
         self.output_files = list(self.input_files)
         return True
 
+    def is_step_restartable(self, step: HammerToolStep) -> bool:
+        # Every step only writes its own file.
+        return True
+
     def step1(self) -> bool:
         try:
             with open(self.temp_file("step1.txt"), "w") as f:
@@ -10,6 +10,7 @@ import shutil
 from abc import abstractmethod, ABCMeta
 from numbers import Number
 
+import hammer_config
 import hammer_vlsi
 import hammer_tech
 from hammer_logging import Level, HammerVLSIFileLogger
@@ -19,10 +20,12 @@ from typing import Dict, List, TypeVar, Union, Optional, Callable, Any, Tuple
 
 import os
 import tempfile
+import threading
+import time
 import unittest
 
 from hammer_logging.test import HammerLoggingCaptureContext
-from hammer_utils import deepdict, deeplist
+from hammer_utils import cacheable_function, deepdict, deeplist, function_cache_key
 
 
 class HammerVLSILoggingTest(unittest.TestCase):
@@ -661,6 +664,476 @@ export lol=abc"cat"
 """.strip(), enter_script.strip()
         )
 
+    def test_tool_environment(self) -> None:
+        """
+        Test that the tool environment is computed once per database generation.
+        """
+        class Tool(hammer_vlsi.DummyHammerTool):
+            builds = 0
+
+            @property
+            def env_vars(self) -> Dict[str, str]:
+                Tool.builds += 1
+                return {"HAMMER_TEST_VAR": self.get_setting("test.value")}
+
+        test = Tool()
+        test.run_dir = tempfile.mkdtemp()
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"test.value": "one"}])
+        test.set_database(database)
+
+        env = test._subprocess_env
+        self.assertEqual(env["HAMMER_TEST_VAR"], "one")
+        test.create_enter_script()
+        self.assertEqual(test._subprocess_env, env)
+        self.assertIsNot(test._subprocess_env, env)
+        self.assertEqual(Tool.builds, 1)
+        # Deleted database dumps are written again.
+        os.remove(env["HAMMER_DATABASE"])
+        self.assertEqual(test._subprocess_env["HAMMER_DATABASE"], env["HAMMER_DATABASE"])
+        self.assertTrue(os.path.isfile(env["HAMMER_DATABASE"]))
+        diff = test.environment_diff()
+        self.assertEqual(diff["HAMMER_TEST_VAR"], (None, "one"))
+        self.assertEqual(diff["HAMMER_DATABASE"], (None, os.path.join(test.run_dir, "config_db_tmp.json")))
+        self.assertTrue(all(key.startswith("HAMMER") for key in diff))
+        # The base environment is only rebuilt when the cache is cleared (e.g. by run()).
+        os.environ["HAMMER_TEST_PARENT_VAR"] = "parent"
+        try:
+            self.assertNotIn("HAMMER_TEST_PARENT_VAR", test._subprocess_env)
+            test.get_generation_cache("environment").clear()
+            self.assertEqual(test._subprocess_env["HAMMER_TEST_PARENT_VAR"], "parent")
+        finally:
+            del os.environ["HAMMER_TEST_PARENT_VAR"]
+        self.assertEqual(Tool.builds, 2)
+
+        test.set_setting("test.value", "two")
+        self.assertEqual(test._subprocess_env["HAMMER_TEST_VAR"], "two")
+        self.assertEqual(Tool.builds, 3)
+        shutil.rmtree(test.run_dir)
+
+    def test_get_tool_settings(self) -> None:
+        class Tool(hammer_vlsi.DummyHammerTool):
+            def tool_config_prefix(self) -> str:
+                return "synthesis.mytool"
+
+        test = Tool()
+        database = hammer_config.HammerDatabase()
+        database.update_project([{
+            "synthesis.mytool.version": "1.0",
+            "synthesis.mytool.threads": None,
+            "synthesis.mytool2.version": "2.0",
+            "synthesis.inputs.top_module": "top"
+        }])
+        test.set_database(database)
+        self.assertEqual(test.get_tool_settings(), {"version": "1.0", "threads": "null"})
+        self.assertEqual(test.get_settings_with_prefix("synthesis.inputs.", nullvalue=""),
+                         {"synthesis.inputs.top_module": "top"})
+
+    def test_dump_database_if_changed(self) -> None:
+        """
+        Test that the database is only re-dumped when it changes.
+        """
+        test = hammer_vlsi.DummyHammerTool()
+        test.run_dir = tempfile.mkdtemp()
+        database = hammer_config.HammerDatabase()
+        database.update_project([{"a": "1"}])
+        test.set_database(database)
+
+        path = test.dump_database()
+        inode = os.stat(path).st_ino
+        with open(path, "r") as f:
+            self.assertEqual(json.loads(f.read()), {"a": "1"})
+
+        # Unchanged database: nothing is rewritten.
+        self.assertEqual(test.dump_database(), path)
+        self.assertEqual(os.stat(path).st_ino, inode)
+
+        # Database changed but with the same contents: nothing is rewritten either.
+        database.set_setting("a", "1")
+        test.dump_database()
+        self.assertEqual(os.stat(path).st_ino, inode)
+
+        # Changed contents are written (atomically, i.e. to a new file).
+        database.set_setting("a", "2")
+        test.dump_database()
+        self.assertNotEqual(os.stat(path).st_ino, inode)
+        with open(path, "r") as f:
+            self.assertEqual(json.loads(f.read()), {"a": "2"})
+
+        # Files modified or removed behind our back are rewritten.
+        os.remove(path)
+        test.dump_database()
+        with open(path, "r") as f:
+            self.assertEqual(json.loads(f.read()), {"a": "2"})
+        snapshot_path = test.dump_database_snapshot()
+        with hammer_config.HammerDatabaseSnapshot(snapshot_path) as snapshot:
+            self.assertEqual(snapshot.get_setting("a"), "2")
+        self.assertEqual(sorted(os.listdir(test.run_dir)), ["config_db_tmp.hdb", "config_db_tmp.json"])
+        shutil.rmtree(test.run_dir)
+
+    def test_library_selection_cache(self) -> None:
+        """
+        Test that library selections are cached per database generation.
+        """
+        class Lib:
+            def __init__(self, path: str, temp: str) -> None:
+                self.path = path
+                self.temp = temp
+
+        class Technology:
+            def prepend_dir_path(self, path: str, lib: Any) -> str:
+                return "/tech/" + path
+
+        class Tool(hammer_vlsi.DummyHammerTool):
+            loads = 0
+
+            def get_available_libraries(self) -> List[Any]:
+                Tool.loads += 1
+                return [Lib("a.lib", "25 C"), Lib("b.lib", "125 C")]
+
+        def temp_filter(temp: hammer_vlsi.units.TemperatureValue) -> Callable[[Any], bool]:
+            return cacheable_function(lambda lib: hammer_vlsi.units.TemperatureValue(lib.temp) == temp)
+
+        test = Tool()
+        test.technology = Technology()  # type: ignore
+        database = hammer_config.HammerDatabase()
+        test.set_database(database)
+
+        def select(temp: str) -> List[str]:
+            return test.filter_and_select_libs(lib_filters=[temp_filter(hammer_vlsi.units.TemperatureValue(temp))],
+                                               extraction_func=cacheable_function(lambda lib: [lib.path]))
+
+        self.assertEqual(select("25 C"), ["/tech/a.lib"])
+        self.assertEqual(select("25 C"), ["/tech/a.lib"])
+        self.assertEqual(select("125 C"), ["/tech/b.lib"])
+        self.assertEqual(Tool.loads, 2)
+        self.assertEqual((test.library_cache_stats.hits, test.library_cache_stats.misses), (1, 2))
+
+        # LibraryFilters only mark their functions as cacheable if asked to.
+        uncached_filter = hammer_vlsi.LibraryFilter.new("path", "Path", is_file=True,
+                                                        extraction_func=lambda lib: [lib.path])
+        self.assertIsNone(function_cache_key(uncached_filter.extraction_func))
+        cached_filter = hammer_vlsi.LibraryFilter.new("path", "Path", is_file=True,
+                                                      extraction_func=lambda lib: [lib.path], cacheable=True)
+        self.assertIsNotNone(function_cache_key(cached_filter.extraction_func))
+
+        database.set_setting("foo", "bar")
+        self.assertEqual(select("25 C"), ["/tech/a.lib"])
+        self.assertEqual(Tool.loads, 3)
+
+        # Functions which are not marked as cacheable are called every time.
+        for _ in range(2):
+            self.assertEqual(test.filter_and_select_libs(lib_filters=[lambda lib: lib.temp == "125 C"],
+                                                         extraction_func=lambda lib: [lib.path]), ["/tech/b.lib"])
+        self.assertEqual(Tool.loads, 5)
+
+    def test_library_corner_index(self) -> None:
+        """
+        Test that library selection by corner and supplies uses the library index.
+        """
+        def make_lib(name: str, VDD: str, temp: str) -> hammer_tech.Library:
+            return hammer_tech.HammerTechnology.parse_library({
+                "nldm liberty file": name,
+                "corner": {"nmos": "slow", "pmos": "slow", "temperature": temp},
+                "supplies": {"VDD": VDD, "GND": "0 V"},
+                "provides": [{"lib_type": "stdcell"}]
+            })
+
+        libs = [make_lib("a.lib", "0.9 V", "125 C"), make_lib("b.lib", "0.9 V", "125 C"),
+                make_lib("c.lib", "1.0 V", "25 C"), hammer_tech.HammerTechnology.parse_library({"nldm liberty file": "d.lib"})]
+
+        class Technology:
+            tech_defined_libraries = libs
+
+        test = hammer_vlsi.DummyHammerTool()
+        test.logger = HammerVLSILogging.context("")
+        test.technology = Technology()  # type: ignore
+        database = hammer_config.HammerDatabase()
+        database.update_project([{"vlsi.inputs.supplies.VDD": "1.0 V", "vlsi.inputs.supplies.GND": "0 V"}])
+        test.set_database(database)
+
+        index = test.get_library_index()
+        self.assertIs(index, test.get_library_index())
+        self.assertEqual(len(index.keys), 3)
+        self.assertEqual(index.select(temperature=hammer_vlsi.units.TemperatureValue("125 C"),
+                                      voltage=hammer_vlsi.units.VoltageValue("900 mV")), libs[0:2])
+        self.assertEqual(index.select(lib_type="stdcell", nmos="slow"), libs[0:3])
+        self.assertEqual(index.select(lib_type="sram"), [])
+
+        mmmc_filter = test.filter_for_mmmc(voltage=hammer_vlsi.units.VoltageValue("1.0 V"),
+                                           temp=hammer_vlsi.units.TemperatureValue("25 C"))
+        self.assertEqual([lib for lib in libs if mmmc_filter(lib)], [libs[2]])
+        self.assertEqual([lib for lib in libs if test.filter_for_supplies(lib)], libs[2:4])
+        # Libraries which are not in the index are checked directly.
+        self.assertTrue(mmmc_filter(make_lib("e.lib", "1 V", "25 C")))
+
+        # The index is rebuilt when the database changes.
+        database.set_setting("vlsi.inputs.supplies.VDD", "0.9 V")
+        self.assertIsNot(index, test.get_library_index())
+        self.assertEqual([lib for lib in libs if test.filter_for_supplies(lib)], [libs[0], libs[1], libs[3]])
+
+    def test_mmmc_corners(self) -> None:
+        """
+        Test that MMMC scripts have a view for every corner and share identical library sets.
+        """
+        lib_dir = tempfile.mkdtemp()
+
+        def make_lib(name: str, VDD: str, temp: str, qrc: str) -> hammer_tech.Library:
+            for path in [name, qrc]:
+                with open(os.path.join(lib_dir, path), "w"):
+                    pass
+            return hammer_tech.HammerTechnology.parse_library({
+                "ecsm liberty file": name,
+                "qrc techfile": qrc,
+                "corner": {"nmos": "slow", "pmos": "slow", "temperature": temp},
+                "supplies": {"VDD": VDD, "GND": "0 V"}
+            })
+
+        class Technology:
+            tech_defined_libraries = [make_lib("ss.lib", "0.9 V", "125 C", "ss.tch"),
+                                      make_lib("ff.lib", "1.0 V", "0 C", "ff.tch"),
+                                      make_lib("ss2.lib", "0.9 V", "125 C", "ss.tch")]
+
+            @staticmethod
+            def prepend_dir_path(path: str, lib: Optional[hammer_tech.Library] = None) -> str:
+                return os.path.join(lib_dir, path)
+
+        def file_filter(key: str) -> hammer_vlsi.LibraryFilter:
+            return hammer_vlsi.LibraryFilter.new(key, key, is_file=True,
+                                                 extraction_func=lambda lib: [json.loads(lib.serialize())[key]])
+
+        class Tool(hammer_vlsi.CadenceTool, hammer_vlsi.DummyHammerTool):
+            @property
+            def timing_lib_with_ecsm_filter(self) -> hammer_vlsi.LibraryFilter:
+                return file_filter("ecsm liberty file")
+
+            @property
+            def qrc_tech_filter(self) -> hammer_vlsi.LibraryFilter:
+                return file_filter("qrc techfile")
+
+            @property
+            def sdc_clock_constraints(self) -> str:
+                return ""
+
+            @property
+            def sdc_pin_constraints(self) -> str:
+                return ""
+
+            @property
+            def post_synth_sdc(self) -> Optional[str]:
+                return None
+
+        test = Tool()
+        test.logger = HammerVLSILogging.context("")
+        test.technology = Technology()  # type: ignore
+        test.run_dir = lib_dir
+        database = hammer_config.HammerDatabase()
+        database.update_project([{"vlsi.inputs.mmmc_corners": [
+            {"name": "ss", "type": "setup", "voltage": "0.9 V", "temp": "125 C"},
+            {"name": "ff", "type": "hold", "voltage": "1.0 V", "temp": "0 C"},
+            {"name": "ss_hold", "type": "hold", "voltage": "0.9 V", "temp": "125 C"},
+            {"name": "typ", "type": "extra", "voltage": "1.0 V", "temp": "0 C"}
+        ]}])
+        test.set_database(database)
+
+        corners = test.get_mmmc_corners()
+        self.assertEqual(test.read_libs_for_corners([test.timing_lib_with_ecsm_filter], test.to_plain_item, corners),
+                         [test.get_timing_libs(corner).split(" ") for corner in corners])
+        self.assertEqual(test.read_libs_for_corners([test.qrc_tech_filter], test.to_plain_item, corners),
+                         [[os.path.join(lib_dir, name)] for name in ["ss.tch", "ff.tch", "ss.tch", "ff.tch"]])
+
+        script = [line for line in test.generate_mmmc_script().split("\n") if not line.startswith("puts")]
+        self.assertEqual([line for line in script if line.startswith("create_library_set")], [
+            "create_library_set -name ss.setup_set -timing [list {0} {1}]".format(os.path.join(lib_dir, "ss.lib"),
+                                                                                  os.path.join(lib_dir, "ss2.lib")),
+            "create_library_set -name ff.hold_set -timing [list {0}]".format(os.path.join(lib_dir, "ff.lib"))
+        ])
+        self.assertIn("create_timing_condition -name ss_hold.hold_cond -library_sets [list ss.setup_set]", script)
+        self.assertIn("create_timing_condition -name typ.extra_cond -library_sets [list ff.hold_set]", script)
+        self.assertIn("create_rc_corner -name ss_hold.hold_rc -temperature 125.0 -qrc_tech {0}".format(
+            os.path.join(lib_dir, "ss.tch")), script)
+        self.assertIn("create_analysis_view -name typ.extra_view -delay_corner typ.extra_delay "
+                      "-constraint_mode my_constraint_mode", script)
+        self.assertEqual(script[-1], "set_analysis_view -setup { ss.setup_view } -hold { ff.hold_view ss_hold.hold_view }")
+        shutil.rmtree(lib_dir)
+
+    def test_tcl_writer(self) -> None:
+        """
+        Test that TCL scripts are streamed to a file and that set lines are replaced in one pass.
+        """
+        fd, path = tempfile.mkstemp(".tcl")
+        os.close(fd)
+
+        with hammer_vlsi.TCLWriter(path) as writer:
+            hammer_vlsi.HammerTool.tcl_append("set foo 1", writer)
+            hammer_vlsi.HammerTool.verbose_tcl_append('read_file "a b" [list $x]', writer)
+            writer.extend(["set foobar 2", "set  bar 3 ;# comment"])
+        expected = []  # type: List[str]
+        hammer_vlsi.HammerTool.tcl_append("set foo 1", expected)
+        hammer_vlsi.HammerTool.verbose_tcl_append('read_file "a b" [list $x]', expected)
+        expected.extend(["set foobar 2", "set  bar 3 ;# comment"])
+        with open(path, "r") as f:
+            self.assertEqual(f.read(), "\n".join(expected))
+        self.assertEqual(expected[1], r'puts "read_file \"a b\" \[list \$x\]" ')
+
+        hammer_vlsi.HammerTool.replace_tcl_sets({"foo": "hello", "bar": "4"}, path)
+        hammer_vlsi.HammerTool.replace_tcl_set("foobar", "5", path, quotes=False)
+        with open(path, "r") as f:
+            self.assertEqual(f.read().split("\n"), ['set foo "hello";', expected[1], expected[2], 'set foobar 5;',
+                                                    'set bar "4";'])
+
+        # Nothing is changed if any variable is missing.
+        with self.assertRaises(ValueError):
+            hammer_vlsi.HammerTool.replace_tcl_sets({"foo": "x", "missing": "y"}, path)
+        with open(path, "r") as f:
+            self.assertTrue(f.read().startswith('set foo "hello";'))
+        os.remove(path)
+
+    def test_run_executables(self) -> None:
+        """
+        Test that subprocesses run concurrently with their output streamed and captured.
+        """
+        test = hammer_vlsi.DummyHammerTool()
+        test.logger = HammerVLSILogging.context("")
+        test.run_dir = tempfile.mkdtemp()
+        test.set_database(hammer_config.HammerDatabase())
+
+        with HammerLoggingCaptureContext() as c:
+            results = test.run_executables([
+                ["sh", "-c", "echo first; echo second"],
+                ["sh", "-c", "echo -n $HAMMER_DATABASE; exit 3"]
+            ])
+        self.assertEqual(results[0].returncode, 0)
+        self.assertEqual(results[0].output, "first\nsecond\n")
+        self.assertEqual(results[1].returncode, 3)
+        self.assertEqual(results[1].output, os.path.join(test.run_dir, "config_db_tmp.json"))
+        self.assertTrue(c.log_contains("second"))
+        self.assertTrue(c.log_contains("exited with status 3"))
+        self.assertGreaterEqual(results[0].rusage.ru_utime, 0)
+
+        # Only the tail of long outputs is captured.
+        result = hammer_vlsi.SubprocessExecutor(capture_limit=10).run_one(hammer_vlsi.SubprocessCommand(
+            args=["sh", "-c", "seq 1 10000"], cwd=None, env=None, line_callback=None))
+        self.assertEqual(result.output, "999\n10000\n")
+        self.assertTrue(result.output_truncated)
+        self.assertEqual(test.run_executable(["echo", "hello"]), "hello\n")
+        test.set_setting("vlsi.core.subprocess_output_limit", 6)
+        self.assertEqual(test.run_executable(["sh", "-c", "seq 1 10000"]), "10000\n")
+
+        shutil.rmtree(test.run_dir)
+
+    def test_slot_manager(self) -> None:
+        """
+        Test that tool launches wait for slots, in order.
+        """
+        lock_dir = tempfile.mkdtemp()
+        for backend in [hammer_vlsi.LocalSlotBackend({"lic": 1, "cores": 4}),
+                        hammer_vlsi.FlockSlotBackend({"lic": 1, "cores": 4}, lock_dir, poll_interval=0.01)]:
+            manager = hammer_vlsi.SlotManager(backend)
+            order = []  # type: List[str]
+
+            def worker(name: str, tokens: Dict[str, int]) -> None:
+                with manager.slots(tokens):
+                    order.append(name)
+
+            with manager.slots({"lic": 1, "cores": 2, "unlimited": 5}):
+                big = threading.Thread(target=worker, args=("big", {"cores": 4}))
+                big.start()
+                time.sleep(0.1)
+                # Would fit in the free cores, but must not overtake the earlier request.
+                small = threading.Thread(target=worker, args=("small", {"cores": 1}))
+                small.start()
+                time.sleep(0.1)
+                self.assertEqual(order, [])
+            big.join()
+            small.join()
+            self.assertEqual(order, ["big", "small"])
+            stats = manager.statistics()
+            self.assertEqual(stats["cores"].requests, 3)
+            self.assertGreater(stats["cores"].max_wait_time, 0.1)
+            self.assertEqual(stats["lic"].requests, 1)
+            with self.assertRaises(ValueError):
+                with manager.slots({"lic": 2}):
+                    pass
+        shutil.rmtree(lock_dir)
+
+        with self.assertRaises(ValueError):
+            hammer_vlsi.make_slot_backend("magic", {}, "")
+        with self.assertRaises(ValueError):
+            hammer_vlsi.make_slot_backend("flock", {"lic": 1}, "")
+
+        class LicensedTool(hammer_vlsi.DummyHammerTool):
+            def executable_slots(self, args: List[str]) -> Dict[str, int]:
+                return {"lic": 1}
+
+        test = LicensedTool()
+        test.logger = HammerVLSILogging.context("")
+        test.run_dir = tempfile.mkdtemp()
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"vlsi.core.slots.backend": "local", "vlsi.core.slots.directory": "",
+                               "vlsi.core.slots.limits": [{"name": "lic", "count": 1}]}])
+        test.set_database(database)
+        self.assertEqual(test.run_executable(["echo", "hello"]), "hello\n")
+        tool_manager = test.slot_manager
+        assert tool_manager is not None
+        self.assertEqual(tool_manager.waits[-1].tokens, {"lic": 1})
+        self.assertEqual(test.subprocess_metrics[-1].slot_wait_time, tool_manager.waits[-1].wait_time)
+        # Both commands together need more licenses than exist.
+        with self.assertRaises(ValueError):
+            test.run_executables([["true"], ["true"]])
+        shutil.rmtree(test.run_dir)
+
+        class NamedTool(hammer_vlsi.DummyHammerTool):
+            def tool_config_prefix(self) -> str:
+                return "synthesis.dc"
+
+        named = NamedTool()
+        named.name = "dc"
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"synthesis.dc.dc_bin": "/opt/synopsys/bin/design_compiler"}])
+        named.set_database(database)
+        self.assertTrue(named.is_tool_executable(["/opt/synopsys/bin/design_compiler", "-f", "run.tcl"]))
+        self.assertTrue(named.is_tool_executable(["dc_shell", "-f", "run.tcl"]))
+        self.assertFalse(named.is_tool_executable(["/bin/sh", "-c", "true"]))
+
+    def test_typed_settings(self) -> None:
+        """
+        Test that typed settings are parsed once per database generation.
+        """
+        test = hammer_vlsi.DummyHammerTool()
+        database = hammer_config.HammerDatabase()
+        database.update_project([{
+            "vlsi.inputs.clocks": [{"name": "clock", "period": "5 ns"},
+                                   {"name": "clock2", "period": "10 ns", "port": "clk2", "uncertainty": "0.1 ns"}],
+            "vlsi.inputs.mmmc_corners": [{"name": "ss", "type": "setup", "voltage": "0.9 V", "temp": "125 C"}]
+        }])
+        test.set_database(database)
+
+        clocks = test.get_clock_ports()
+        self.assertEqual(clocks, [
+            hammer_vlsi.ClockPort(name="clock", period=hammer_vlsi.units.TimeValue("5 ns"), port=None,
+                                  uncertainty=None),
+            hammer_vlsi.ClockPort(name="clock2", period=hammer_vlsi.units.TimeValue("10 ns"), port="clk2",
+                                  uncertainty=hammer_vlsi.units.TimeValue("0.1 ns"))
+        ])
+        corners = test.get_mmmc_corners()
+        self.assertEqual(corners[0].type, hammer_vlsi.MMMCCornerType.Setup)
+        self.assertEqual(corners[0].temp, hammer_vlsi.units.TemperatureValue("125 C"))
+
+        # Same generation: cached (but callers get their own list).
+        clocks.pop()
+        clocks_again = test.get_clock_ports()
+        self.assertEqual(len(clocks_again), 2)
+        self.assertIs(clocks_again[0], test.get_clock_ports()[0])
+
+        # New generation: re-parsed.
+        database.set_setting("vlsi.inputs.clocks", [{"name": "clock3", "period": "1 ns"}])
+        self.assertEqual([c.name for c in test.get_clock_ports()], ["clock3"])
+
+        database.set_setting("vlsi.inputs.clocks", "bad")
+        with self.assertRaises(ValueError):
+            test.get_clock_ports()
+
     def test_bad_export_config_outputs(self) -> None:
         """
         Test that a plugin that fails to call super().export_config_outputs()
@@ -974,5 +1447,223 @@ class HammerToolHooksTest(unittest.TestCase):
                     self.assertFalse(os.path.exists(file))
 
 
+    def test_incremental_steps(self) -> None:
+        """Test that up-to-date steps are skipped in incremental mode."""
+        runs = []  # type: List[str]
+
+        def step_a(x: hammer_vlsi.HammerTool) -> bool:
+            runs.append("step_a")
+            with open(os.path.join(x.run_dir, "a.txt"), "w") as f:
+                f.write(x.get_setting("test.a"))
+            return True
+
+        def step_b(x: hammer_vlsi.HammerTool) -> bool:
+            runs.append("step_b")
+            with open(os.path.join(x.run_dir, "a.txt"), "r") as f:
+                contents = f.read()
+            with open(os.path.join(x.run_dir, "b.txt"), "w") as f:
+                f.write(contents + str(x.get_setting("test.b")))
+            return True
+
+        class Tool(hammer_vlsi.DummyHammerTool):
+            restartable = True
+
+            def is_step_restartable(self, step: hammer_vlsi.HammerToolStep) -> bool:
+                return self.restartable
+
+        make_step = hammer_vlsi.HammerTool.make_step_from_function
+        steps = [make_step(step_a), make_step(step_b)]
+        tool = Tool()
+        tool.logger = HammerVLSILogging.context("")
+        tool.run_dir = tempfile.mkdtemp()
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"vlsi.core.incremental_steps": True, "test.a": "hello", "test.b": 1}])
+        tool.set_database(database)
+
+        def run() -> List[str]:
+            del runs[:]
+            self.assertTrue(tool.run_steps(steps))
+            return list(runs)
+
+        def decisions() -> List[Tuple[str, bool, str]]:
+            with open(os.path.join(tool.run_dir, "step-manifest.json"), "r") as f:
+                return [(d["step"], d["ran"], d["reason"]) for d in json.load(f)["decisions"]]
+
+        self.assertEqual(run(), ["step_a", "step_b"])
+        self.assertEqual(decisions(), [("step_a", True, "no record of a previous run"),
+                                       ("step_b", True, "no record of a previous run")])
+        self.assertEqual(run(), [])
+        self.assertEqual(decisions(), [("step_a", False, "up to date"), ("step_b", False, "up to date")])
+
+        # A setting which only step_b reads.
+        database.set_setting("test.b", 2)
+        self.assertEqual(run(), ["step_b"])
+        self.assertEqual(decisions()[1], ("step_b", True, "setting test.b changed"))
+
+        # Changed outputs of step_a re-run step_b too.
+        database.set_setting("test.a", "world")
+        self.assertEqual(run(), ["step_a", "step_b"])
+        self.assertEqual(decisions()[1], ("step_b", True, "dependency step_a changed"))
+
+        os.remove(os.path.join(tool.run_dir, "b.txt"))
+        self.assertEqual(run(), ["step_b"])
+        self.assertEqual(decisions()[1][2], "output {} changed or is missing".format(
+            os.path.join(tool.run_dir, "b.txt")))
+
+        Tool.restartable = False
+        self.assertEqual(run(), ["step_a", "step_b"])
+        self.assertEqual(decisions()[0], ("step_a", True, "step is not restartable"))
+
+        database.set_setting("vlsi.core.incremental_steps", False)
+        self.assertEqual(run(), ["step_a", "step_b"])
+
+        shutil.rmtree(tool.run_dir)
+
+    def test_incremental_steps_settings_read(self) -> None:
+        """Test that incremental steps depend on settings read through caches and directly from the database."""
+        def cached_supply(x: hammer_vlsi.HammerTool) -> str:
+            return x._get_cached(x.get_generation_cache("test"), "vdd", lambda: x.get_setting("test.vdd"))
+
+        def step(x: hammer_vlsi.HammerTool) -> bool:
+            with open(os.path.join(x.run_dir, "out.txt"), "w") as f:
+                f.write(cached_supply(x) + str(x._database.has_setting("test.optional")))
+            return True
+
+        class Tool(hammer_vlsi.DummyHammerTool):
+            def is_step_restartable(self, step: hammer_vlsi.HammerToolStep) -> bool:
+                return True
+
+        tool = Tool()
+        tool.logger = HammerVLSILogging.context("")
+        tool.run_dir = tempfile.mkdtemp()
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"vlsi.core.incremental_steps": True, "test.vdd": "1.0 V"}])
+        tool.set_database(database)
+        # Fill the cache before the step runs, so the step only gets cache hits.
+        self.assertEqual(cached_supply(tool), "1.0 V")
+        self.assertTrue(tool.run_steps([hammer_vlsi.HammerTool.make_step_from_function(step)]))
+
+        with open(os.path.join(tool.run_dir, "step-manifest.json"), "r") as f:
+            settings = json.load(f)["steps"]["step"]["fingerprint"]["settings"]
+        self.assertEqual(set(settings.keys()), {"test.vdd", "test.optional"})
+        self.assertEqual(settings["test.optional"], "missing")
+        shutil.rmtree(tool.run_dir)
+
+    def test_step_metrics(self) -> None:
+        """Test that the resource usage of steps and their subprocesses is recorded."""
+        def quiet(x: hammer_vlsi.HammerTool) -> bool:
+            return True
+
+        def noisy(x: hammer_vlsi.HammerTool) -> bool:
+            x.run_executables([["sh", "-c", "echo hello"], ["sh", "-c", "seq 1 1000"]])
+            return True
+
+        def failing(x: hammer_vlsi.HammerTool) -> bool:
+            x.run_executable(["true"])
+            return False
+
+        make_step = hammer_vlsi.HammerTool.make_step_from_function
+        tool = hammer_vlsi.DummyHammerTool()
+        tool.logger = HammerVLSILogging.context("")
+        tool.run_dir = tempfile.mkdtemp()
+        tool.set_database(hammer_config.HammerDatabase())
+
+        self.assertTrue(tool.run_steps([make_step(quiet), make_step(noisy)]))
+        metrics = tool.step_metrics
+        self.assertEqual([m.name for m in metrics], ["quiet", "noisy"])
+        self.assertEqual(metrics[0].subprocesses, [])
+        self.assertEqual([p.args[-1] for p in metrics[1].subprocesses], ["echo hello", "seq 1 1000"])
+        self.assertEqual(metrics[1].output_bytes, len("hello\n") + sum(len(str(i)) + 1 for i in range(1, 1001)))
+        self.assertGreater(metrics[1].children_max_rss_kb, 0)
+        self.assertTrue(all(m.ran and m.wall_time >= 0 for m in metrics))
+
+        with open(os.path.join(tool.run_dir, "step-metrics.json"), "r") as f:
+            written = json.load(f)
+        self.assertEqual([s["name"] for s in written["steps"]], ["quiet", "noisy"])
+        self.assertEqual(written["total"]["output_bytes"], metrics[1].output_bytes)
+
+        # Metrics are written for failed runs too, and subprocesses outside of steps are kept separately.
+        tool.run_executable(["echo", "outside"])
+        self.assertFalse(tool.run_steps([make_step(failing), make_step(quiet)]))
+        with open(os.path.join(tool.run_dir, "step-metrics.json"), "r") as f:
+            written = json.load(f)
+        self.assertEqual([s["name"] for s in written["steps"]], ["failing"])
+        self.assertEqual(written["steps"][0]["subprocesses"][0]["args"], ["true"])
+        self.assertEqual([p["args"] for p in written["other_subprocesses"]], [["echo", "outside"]])
+
+        shutil.rmtree(tool.run_dir)
+
+    def test_step_dependencies(self) -> None:
+        """Test that steps with declared dependencies run concurrently."""
+        ran = []  # type: List[str]
+        # Only passes if both steps run at the same time.
+        barrier = threading.Barrier(2, timeout=10)
+
+        def first(x: hammer_vlsi.HammerTool) -> bool:
+            ran.append("first")
+            return True
+
+        def left(x: hammer_vlsi.HammerTool) -> bool:
+            barrier.wait()
+            ran.append("left")
+            return True
+
+        def right(x: hammer_vlsi.HammerTool) -> bool:
+            barrier.wait()
+            time.sleep(0.05)
+            ran.append("right")
+            return True
+
+        def last(x: hammer_vlsi.HammerTool) -> bool:
+            ran.append("last")
+            return True
+
+        make_step = hammer_vlsi.HammerTool.make_step_from_function
+        steps = [make_step(first), make_step(left, depends_on=["first"]), make_step(right, depends_on=["first"]),
+                 make_step(last)]
+
+        tool = hammer_vlsi.DummyHammerTool()
+        tool.logger = HammerVLSILogging.context("")
+        database = hammer_config.HammerDatabase()
+        database.update_core([{"vlsi.core.max_step_workers": 2}])
+        tool.set_database(database)
+
+        self.assertTrue(tool.run_steps(steps))
+        self.assertEqual(ran, ["first", "left", "right", "last"])
+        timing = tool.step_timing
+        assert timing is not None
+        self.assertEqual(timing.dependencies["last"], ["first", "left", "right"])
+        self.assertEqual(timing.critical_path, ["first", "right", "last"])
+        self.assertLess(timing.critical_path_time, timing.serial_time)
+
+        # Nothing after a pause runs.
+        del ran[:]
+        barrier = threading.Barrier(1)
+        self.assertTrue(tool.run_steps(steps, [hammer_vlsi.HammerTool.make_pre_pause_hook("right")]))
+        self.assertEqual(ran, ["first", "left"])
+
+        # Inserted steps still run before their target.
+        del ran[:]
+
+        def before_left(x: hammer_vlsi.HammerTool) -> bool:
+            ran.append("before_left")
+            return True
+
+        self.assertTrue(tool.run_steps(steps, [hammer_vlsi.HammerTool.make_pre_insertion_hook("left", before_left),
+                                               hammer_vlsi.HammerTool.make_pre_resume_hook("before_left")]))
+        self.assertEqual(set(ran), {"before_left", "left", "right", "last"})
+        self.assertLess(ran.index("before_left"), ran.index("left"))
+        self.assertEqual(ran[-1], "last")
+
+        # Dependencies must be on earlier steps.
+        self.assertFalse(tool.run_steps([make_step(left, depends_on=["first"]), make_step(first)]))
+
+        # With one worker, steps run in order.
+        del ran[:]
+        database.update_core([{"vlsi.core.max_step_workers": 1}])
+        self.assertTrue(tool.run_steps(steps))
+        self.assertEqual(ran, ["first", "left", "right", "last"])
+
+
 if __name__ == '__main__':
     unittest.main()
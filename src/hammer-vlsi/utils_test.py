@@ -5,10 +5,14 @@
 #
 #  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
 
-from typing import Dict, Tuple, List, Optional
+import os
+import tempfile
+from typing import Callable, Dict, Tuple, List, Optional
 
-from hammer_utils import topological_sort, get_or_else, optional_map, check_function_type
+from hammer_utils import (topological_sort, critical_path, get_or_else, optional_map, check_function_type,
+                          cacheable_function, function_cache_key, StatCache)
 
+import shutil
 import unittest
 
 
@@ -98,6 +102,85 @@ class UtilsTest(unittest.TestCase):
             # Entirely different
             check_function_type(test3, [], dict)
 
+    def test_function_cache_key(self) -> None:
+        def make_filter(value: object) -> Callable[[int], bool]:
+            @cacheable_function
+            def filter_func(x: int) -> bool:
+                return x == value
+            return filter_func
+
+        def unmarked_filter(x: int) -> bool:
+            return x > 0
+
+        # Closures from the same code over equal values are the same.
+        self.assertEqual(function_cache_key(make_filter(1)), function_cache_key(make_filter(1)))
+        self.assertNotEqual(function_cache_key(make_filter(1)), function_cache_key(make_filter(2)))
+        # Unhashable closed-over values can't be keyed.
+        self.assertIsNone(function_cache_key(make_filter([1])))
+        # Bound methods are identified by their object too.
+        class Filter:
+            @cacheable_function
+            def filter_func(self, x: int) -> bool:
+                return x > 0
+
+        a, b = Filter(), Filter()
+        self.assertEqual(function_cache_key(a.filter_func), function_cache_key(a.filter_func))
+        self.assertNotEqual(function_cache_key(a.filter_func), function_cache_key(b.filter_func))
+        # Functions which are not marked as cacheable are never keyed.
+        self.assertIsNone(function_cache_key(unmarked_filter))
+        self.assertIsNone(function_cache_key(len))
+
+    def test_critical_path(self) -> None:
+        """
+        Test that the critical path is the longest path through the dependencies.
+        """
+        dependencies = {"a": [], "b": ["a"], "c": ["a"], "d": ["b", "c"]}  # type: Dict[str, List[str]]
+        durations = {"a": 1.0, "b": 5.0, "c": 2.0, "d": 1.0}
+        self.assertEqual(critical_path(["a", "b", "c", "d"], dependencies, durations), (7.0, ["a", "b", "d"]))
+        durations["c"] = 6.0
+        self.assertEqual(critical_path(["a", "c", "b", "d"], dependencies, durations), (8.0, ["a", "c", "d"]))
+        self.assertEqual(critical_path([], {}, {}), (0.0, []))
+
+    def test_stat_cache(self) -> None:
+        """
+        Test that file system lookups are cached and checked in batches.
+        """
+        tmpdir = tempfile.mkdtemp()
+        try:
+            files = [os.path.join(tmpdir, "file{}".format(i)) for i in range(8)]
+            for path in files:
+                with open(path, "w") as f:
+                    f.write("")
+            missing = os.path.join(tmpdir, "missing")
+
+            cache = StatCache(max_workers=4)
+            self.assertEqual(cache.find_missing(files + [missing, tmpdir], "file"), [missing, tmpdir])
+            self.assertEqual(cache.find_missing([tmpdir, files[0]], "dir"), [files[0]])
+            self.assertEqual(cache.find_missing(files + [tmpdir]), [])
+            self.assertEqual(cache.stats.misses, 0)
+
+            # Missing paths are not cached, so a file created after a failed lookup is found.
+            self.assertFalse(cache.exists(missing))
+            with open(missing, "w") as f:
+                f.write("")
+            self.assertTrue(cache.isfile(missing))
+            self.assertTrue(cache.exists(missing))
+            self.assertEqual(cache.stats.hits, 1)
+            os.remove(missing)
+            cache.invalidate(missing)
+            self.assertFalse(cache.exists(missing))
+
+            # Expired entries are looked up again.
+            os.remove(files[0])
+            self.assertTrue(cache.exists(files[0]))
+            cache.ttl = 0
+            self.assertFalse(cache.exists(files[0]))
+
+            with self.assertRaises(ValueError):
+                cache.find_missing(files, "socket")
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 if __name__ == '__main__':
      unittest.main()
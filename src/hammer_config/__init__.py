@@ -3,3 +3,6 @@
 # https://stackoverflow.com/questions/34461987/python3-importerror-no-module-named-xxxx
 from .config_src import *
 from .yaml2json import load_yaml
+from .snapshot import *
+from .config_cache import *
+from .config_server import *
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  config_cache.py
+#  Persistent on-disk cache of parsed and unpacked config files.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from hammer_utils import CacheStatistics, write_file_atomically
+
+__all__ = ['ConfigParseCache', 'get_config_cache', 'set_config_cache']
+
+# Environment variable for the cache folder. The cache is disabled if unset.
+CACHE_DIR_ENV = "HAMMER_CONFIG_CACHE_DIR"
+# Environment variable for the maximum size of the cache in bytes.
+CACHE_MAX_BYTES_ENV = "HAMMER_CONFIG_CACHE_MAX_BYTES"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump this whenever the format of cached entries (or of unpacked configs) changes.
+CACHE_FORMAT_VERSION = 1
+
+_CACHE_SUFFIX = ".json"
+
+
+class ConfigParseCache:
+    """
+    Cache of parsed, unpacked configs (see load_config_from_file).
+    Entries are keyed by (absolute path, size, mtime, content hash) of the config file, so a modified file never
+    hits a stale entry.
+
+    Entries are stored as JSON (unpacked configs are plain JSON data), so a shared cache folder cannot be used to run
+    code in the processes reading it. Entries are written atomically (write to a temporary file and rename), so many
+    processes can share one cache folder. When the folder grows past max_bytes, the least recently used entries are
+    evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        :param cache_dir: Folder to store cache entries in. Created if it does not exist.
+        :param max_bytes: Maximum total size of the cache entries.
+        """
+        self.cache_dir = cache_dir  # type: str
+        self.max_bytes = max_bytes  # type: int
+        self.stats = CacheStatistics()
+        # Number of entries evicted by this process.
+        self.evictions = 0  # type: int
+        self._lock = threading.Lock()
+        # Running estimate of the total size of the entries, to avoid scanning the folder on every put.
+        # None until the folder is first scanned.
+        self._estimated_bytes = None  # type: Optional[int]
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, filename: str, contents: bytes) -> str:
+        st = os.stat(filename)
+        key = "\0".join([
+            str(CACHE_FORMAT_VERSION),
+            os.path.abspath(filename),
+            str(st.st_size),
+            str(st.st_mtime_ns),
+            hashlib.sha256(contents).hexdigest()
+        ])
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + _CACHE_SUFFIX)
+
+    def get(self, filename: str, contents: bytes) -> Optional[dict]:
+        """
+        Look up the unpacked config for the given file.
+
+        :param filename: Path to the config file.
+        :param contents: Raw contents of the config file.
+        :return: The cached unpacked config, or None on a miss.
+        """
+        path = self._entry_path(filename, contents)
+        try:
+            with open(path, "rb") as f:
+                config = json.loads(f.read().decode("utf-8"))
+        except (OSError, ValueError):
+            self.stats.record_miss()
+            return None
+        if not isinstance(config, dict):
+            self.stats.record_miss()
+            return None
+        # Mark the entry as recently used for eviction.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.stats.record_hit()
+        return config
+
+    def put(self, filename: str, contents: bytes, config: dict) -> None:
+        """
+        Store the unpacked config for the given file.
+
+        :param filename: Path to the config file.
+        :param contents: Raw contents of the config file.
+        :param config: Unpacked config.
+        """
+        path = self._entry_path(filename, contents)
+        data = json.dumps(config, separators=(',', ':')).encode("utf-8")
+        write_file_atomically(path, data)
+        with self._lock:
+            if self._estimated_bytes is None:
+                must_evict = True
+            else:
+                self._estimated_bytes += len(data)
+                must_evict = self._estimated_bytes > self.max_bytes
+        if must_evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Evict the least recently used entries until the cache fits in max_bytes.
+        This scans the cache folder, so put() only calls it when the estimated size of the cache exceeds max_bytes
+        (entries written by other processes are counted at the next scan).
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_CACHE_SUFFIX):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Evicted by another process.
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._estimated_bytes = total
+
+
+_config_cache = None  # type: Optional[ConfigParseCache]
+
+
+def get_config_cache() -> Optional[ConfigParseCache]:
+    """
+    Get the cache used by load_config_from_file.
+    Unless set with set_config_cache, the cache is configured by the HAMMER_CONFIG_CACHE_DIR and
+    HAMMER_CONFIG_CACHE_MAX_BYTES environment variables, and is disabled if HAMMER_CONFIG_CACHE_DIR is not set.
+
+    :return: The cache or None if caching is disabled.
+    """
+    global _config_cache
+    cache_dir = os.environ.get(CACHE_DIR_ENV, "")
+    if _config_cache is None and cache_dir != "":
+        _config_cache = ConfigParseCache(cache_dir, int(os.environ.get(CACHE_MAX_BYTES_ENV, DEFAULT_MAX_BYTES)))
+    return _config_cache
+
+
+def set_config_cache(cache: Optional[ConfigParseCache]) -> None:
+    """
+    Set the cache used by load_config_from_file. Set to None to go back to the environment-configured cache.
+    """
+    global _config_cache
+    _config_cache = cache
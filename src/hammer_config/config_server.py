@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  config_server.py
+#  Long-lived local server which answers config queries for shell/TCL flows over a Unix domain socket.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+# Protocol: one request per line and one response per line, in order.
+#   request:  "get <key>", "prefix <prefix>" or "location " (the path of the database being served)
+#   response: JSON object, either {"value": <value>} or {"error": <message>, "type": "KeyError" or "ValueError"}
+
+import json
+import os
+import socket
+import socketserver
+import threading
+from typing import Any, Dict, Optional, Tuple, Union, cast
+
+from .config_src import HammerDatabase
+from .snapshot import HammerDatabaseSnapshot, is_snapshot
+
+__all__ = ['CONFIG_SOCKET_ENV', 'load_database', 'ConfigServer', 'ConfigServerClient']
+
+# Environment variable for the socket of a running config server.
+CONFIG_SOCKET_ENV = "HAMMER_CONFIG_SOCKET"
+
+Database = Union[HammerDatabase, HammerDatabaseSnapshot]
+
+
+def load_database(db_location: str) -> Database:
+    """
+    Load the given JSON database (e.g. HammerTool.dump_database()) or binary database snapshot.
+    """
+    if is_snapshot(db_location):
+        return HammerDatabaseSnapshot(db_location)
+    database = HammerDatabase()
+    # The entire exported JSON is treated as a "project JSON".
+    with open(db_location, "r") as f:
+        database.update_project([json.load(f)])
+    return database
+
+
+class _ConfigRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server = cast(ConfigServer, self.server)
+        for line in self.rfile:
+            command, _, arg = line.decode("utf-8").rstrip("\n").partition(" ")
+            self.wfile.write(server.answer(command, arg).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class ConfigServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Server which keeps a database loaded and answers queries from ConfigServerClient.
+    The database is reloaded when the database file changes.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, db_location: str, socket_path: str) -> None:
+        """
+        :param db_location: Path to the JSON database or binary database snapshot.
+        :param socket_path: Path of the Unix domain socket to listen on.
+        """
+        self.db_location = db_location  # type: str
+        self.socket_path = socket_path  # type: str
+        self._lock = threading.Lock()
+        self._database = None  # type: Optional[Database]
+        self._db_stat = None  # type: Optional[Tuple[int, int]]
+        # Number of times the database was (re-)loaded.
+        self.loads = 0  # type: int
+        self._reload_if_changed()
+        if os.path.exists(socket_path):
+            client = ConfigServerClient.connect(socket_path)
+            if client is not None:
+                client.close()
+                raise ValueError("A config server is already running on {path}".format(path=socket_path))
+            # Left over from a server which did not shut down cleanly.
+            os.unlink(socket_path)
+        super().__init__(socket_path, _ConfigRequestHandler)
+
+    def _reload_if_changed(self) -> None:
+        """Reload the database if the file changed since it was loaded. Must be called with the lock held."""
+        st = os.stat(self.db_location)
+        db_stat = (st.st_mtime_ns, st.st_size)
+        if db_stat != self._db_stat:
+            if isinstance(self._database, HammerDatabaseSnapshot):
+                self._database.close()
+            self._database = load_database(self.db_location)
+            self._db_stat = db_stat
+            self.loads += 1
+
+    def answer(self, command: str, arg: str) -> str:
+        """
+        Answer the given request.
+
+        :return: The JSON response (without the trailing newline).
+        """
+        try:
+            if command == "location":
+                return json.dumps({"value": self.db_location})
+            with self._lock:
+                self._reload_if_changed()
+                database = self._database
+                assert database is not None
+                if command == "get":
+                    value = database.get_setting(arg, nullvalue=None)  # type: Any
+                elif command == "prefix":
+                    value = database.get_settings_with_prefix(arg, nullvalue=None)
+                else:
+                    raise ValueError("Unknown config server command {command}".format(command=command))
+            return json.dumps({"value": value})
+        except (KeyError, ValueError) as e:
+            return json.dumps({"error": str(e.args[0]), "type": type(e).__name__})
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        if isinstance(self._database, HammerDatabaseSnapshot):
+            self._database.close()
+
+
+class ConfigServerClient:
+    """
+    Client for ConfigServer. Lookups have the same semantics as the HammerDatabase equivalents.
+    """
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._socket = sock
+        self._file = sock.makefile("rwb")
+
+    @staticmethod
+    def connect(socket_path: str) -> Optional['ConfigServerClient']:
+        """
+        Connect to the server on the given socket.
+
+        :return: The client, or None if no server is running there.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return ConfigServerClient(sock)
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> 'ConfigServerClient':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _request(self, command: str, arg: str) -> Any:
+        self._file.write("{command} {arg}\n".format(command=command, arg=arg).encode("utf-8"))
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ValueError("Config server closed the connection")
+        response = json.loads(line.decode("utf-8"))  # type: Dict[str, Any]
+        if "error" in response:
+            if response["type"] == "KeyError":
+                raise KeyError(response["error"])
+            raise ValueError(response["error"])
+        return response["value"]
+
+    def db_location(self) -> str:
+        """
+        Get the path of the database which the server is serving, e.g. to check that it is the expected one.
+        """
+        return str(self._request("location", ""))
+
+    def get_setting(self, key: str, nullvalue: Any = "null") -> Any:
+        """
+        Retrieve the given key.
+
+        :param key: Desired key.
+        :param nullvalue: Value to return out for nulls.
+        :return: The given config
+        """
+        value = self._request("get", key)
+        return nullvalue if value is None else value
+
+    def get_settings_with_prefix(self, prefix: str, nullvalue: Any = "null") -> Dict[str, Any]:
+        """
+        Retrieve all the settings whose keys start with the given prefix.
+
+        :param prefix: Prefix (e.g. "vlsi.inputs.").
+        :param nullvalue: Value to return out for nulls.
+        :return: Dictionary of the matching keys to their values.
+        """
+        settings = self._request("prefix", prefix)  # type: Dict[str, Any]
+        return {key: nullvalue if value is None else value for key, value in settings.items()}
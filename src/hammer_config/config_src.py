@@ -9,16 +9,28 @@
 
 # pylint: disable=invalid-name
 
-from typing import Iterable, List, Union, Callable, Any, Dict, Set
+from typing import Iterable, Iterator, List, Union, Callable, Any, Dict, Set, NamedTuple, Tuple, Optional
 
-from hammer_utils import deepdict
+from hammer_utils import topological_sort
+from .config_cache import get_config_cache
 from .yaml2json import load_yaml # grumble grumble
 
-from functools import reduce
+import atexit
+import bisect
+from collections.abc import ItemsView, Mapping, ValuesView
+from contextlib import contextmanager
+from copy import deepcopy
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import reduce, lru_cache
+import itertools
 import json
+import mmap
 import os
 import re
 import sys
+import threading
+import time
+import weakref
 
 # Special key used for meta directives which require config paths like prependlocal.
 CONFIG_PATH_KEY = "_config_path"
@@ -57,7 +69,8 @@ def unpack(config_dict: dict, prefix: str = "") -> dict:
         if isinstance(value, dict):
             output_dict.update(unpack(value, real_prefix + key))
         else:
-            output_dict[real_prefix + key] = value
+            # Intern keys so that the same key in different configs is a single string.
+            output_dict[sys.intern(real_prefix + key)] = value
     return output_dict
 
 
@@ -90,39 +103,251 @@ def reverse_unpack(input_dict: dict) -> dict:
     return output_dict
 
 
-__VARIABLE_EXPANSION_REGEX = r'\${([a-zA-Z_\-\d.]+)}'
+class CompactConfig(Mapping):
+    """
+    Read-only, memory-efficient config: interned keys and their values in two sorted parallel tuples.
+    Used by HammerDatabase to store its layers, since a dict has a lot of per-entry overhead.
+    """
+    __slots__ = ("_keys", "_values")
 
+    def __init__(self, config: Optional[Mapping] = None) -> None:
+        items = sorted((sys.intern(key), value) for key, value in (config or {}).items())
+        self._keys = tuple(key for key, _ in items)  # type: Tuple[str, ...]
+        self._values = tuple(value for _, value in items)  # type: Tuple[Any, ...]
 
-def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
+    @staticmethod
+    def from_config(config: Mapping) -> 'CompactConfig':
+        """
+        Get a CompactConfig with the same contents as the given config (which is returned as-is if it is already
+        a CompactConfig).
+        """
+        if isinstance(config, CompactConfig):
+            return config
+        return CompactConfig(config)
+
+    def _index(self, key: str) -> int:
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        return -1
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._index(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._values[i]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._index(key) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def items(self) -> ItemsView:
+        return _CompactConfigItemsView(self)
+
+    def values(self) -> ValuesView:
+        return _CompactConfigValuesView(self)
+
+    def __reduce__(self) -> Tuple[type, Tuple[dict]]:
+        return CompactConfig, (dict(self.items()),)
+
+    def __repr__(self) -> str:
+        return "CompactConfig({contents})".format(contents=repr(dict(self.items())))
+
+
+class _CompactConfigItemsView(ItemsView):
+    def __init__(self, config: CompactConfig) -> None:
+        super().__init__(config)
+        self._config = config  # type: CompactConfig
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._config._keys, self._config._values)
+
+
+class _CompactConfigValuesView(ValuesView):
+    def __init__(self, config: CompactConfig) -> None:
+        super().__init__(config)
+        self._config = config  # type: CompactConfig
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._config._values)
+
+
+__VARIABLE_EXPANSION_REGEX = re.compile(r'\${([a-zA-Z_\-\d.]+)}')
+
+
+class SubstTemplate(NamedTuple('SubstTemplate', [
+    ('literals', Tuple[str, ...]),
+    ('references', Tuple[str, ...])
+])):
     """
-    Expand the meta directives for the given config dict and return a new
-    dictionary containing the updated settings with respect to the base config_dict.
+    A string containing ${...} references, pre-split into literal and reference segments.
+    literals always has one more element than references; the rendered string is
+    literals[0] + value(references[0]) + literals[1] + ... + literals[-1].
+    """
+    __slots__ = ()
 
-    :param config_dict: Base config.
-    :param meta_dict: Dictionary with potentially new meta directives.
-    :return: New dictionary with meta_dict updating config_dict.
+    @staticmethod
+    def compile(template: str) -> 'SubstTemplate':
+        """
+        Compile the given template string (cached).
+        """
+        return _compile_subst_template(template)
+
+    def render(self, lookup: Callable[[str], str]) -> str:
+        """
+        Render this template.
+
+        :param lookup: Function to get the value of a referenced key.
+        :return: String with all references substituted.
+        """
+        if len(self.references) == 0:
+            return self.literals[0]
+        parts = [self.literals[0]]  # type: List[str]
+        for reference, literal in zip(self.references, self.literals[1:]):
+            parts.append(lookup(reference))
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=None)
+def _compile_subst_template(template: str) -> SubstTemplate:
+    # re.split with one capture group alternates literal, reference, literal, ...
+    pieces = __VARIABLE_EXPANSION_REGEX.split(template)
+    return SubstTemplate(literals=tuple(pieces[0::2]), references=tuple(pieces[1::2]))
+
+
+def get_subst_references(value: Union[str, List[str]]) -> Set[str]:
+    """
+    Get all the keys referenced by ${...} in the given string or list of strings.
+    """
+    if isinstance(value, list):
+        return set(ref for v in value for ref in SubstTemplate.compile(v).references)
+    else:
+        return set(SubstTemplate.compile(value).references)
+
+
+def perform_subst(value: Union[str, List[str]], lookup: Callable[[str], str]) -> Union[str, List[str]]:
+    """
+    Perform substitutions for the given value.
+    If value is a string, perform substitutions in the string. If value is a list, then perform substitutions
+    in every string in the list.
+
+    :param value: String or list
+    :param lookup: Function to get the value of a referenced key.
+    :return: String or list but with everything substituted.
+    """
+    if isinstance(value, list):
+        return [SubstTemplate.compile(v).render(lookup) for v in value]
+    else:
+        return SubstTemplate.compile(value).render(lookup)
+
+
+class TranscludedValue:
+    """
+    Lazy handle to the contents of a file transcluded by the "transclude" meta directive.
+    The file is memory-mapped when the handle is created (so it may be deleted afterwards), but only decoded the
+    first time the value is needed. Handles are immutable and shared instead of copied.
+    Use resolve_lazy_value() to get the actual string.
     """
 
-    def perform_subst(value: Union[str, List[str]]) -> Union[str, List[str]]:
+    # Live handles by (absolute path, size, mtime), so that re-merging a config does not re-open the file.
+    _handles = weakref.WeakValueDictionary()  # type: weakref.WeakValueDictionary
+
+    def __init__(self, path: str, size: int, mtime_ns: int) -> None:
+        self.path = path  # type: str
+        self.size = size  # type: int
+        self.mtime_ns = mtime_ns  # type: int
+        self._mmap = None  # type: Optional[mmap.mmap]
+        if size > 0:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._value = None  # type: Optional[str]
+
+    @staticmethod
+    def open(path: str) -> 'TranscludedValue':
         """
-        Perform substitutions for the given value.
-        If value is a string, perform substitutions in the string. If value is a list, then perform substitutions
-        in every string in the list.
-        :param value: String or list
-        :return: String or list but with everything substituted.
+        Get a handle to the contents of the given file.
         """
+        abspath = os.path.abspath(path)
+        st = os.stat(abspath)
+        key = (abspath, st.st_size, st.st_mtime_ns)
+        handle = TranscludedValue._handles.get(key)
+        if handle is None:
+            handle = TranscludedValue(abspath, st.st_size, st.st_mtime_ns)
+            TranscludedValue._handles[key] = handle
+        return handle
 
-        def subst_str(input_str: str) -> str:
-            """Substitute ${...}"""
-            return re.sub(__VARIABLE_EXPANSION_REGEX, lambda x: config_dict[x.group(1)], input_str)
+    @property
+    def value(self) -> str:
+        """The contents of the file."""
+        if self._value is None:
+            contents = b"" if self._mmap is None else self._mmap[:]
+            # Translate newlines like reading the file in text mode does.
+            self._value = contents.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        return self._value
+
+    def is_unchanged(self) -> bool:
+        """
+        Check if the file still exists and has not been modified since this handle was created, i.e. if it can be
+        referred to by path instead of by value.
+        """
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
 
-        newval = ""  # type: Union[str, List[str]]
+    def __str__(self) -> str:
+        return self.value
 
-        if isinstance(value, list):
-            newval = list(map(subst_str, value))
-        else:
-            newval = subst_str(value)
-        return newval
+    def __repr__(self) -> str:
+        return "TranscludedValue({path})".format(path=repr(self.path))
+
+    def __copy__(self) -> 'TranscludedValue':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'TranscludedValue':
+        return self
+
+
+def resolve_lazy_value(value: Any) -> Any:
+    """
+    Get the actual value of a config value which may be a lazy handle (e.g. TranscludedValue).
+    """
+    if isinstance(value, TranscludedValue):
+        return value.value
+    return value
+
+
+def resolve_lazy_values(config: dict) -> dict:
+    """
+    Get a copy of the given config with all lazy handles (e.g. TranscludedValue) resolved.
+    The config itself is returned if there are no lazy handles.
+    """
+    lazy_keys = [k for k, v in config.items() if isinstance(v, TranscludedValue)]
+    if len(lazy_keys) == 0:
+        return config
+    resolved = dict(config)
+    for key in lazy_keys:
+        resolved[key] = config[key].value
+    return resolved
+
+
+def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
+    """
+    Expand the meta directives for the given config dict and return a new
+    dictionary containing the updated settings with respect to the base config_dict.
+
+    :param config_dict: Base config.
+    :param meta_dict: Dictionary with potentially new meta directives.
+    :return: New dictionary with meta_dict updating config_dict.
+    """
+    base_config = config_dict
 
     # Helper functions to implement each meta directive.
     def meta_append(config_dict: dict, key: str, value: Any) -> None:
@@ -133,20 +358,22 @@ def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
             raise ValueError("Trying to append to non-list setting %s" % (key))
         if not isinstance(value, list):
             raise ValueError("Trying to append to list %s with non-list %s" % (key, str(value)))
-        config_dict[key] += value
+        # Build a new list since the old one may be shared with other configs.
+        config_dict[key] = config_dict[key] + value
 
     def meta_subst(config_dict: dict, key: str, value: Any) -> None:
-        config_dict[key] = perform_subst(value)
+        # Substitutions are done against the base config.
+        config_dict[key] = perform_subst(resolve_lazy_value(value), lambda k: resolve_lazy_value(base_config[k]))
 
     def meta_transclude(config_dict: dict, key: str, value: Any) -> None:
         """Transclude the contents of the file pointed to by value."""
+        value = resolve_lazy_value(value)
         assert isinstance(value, str), "Path to file for transclusion must be a string"
-        with open(value, "r") as f:
-            file_contents = str(f.read())
-        config_dict[key] = file_contents
+        config_dict[key] = TranscludedValue.open(value)
 
     def meta_json2list(config_dict: dict, key: str, value: Any) -> None:
         """Turn the value of the key (JSON list) into a list."""
+        value = resolve_lazy_value(value)
         assert isinstance(value, str), "json2list requires a JSON string that is a list"
         parsed = json.loads(value)
         assert isinstance(parsed, list), "json2list requires a JSON string that is a list"
@@ -169,7 +396,7 @@ def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
 
     def meta_prependlocal(config_dict: dict, key: str, value) -> None:
         """Prepend the local path of the config dict."""
-        config_dict[key] = os.path.join(meta_dict[CONFIG_PATH_KEY], str(value))
+        config_dict[key] = os.path.join(meta_dict[CONFIG_PATH_KEY], str(resolve_lazy_value(value)))
 
     # Lookup table of meta functions.
     meta_directive_functions = {
@@ -183,13 +410,14 @@ def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
         'prependlocal': meta_prependlocal
     }  # type: Dict[str, Callable[[dict, str, Any], None]]
 
-    newdict = deepdict(config_dict)
+    # Values are never modified in place by the meta directives, so a shallow
+    # copy is enough and unchanged values can be shared with config_dict.
+    newdict = dict(config_dict)
 
     # Find meta directives.
-    assert isinstance(meta_dict, dict)
-    meta_dict = deepdict(meta_dict)  # create a copy so we can remove items.
-    meta_dict_keys = list(meta_dict.keys())
-    meta_keys = filter(lambda k: k.endswith("_meta"), meta_dict_keys)
+    assert isinstance(meta_dict, Mapping)
+    meta_keys = [k for k in meta_dict.keys() if k.endswith("_meta")]
+    handled_keys = set()  # type: Set[str]
 
     # Deal with meta directives.
     meta_len = len("_meta")
@@ -204,6 +432,7 @@ def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
             meta_directives = meta_type_from_dict
 
         # Process each meta type in order.
+        value = meta_dict[setting]
         for meta_type in meta_directives:
             if not isinstance(meta_type, str):
                 raise TypeError("meta_type was not a string: " + repr(meta_type))
@@ -211,17 +440,119 @@ def update_and_expand_meta(config_dict: dict, meta_dict: dict) -> dict:
                 meta_func = meta_directive_functions[meta_type]
             except KeyError:
                 raise ValueError("The type of meta variable %s is not supported (%s)" % (meta_key, meta_type))
-            meta_func(newdict, setting, meta_dict[setting])
-            # Update meta_dict if there are multiple meta directives.
-            meta_dict[setting] = newdict[setting]
+            meta_func(newdict, setting, value)
+            # Feed the result into the next meta directive if there are multiple.
+            value = newdict[setting]
 
-        del meta_dict[meta_key]
-        del meta_dict[setting]
+        handled_keys.add(meta_key)
+        handled_keys.add(setting)
 
-    newdict.update(deepdict(meta_dict))  # Update everything else.
+    # Update everything else.
+    for key, value in meta_dict.items():
+        if key not in handled_keys:
+            newdict[key] = value
     return newdict
 
 
+class MergeStatistics:
+    """
+    Counters describing how much work a HammerDatabase did to keep its merged config up to date.
+    """
+
+    def __init__(self) -> None:
+        # Number of times get_config() had to re-merge anything.
+        self.rebuilds = 0  # type: int
+        # Number of layers (e.g. "project") which were re-merged.
+        self.layers_merged = 0  # type: int
+        # Number of settings from layer configs which were re-merged.
+        self.keys_merged = 0  # type: int
+        # Number of dynamic settings (e.g. dynamicsubst) which were re-resolved.
+        self.dynamic_keys_resolved = 0  # type: int
+        # Number of dict entries copied while merging (merges copy the accumulated config).
+        self.entries_copied = 0  # type: int
+
+    def reset(self) -> None:
+        """Reset all the counters to zero."""
+        self.rebuilds = 0
+        self.layers_merged = 0
+        self.keys_merged = 0
+        self.dynamic_keys_resolved = 0
+        self.entries_copied = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "rebuilds": self.rebuilds,
+            "layers_merged": self.layers_merged,
+            "keys_merged": self.keys_merged,
+            "dynamic_keys_resolved": self.dynamic_keys_resolved,
+            "entries_copied": self.entries_copied
+        }
+
+
+class DatabaseProfile:
+    """
+    Profile of how a HammerDatabase is used: how often each setting is read and what each merge cost.
+    See HammerDatabase.enable_profiling().
+    """
+
+    def __init__(self) -> None:
+        # Number of get_setting() calls per key.
+        self.get_counts = {}  # type: Dict[str, int]
+        # Number of get_config() calls (which read the whole config).
+        self.get_config_calls = 0  # type: int
+        # One entry per merge: layer which triggered it, duration, keys merged and dict entries copied.
+        self.rebuilds = []  # type: List[Dict[str, Any]]
+
+    def record_get(self, key: str) -> None:
+        self.get_counts[key] = self.get_counts.get(key, 0) + 1
+
+    def record_rebuild(self, layer: str, duration: float, keys_merged: int, entries_copied: int) -> None:
+        self.rebuilds.append({
+            "layer": layer,
+            "duration": duration,
+            "keys_merged": keys_merged,
+            "entries_copied": entries_copied
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        rebuilds_by_layer = {}  # type: Dict[str, Dict[str, Any]]
+        for rebuild in self.rebuilds:
+            summary = rebuilds_by_layer.setdefault(rebuild["layer"], {"count": 0, "duration": 0.0})
+            summary["count"] += 1
+            summary["duration"] += rebuild["duration"]
+        return {
+            "get_setting_calls": sum(self.get_counts.values()),
+            "get_config_calls": self.get_config_calls,
+            "get_counts": self.get_counts,
+            "rebuild_count": len(self.rebuilds),
+            "rebuild_duration": sum(r["duration"] for r in self.rebuilds),
+            "entries_copied": sum(r["entries_copied"] for r in self.rebuilds),
+            "rebuilds_by_layer": rebuilds_by_layer,
+            "rebuilds": self.rebuilds
+        }
+
+    def write_report(self, path: str) -> None:
+        """
+        Write the profile to the given path as JSON.
+        """
+        with open(path, "w") as f:
+            f.write(json.dumps(self.to_dict(), sort_keys=True, indent=4, separators=(',', ': ')))
+
+
+# Profiles to write when the program exits, by report path (see HammerDatabase.enable_profiling()).
+_profile_reports = {}  # type: Dict[str, DatabaseProfile]
+_profile_reports_lock = threading.Lock()
+# Whether _write_profile_reports is registered with atexit.
+_profile_reports_registered = False  # type: bool
+
+
+def _write_profile_reports() -> None:
+    with _profile_reports_lock:
+        reports = list(_profile_reports.items())
+    for path, profile in reports:
+        profile.write_report(path)
+
+
 class HammerDatabase:
     """
     Define a database which is composed of a set of overridable configs.
@@ -240,45 +571,254 @@ class HammerDatabase:
     - technology
     - environment
     - project
+    - overlay (stack of temporary project configs, e.g. per-module configs in hierarchical flows)
     - runtime (settings dynamically updated during the run a hammer run)
+
+    The merged result of the layers up to project and up to overlay is cached,
+    so that changing the overlays or runtime settings only re-merges those
+    layers. Changing a lower layer re-merges every layer.
+
+    The database may be used from several threads (e.g. concurrently running tool steps).
     """
 
+    # Names of the layers, in increasing order of precedence.
+    layer_names = ["builtins", "core", "tools", "technology", "environment", "project", "overlay",
+                   "runtime"]  # type: List[str]
+    # Layers whose merged prefix (the layers up to and including it) is cached, i.e. the base of the overlays and
+    # the runtime-free config. Every cached prefix is a full copy of the config, so the others are not kept.
+    cached_layer_names = ["project", "overlay"]  # type: List[str]
+
     def __init__(self) -> None:
-        self.builtins = []  # type: List[dict]
-        self.core = []  # type: List[dict]
-        self.tools = []  # type: List[dict]
-        self.technology = []  # type: List[dict]
-        self.environment = []  # type: List[dict]
-        self.project = []  # type: List[dict]
+        self.builtins = []  # type: List[Mapping]
+        self.core = []  # type: List[Mapping]
+        self.tools = []  # type: List[Mapping]
+        self.technology = []  # type: List[Mapping]
+        self.environment = []  # type: List[Mapping]
+        self.project = []  # type: List[Mapping]
+        self.overlay = []  # type: List[Mapping]
         self._runtime = {}  # type: Dict[str, Any]
 
         self.__config_cache = {}  # type: dict
-        self.__config_cache_dirty = False  # type: bool
+        # Same as __config_cache but with lazy values resolved. Built on demand.
+        self.__resolved_config_cache = None  # type: Optional[dict]
+        # Sorted keys of __config_cache for prefix queries. Built on demand.
+        self.__sorted_keys = None  # type: Optional[List[str]]
+        # __layer_cache[i] is the merged (but not finalized) config of layers 0 through i, for the layers in
+        # cached_layer_names. Entries at or above the dirty layer are stale.
+        self.__layer_cache = {}  # type: Dict[int, dict]
+        # Index of the lowest layer which needs to be re-merged.
+        # len(layer_names) means that the cache is up to date.
+        self.__dirty_layer = len(self.layer_names)  # type: int
+        # Runtime keys set since the last merge, used to only re-resolve affected dynamic settings.
+        self.__changed_runtime_keys = set()  # type: Set[str]
+        self.__resolver = DynamicMetaResolver()
+        self.__merge_stats = MergeStatistics()
+        self.__profile = None  # type: Optional[DatabaseProfile]
+        # Incremented on every change to the database.
+        self.__generation = 0  # type: int
+        # Guards the caches above.
+        self.__lock = threading.RLock()
+        # If set, called with the key of every setting read with get_setting() or checked with has_setting(), and with
+        # the prefix followed by "*" for get_settings_with_prefix(), e.g. to track the settings that a tool step uses.
+        self.read_listener = None  # type: Optional[Callable[[str], None]]
 
     @property
     def runtime(self) -> List[dict]:
         return [self._runtime]
 
+    @property
+    def generation(self) -> int:
+        """
+        Counter which changes whenever any setting in the database may have changed.
+        Useful for caching values derived from settings.
+        """
+        return self.__generation
+
+    @property
+    def merge_stats(self) -> MergeStatistics:
+        """Counters for the amount of merging work done by get_config()."""
+        return self.__merge_stats
+
+    @property
+    def profile(self) -> Optional[DatabaseProfile]:
+        """The profile of this database if profiling is enabled, else None."""
+        return self.__profile
+
+    def enable_profiling(self, report_path: Optional[str] = None) -> DatabaseProfile:
+        """
+        Start profiling accesses to and merges of this database.
+
+        :param report_path: If given, write the profile as a JSON report to this path when the program exits.
+        :return: The profile, which is updated as the database is used.
+        """
+        global _profile_reports_registered
+        if self.__profile is None:
+            self.__profile = DatabaseProfile()
+        if report_path is not None:
+            with _profile_reports_lock:
+                _profile_reports[report_path] = self.__profile
+                if not _profile_reports_registered:
+                    atexit.register(_write_profile_reports)
+                    _profile_reports_registered = True
+        return self.__profile
+
     @staticmethod
     def internal_keys() -> Set[str]:
         """Internal keys that shouldn't show up in any final config."""
         return {CONFIG_PATH_KEY}
 
+    @staticmethod
+    def _compact_layer(configs: List[dict]) -> List[Mapping]:
+        """
+        Convert the configs of a layer to CompactConfig for storage.
+        """
+        return [CompactConfig.from_config(config) for config in configs]
+
+    def _mark_dirty(self, layer: str) -> None:
+        """
+        Mark the given layer (and therefore every layer above it) as needing to be re-merged.
+
+        :param layer: Name of the layer (see layer_names).
+        """
+        with self.__lock:
+            self.__dirty_layer = min(self.__dirty_layer, self.layer_names.index(layer))
+            self.__generation += 1
+
     def get_config(self) -> dict:
         """
         Get the config of this database after all the overrides have been dealt with.
         """
-        if self.__config_cache_dirty:
-            self.__config_cache = combine_configs(
-                [{}] + self.builtins + self.core + self.tools + self.technology + self.environment +
-                self.project + self.runtime)
-            self.__config_cache_dirty = False
-        return self.__config_cache
+        with self.__lock:
+            if self.__profile is not None:
+                self.__profile.get_config_calls += 1
+            config = self.get_unresolved_config()
+            if self.__resolved_config_cache is None:
+                self.__resolved_config_cache = resolve_lazy_values(config)
+            return self.__resolved_config_cache
+
+    def get_unresolved_config(self) -> dict:
+        """
+        Get the config of this database like get_config(), except that lazy values (e.g. TranscludedValue handles)
+        are left as-is. See resolve_lazy_value().
+        """
+        with self.__lock:
+            num_layers = len(self.layer_names)
+            if self.__dirty_layer < num_layers:
+                start_time = time.perf_counter()
+                keys_merged = 0
+                entries_copied = 0
+                start = self.__dirty_layer
+                base = max([i for i in self.__layer_cache if i < start], default=-1)
+                merged = {} if base < 0 else self.__layer_cache[base]  # type: dict
+                for i in range(base + 1, num_layers):
+                    for config in getattr(self, self.layer_names[i]):  # type: dict
+                        entries_copied += len(merged)
+                        merged = update_and_expand_meta(merged, config)
+                        keys_merged += len(config)
+                    if self.layer_names[i] in self.cached_layer_names:
+                        # Layers without configs leave merged as-is, so e.g. without overlays both cached
+                        # prefixes are the same dict.
+                        self.__layer_cache[i] = merged
+                    self.__merge_stats.layers_merged += 1
+                changed_keys = self.__changed_runtime_keys if start == self.layer_names.index("runtime") else None
+                entries_copied += len(merged)
+                self.__config_cache = self.__resolver.resolve(merged, changed_keys)
+                self.__merge_stats.keys_merged += keys_merged
+                self.__merge_stats.entries_copied += entries_copied
+                if self.__profile is not None:
+                    self.__profile.record_rebuild(self.layer_names[start], time.perf_counter() - start_time,
+                                                  keys_merged, entries_copied)
+                self.__resolved_config_cache = None
+                self.__update_key_index(changed_keys)
+                self.__changed_runtime_keys = set()
+                self.__merge_stats.rebuilds += 1
+                self.__merge_stats.dynamic_keys_resolved += self.__resolver.last_evaluated
+                self.__dirty_layer = num_layers
+            return self.__config_cache
+
+    def __update_key_index(self, changed_keys: Optional[Set[str]]) -> None:
+        """
+        Update the sorted key index after a merge.
+
+        :param changed_keys: Runtime keys changed by the merge, or None if anything may have changed.
+        """
+        if self.__sorted_keys is None:
+            return
+        if changed_keys is None or any(k.endswith("_meta") for k in changed_keys):
+            # Meta keys can remove other keys, so just start over.
+            self.__sorted_keys = None
+            return
+        for key in changed_keys:
+            i = bisect.bisect_left(self.__sorted_keys, key)
+            indexed = i < len(self.__sorted_keys) and self.__sorted_keys[i] == key
+            if key in self.__config_cache and not indexed:
+                self.__sorted_keys.insert(i, key)
+            elif key not in self.__config_cache and indexed:
+                del self.__sorted_keys[i]
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        """
+        Iterate (in sorted order) over the keys which start with the given prefix.
+        Takes time proportional to the number of matching keys.
+
+        :param prefix: Prefix (e.g. "vlsi.inputs.").
+        """
+        with self.__lock:
+            config = self.get_unresolved_config()
+            if self.__sorted_keys is None:
+                self.__sorted_keys = sorted(config.keys())
+            sorted_keys = self.__sorted_keys
+            start = i = bisect.bisect_left(sorted_keys, prefix)
+            while i < len(sorted_keys) and sorted_keys[i].startswith(prefix):
+                i += 1
+            # Copy the matching keys since the index is updated in place by later changes.
+            keys = sorted_keys[start:i]
+        return iter(keys)
+
+    def get_settings_with_prefix(self, prefix: str, nullvalue: Any = "null") -> Dict[str, Any]:
+        """
+        Retrieve all the settings whose keys start with the given prefix.
+
+        :param prefix: Prefix (e.g. "vlsi.inputs.").
+        :param nullvalue: Value to return out for nulls.
+        :return: Dictionary of the matching keys to their values.
+        """
+        if self.read_listener is not None:
+            self.read_listener(prefix + "*")
+        return {key: self.get_setting(key, nullvalue) for key in list(self.keys_with_prefix(prefix))}
+
+    def iter_namespace(self, namespace: str, nullvalue: Any = "null") -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate (in sorted order) over the settings in the given namespace.
+        e.g. iter_namespace("synthesis.yosys") yields ("version", "0.7") for the setting "synthesis.yosys.version".
 
-    def get_database_json(self) -> str:
+        :param namespace: Namespace without the trailing "." (e.g. "vlsi.inputs").
+        :param nullvalue: Value to return out for nulls.
+        :return: Iterator of (key relative to the namespace, value).
+        """
+        prefix = namespace + "."
+        for key in list(self.keys_with_prefix(prefix)):
+            yield key[len(prefix):], self.get_setting(key, nullvalue)
+
+    def get_database_json(self, transclude_by_reference: bool = False) -> str:
         """Get the database (get_config) in JSON form as a string.
+
+        :param transclude_by_reference: If true, emit transcluded values whose files are unchanged as a path with a
+                                        "transclude" meta instead of the contents of the file. Loading the JSON back
+                                        into a HammerDatabase gives the same settings either way.
         """
-        return json.dumps(self.get_config(), sort_keys=True, indent=4, separators=(',', ': '))
+        if transclude_by_reference:
+            config = dict(self.get_unresolved_config())
+            for key, value in self.get_unresolved_config().items():
+                if isinstance(value, TranscludedValue):
+                    if value.is_unchanged():
+                        config[key] = value.path
+                        config[key + "_meta"] = "transclude"
+                    else:
+                        config[key] = value.value
+        else:
+            config = self.get_config()
+        return json.dumps(config, sort_keys=True, indent=4, separators=(',', ': '))
 
     def get(self, key: str) -> Any:
         """Alias for get_setting()."""
@@ -292,18 +832,27 @@ class HammerDatabase:
         """Alias for has_setting()."""
         return self.has_setting(item)
 
-    def get_setting(self, key: str, nullvalue: str = "null") -> Any:
+    def get_setting(self, key: str, nullvalue: Any = "null") -> Any:
         """
         Retrieve the given key.
+        Lists and dictionaries are copied, since the stored values are shared between configs.
 
         :param key: Desired key.
         :param nullvalue: Value to return out for nulls.
         :return: The given config
         """
-        if key not in self.get_config():
+        if self.read_listener is not None:
+            self.read_listener(key)
+        with self.__lock:
+            if self.__profile is not None:
+                self.__profile.record_get(key)
+            config = self.get_unresolved_config()
+        if key not in config:
             raise KeyError("Key " + key + " is missing")
         else:
-            value = self.get_config()[key]
+            value = resolve_lazy_value(config[key])
+            if isinstance(value, (list, dict)):
+                return deepcopy(value)
             return nullvalue if value is None else value
 
     def set_setting(self, key: str, value: Any) -> None:
@@ -313,8 +862,10 @@ class HammerDatabase:
         :param key: Key
         :param value: Value for key
         """
-        self._runtime[key] = value
-        self.__config_cache_dirty = True
+        with self.__lock:
+            self._runtime[key] = value
+            self.__changed_runtime_keys.add(key)
+            self._mark_dirty("runtime")
 
     def has_setting(self, key: str) -> bool:
         """
@@ -323,49 +874,90 @@ class HammerDatabase:
         :param key: Desired key.
         :return: True if the given setting exists.
         """
-        return key in self.get_config()
+        if self.read_listener is not None:
+            self.read_listener(key)
+        return key in self.get_unresolved_config()
 
     def update_core(self, core_config: List[dict]) -> None:
         """
         Update the core config with the given core config.
         """
-        self.core = core_config
-        self.__config_cache_dirty = True
+        self.core = self._compact_layer(core_config)
+        self._mark_dirty("core")
 
     def update_tools(self, tools_config: List[dict]) -> None:
         """
         Update the tools config with the given tools config.
         """
-        self.tools = tools_config
-        self.__config_cache_dirty = True
+        self.tools = self._compact_layer(tools_config)
+        self._mark_dirty("tools")
 
     def update_technology(self, technology_config: List[dict]) -> None:
         """
         Update the technology config with the given technology config.
         """
-        self.technology = technology_config
-        self.__config_cache_dirty = True
+        self.technology = self._compact_layer(technology_config)
+        self._mark_dirty("technology")
 
     def update_environment(self, environment_config: List[dict]) -> None:
         """
         Update the environment config with the given environment config.
         """
-        self.environment = environment_config
-        self.__config_cache_dirty = True
+        self.environment = self._compact_layer(environment_config)
+        self._mark_dirty("environment")
 
     def update_project(self, project_config: List[dict]) -> None:
         """
         Update the project config with the given project config.
         """
-        self.project = project_config
-        self.__config_cache_dirty = True
+        self.project = self._compact_layer(project_config)
+        self._mark_dirty("project")
 
     def update_builtins(self, builtins_config: List[dict]) -> None:
         """
         Update the builtins config with the given builtins config.
         """
-        self.builtins = builtins_config
-        self.__config_cache_dirty = True
+        self.builtins = self._compact_layer(builtins_config)
+        self._mark_dirty("builtins")
+
+    def push_overlay(self, overlay_config: dict) -> None:
+        """
+        Push a temporary config on top of the project config (but below runtime settings).
+        Only the overlays and runtime settings get re-merged; the merged layers below are reused as-is.
+
+        :param overlay_config: Config to overlay.
+        """
+        overlay = self._compact_layer([overlay_config])
+        with self.__lock:
+            self.overlay = self.overlay + overlay
+            self._mark_dirty("overlay")
+
+    def pop_overlay(self) -> Mapping:
+        """
+        Remove the most recently pushed overlay.
+
+        :return: The removed overlay.
+        """
+        with self.__lock:
+            if len(self.overlay) == 0:
+                raise ValueError("No overlay to pop")
+            popped = self.overlay[-1]
+            self.overlay = self.overlay[:-1]
+            self._mark_dirty("overlay")
+        return popped
+
+    @contextmanager
+    def overlay_config(self, overlay_config: dict) -> Iterator[None]:
+        """
+        Context manager which pushes the given overlay (see push_overlay()) and pops it on exit.
+
+        :param overlay_config: Config to overlay.
+        """
+        self.push_overlay(overlay_config)
+        try:
+            yield
+        finally:
+            self.pop_overlay()
 
 
 def load_config_from_string(contents: str, is_yaml: bool, path: str = "unspecified") -> dict:
@@ -387,6 +979,7 @@ def load_config_from_file(filename: str, strict: bool = False) -> dict:
     Load config from a filename, returning a blank dictionary if the file is
     empty, instead of an error.
     Supports .yml and .json, and will raise an error otherwise.
+    Parsed configs are cached on disk if a config cache is configured (see get_config_cache).
 
     :param filename: Filename to the config in .yml or .json.
     :param strict: Set to true to error if the file is not found.
@@ -411,9 +1004,20 @@ def load_config_from_file(filename: str, strict: bool = False) -> dict:
 
     if file_contents.strip() == "":
         return {}
-    else:
+
+    cache = get_config_cache()
+    if cache is None:
         return load_config_from_string(file_contents, is_yaml, path=os.path.dirname(filename))
 
+    raw_contents = file_contents.encode("utf-8")
+    unpacked = cache.get(filename, raw_contents)
+    if unpacked is None:
+        unpacked = unpack(load_yaml(file_contents) if is_yaml else json.loads(file_contents))
+        cache.put(filename, raw_contents, unpacked)
+    # The config path is set after caching since it is already part of the cache key.
+    unpacked[CONFIG_PATH_KEY] = os.path.dirname(filename)
+    return unpacked
+
 
 def combine_configs(configs: Iterable[dict]) -> dict:
     """
@@ -421,67 +1025,187 @@ def combine_configs(configs: Iterable[dict]) -> dict:
     Later configs in the list will override the earlier configs.
 
     :param configs: List of configs.
-    :param handle_meta: Handle meta configs?
     :return: A loaded config dictionary.
     """
     expanded_config_reduce = reduce(update_and_expand_meta, configs, {}) # type: dict
-    expanded_config = deepdict(expanded_config_reduce) # type: dict
-    expanded_config_orig = deepdict(expanded_config) # type: dict
+    return resolve_lazy_values(expand_dynamic_metas(expanded_config_reduce))
 
-    # Now, we need to handle dynamic* metas.
-    dynamic_metas = {}
 
-    meta_dict_keys = list(expanded_config.keys())
-    meta_keys = list(filter(lambda k: k.endswith("_meta"), meta_dict_keys))
+def expand_dynamic_metas(merged_config: dict) -> dict:
+    """
+    Resolve the dynamic* metas left over in a merged (but not yet finalized) config, and remove internal keys.
+    This is the final step of combine_configs().
+
+    :param merged_config: Config produced by successive calls to update_and_expand_meta.
+    :return: A loaded config dictionary.
+    """
+    return DynamicMetaResolver().resolve(merged_config)
 
-    meta_len = len("_meta")
-    for meta_key in meta_keys:
-        setting = meta_key[:-meta_len] # type: str
-        meta_type = expanded_config[meta_key] # type: str
 
-        assert meta_type.startswith("dynamic"), "Should have only dynamic metas left now"
+class DynamicMetaResolver:
+    """
+    Resolve the dynamic* metas (e.g. dynamicsubst) of a merged config.
+
+    A dynamicsubst may reference other dynamic settings, so the ${...} references
+    between dynamic settings form a DAG which is evaluated in topological order.
+    The resolver remembers the graph and the results of the last resolve() so that
+    a later resolve() which is told which keys changed only re-evaluates the
+    dynamic settings affected by them.
+    """
 
-        # Create dynamic_metas without the dynamic part.
-        # e.g. what used to be a dynamicsubst just becomes a plain subst since everything is fully resolved now.
-        dynamic_metas[meta_key] = meta_type[len("dynamic"):]
-        dynamic_metas[setting] = expanded_config[setting] # copy over the template too
+    def __init__(self) -> None:
+        # Dynamic setting -> meta type (e.g. "dynamicsubst") and template value.
+        self._metas = {}  # type: Dict[str, str]
+        self._templates = {}  # type: Dict[str, Any]
+        # Dynamic settings in evaluation order.
+        self._order = []  # type: List[str]
+        # Key -> dynamic settings which reference it directly.
+        self._dependents = {}  # type: Dict[str, List[str]]
+        # Resolved values of the dynamic settings.
+        self._results = {}  # type: Dict[str, Any]
+        # Number of dynamic settings evaluated by the last resolve().
+        self.last_evaluated = 0  # type: int
+
+    def resolve(self, merged_config: dict, changed_keys: Optional[Set[str]] = None) -> dict:
+        """
+        Resolve the dynamic metas in the given merged config and remove internal keys.
 
-        # Just check that we don't reference any other dynamicsubst variables for now.
-        # We can always go to a DAG tree later if need be.
-        if meta_type == "dynamicsubst":
-            matches = re.finditer(__VARIABLE_EXPANSION_REGEX, expanded_config[setting], re.DOTALL)
-            for match in matches:
-                target_var = match.group(1)
-                # Ensure that the target variable isn't also a dynamicsubst variable.
-                if target_var + "_meta" in expanded_config_orig: # make sure the order in which we delete doesn't affect this search
-                    raise ValueError("dynamicsubst variable referencing another dynamic variable not supported yet")
+        :param merged_config: Config produced by successive calls to update_and_expand_meta.
+        :param changed_keys: If given, the only keys whose values changed since the last call to resolve().
+                             None means that everything must be re-evaluated.
+        :return: A loaded config dictionary.
+        """
+        # Only top-level keys get removed below, so a shallow copy suffices.
+        expanded_config = dict(merged_config)  # type: dict
+
+        metas = {}  # type: Dict[str, str]
+        meta_len = len("_meta")
+        for meta_key in [k for k in merged_config.keys() if k.endswith("_meta")]:
+            meta_type = merged_config[meta_key]  # type: str
+            assert meta_type.startswith("dynamic"), "Should have only dynamic metas left now"
+            setting = meta_key[:-meta_len]
+            metas[setting] = meta_type
+            del expanded_config[meta_key]
+            del expanded_config[setting]
+
+        if changed_keys is None or metas != self._metas or not changed_keys.isdisjoint(metas.keys()):
+            self._build_graph(merged_config, metas)
+            to_evaluate = self._order
+        else:
+            # Find every dynamic setting which (transitively) depends on a changed key.
+            affected = set()  # type: Set[str]
+            stack = list(changed_keys)
+            while len(stack) > 0:
+                for dependent in self._dependents.get(stack.pop(), []):
+                    if dependent not in affected:
+                        affected.add(dependent)
+                        stack.append(dependent)
+            to_evaluate = [k for k in self._order if k in affected]
+
+        def lookup(key: str) -> Any:
+            if key in metas:
+                return resolve_lazy_value(self._results[key])
+            return resolve_lazy_value(expanded_config[key])
+
+        for setting in to_evaluate:
+            self._results[setting] = self._evaluate(metas[setting], self._templates[setting], lookup)
+        self.last_evaluated = len(to_evaluate)
+
+        expanded_config.update(self._results)
+
+        # Remove the temporary key used for path metas.
+        if CONFIG_PATH_KEY in expanded_config:
+            del expanded_config[CONFIG_PATH_KEY]
+
+        return expanded_config
+
+    def _build_graph(self, merged_config: dict, metas: Dict[str, str]) -> None:
+        """
+        Build the reference graph of the dynamic settings and their evaluation order.
+        """
+        templates = {setting: merged_config[setting] for setting in metas}
+        dependents = {}  # type: Dict[str, List[str]]
+
+        # graph is dependency -> (dependents, dependencies) for topological_sort.
+        graph = {setting: ([], []) for setting in metas}  # type: Dict[str, Tuple[List[str], List[str]]]
+        for setting, meta_type in metas.items():
+            if meta_type != "dynamicsubst":
+                continue
+            for reference in sorted(get_subst_references(templates[setting])):
+                dependents.setdefault(reference, []).append(setting)
+                if reference in metas:
+                    graph[reference][0].append(setting)
+                    graph[setting][1].append(reference)
+
+        starting_nodes = sorted(k for k, v in graph.items() if len(v[1]) == 0)
+        order = topological_sort(graph, starting_nodes)
+        if len(order) != len(metas):
+            # Forget everything so that the next resolve() starts from scratch.
+            self._metas = {}
+            unresolvable = sorted(set(metas.keys()) - set(order))
+            raise ValueError("Cycle detected between dynamic settings: " + ", ".join(unresolvable))
+
+        self._metas = metas
+        self._templates = templates
+        self._dependents = dependents
+        self._order = order
+        self._results = {}
 
-        # Delete from expanded_config
-        del expanded_config[meta_key]
-        del expanded_config[setting]
+    @staticmethod
+    def _evaluate(meta_type: str, template: Any, lookup: Callable[[str], Any]) -> Any:
+        """
+        Evaluate a single dynamic setting now that everything it references is resolved.
+        e.g. what used to be a dynamicsubst just becomes a plain subst.
+        """
+        static_meta = meta_type[len("dynamic"):]
+        if static_meta == "subst":
+            return perform_subst(resolve_lazy_value(template), lookup)
+        else:
+            return update_and_expand_meta({}, {"value": template, "value_meta": static_meta})["value"]
 
-    final_dict = update_and_expand_meta(expanded_config, dynamic_metas)
 
-    # Remove the temporary key used for path metas.
-    if CONFIG_PATH_KEY in final_dict:
-        del final_dict[CONFIG_PATH_KEY]
+# Environment variable for the default backend of load_config_from_paths.
+CONFIG_LOAD_BACKEND_ENV = "HAMMER_CONFIG_LOAD_BACKEND"
+CONFIG_LOAD_BACKENDS = ["serial", "thread", "process"]
 
-    return final_dict
 
-def load_config_from_paths(config_paths: Iterable[str], strict: bool = False) -> List[dict]:
+def load_config_from_paths(config_paths: Iterable[str], strict: bool = False, backend: Optional[str] = None,
+                           max_workers: Optional[int] = None) -> List[dict]:
     """
     Load configuration from paths containing \*.yml and \*.json files.
     As noted in README.config, .json will take precedence over .yml files.
 
+    Files can be loaded concurrently; the result is in the same order (and raises the same errors) as loading them
+    one by one. Note that with the "process" backend, config cache statistics are only kept in the worker processes.
+
     :param config_paths: Path to \*.yml and \*.json config files.
     :param strict: Set to true to error if the file is not found.
+    :param backend: How to load the files: "serial", "thread" (a thread pool) or "process" (a process pool).
+                    Defaults to the HAMMER_CONFIG_LOAD_BACKEND environment variable, or "serial" if unset.
+    :param max_workers: Maximum number of threads/processes to use. Defaults to one per file, up to 32.
     :return: A list of configs in increasing order of precedence.
     """
     # Put the .json configs after the .yml configs to make sure .json takes
     # precedence over .yml.
     sorted_paths = sorted(config_paths, key=lambda x: x.endswith(".json"))
 
-    return list(map(lambda path: load_config_from_file(path, strict), sorted_paths))
+    if backend is None:
+        backend = os.environ.get(CONFIG_LOAD_BACKEND_ENV, "serial")
+    if backend not in CONFIG_LOAD_BACKENDS:
+        raise ValueError("Invalid config load backend {backend}, must be one of {backends}".format(
+            backend=backend, backends=", ".join(CONFIG_LOAD_BACKENDS)))
+
+    if backend == "serial" or len(sorted_paths) <= 1:
+        return list(map(lambda path: load_config_from_file(path, strict), sorted_paths))
+
+    if max_workers is None:
+        max_workers = min(32, len(sorted_paths))
+    # Set up the config cache (if any) before any workers use it.
+    get_config_cache()
+    executor_type = ThreadPoolExecutor if backend == "thread" else ProcessPoolExecutor  # type: Callable[..., Executor]
+    with executor_type(max_workers=max_workers) as executor:
+        # executor.map() returns results in order and re-raises the first error in order when iterated.
+        return list(executor.map(load_config_from_file, sorted_paths, itertools.repeat(strict)))
 
 def load_config_from_defaults(path: str, strict: bool = False) -> List[dict]:
     """
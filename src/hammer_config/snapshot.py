@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  snapshot.py
+#  Compact binary snapshot of a final config, for quick key lookups from scripts.
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+# Layout (all integers little-endian):
+#   header: magic (8 bytes), format version (u32), number of entries (u32)
+#   index:  one entry per key, sorted by the UTF-8 bytes of the key:
+#           key offset (u64), key length (u32), value offset (u64), value length (u32), flags (u32)
+#   blobs:  UTF-8 keys followed by the JSON-encoded values (or paths, for transcluded files).
+# Offsets are from the start of the file, so that a lookup is a binary search
+# over the index which only decodes the entries it touches.
+
+import json
+import mmap
+import struct
+from typing import Any, Dict, Iterator, Tuple
+
+from hammer_utils import write_file_atomically
+
+from .config_src import TranscludedValue
+
+__all__ = ['SNAPSHOT_MAGIC', 'write_snapshot', 'is_snapshot', 'HammerDatabaseSnapshot']
+
+SNAPSHOT_MAGIC = b"HAMMERDB"
+SNAPSHOT_VERSION = 1
+
+_HEADER = struct.Struct("<8sII")
+_INDEX_ENTRY = struct.Struct("<QIQII")
+
+# Flags for index entries.
+# Value is a JSON blob.
+_FLAG_JSON = 0
+# Value is a transcluded file, stored by reference as a JSON string with the path to the file.
+_FLAG_TRANSCLUDE = 1
+
+
+def write_snapshot(config: dict, path: str) -> None:
+    """
+    Write the given final config (e.g. HammerDatabase.get_config()) to a snapshot file.
+    The file is written atomically, so readers never see a partial snapshot.
+    Transcluded values (see HammerDatabase.get_unresolved_config()) whose files are unchanged are stored by reference.
+
+    :param config: Config to write. Values must be JSON-serializable.
+    :param path: Path to the snapshot file.
+    """
+    def encode(value: Any) -> Tuple[bytes, int]:
+        flags = _FLAG_JSON
+        if isinstance(value, TranscludedValue):
+            if value.is_unchanged():
+                value, flags = value.path, _FLAG_TRANSCLUDE
+            else:
+                value = value.value
+        return json.dumps(value, separators=(',', ':')).encode("utf-8"), flags
+
+    entries = sorted((key.encode("utf-8"),) + encode(value) for key, value in config.items())
+
+    index_start = _HEADER.size
+    offset = index_start + _INDEX_ENTRY.size * len(entries)
+    index = []  # type: list
+    blobs = []  # type: list
+    for key, value, flags in entries:
+        key_offset = offset
+        value_offset = key_offset + len(key)
+        offset = value_offset + len(value)
+        index.append(_INDEX_ENTRY.pack(key_offset, len(key), value_offset, len(value), flags))
+        blobs.append(key)
+        blobs.append(value)
+
+    contents = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(entries)) + b"".join(index) + b"".join(blobs)
+    write_file_atomically(path, contents)
+
+
+def is_snapshot(path: str) -> bool:
+    """
+    Check if the given file is a database snapshot (as opposed to e.g. a JSON database).
+    """
+    with open(path, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class HammerDatabaseSnapshot:
+    """
+    Read-only view of a snapshot written by write_snapshot().
+    The file is memory-mapped and only the entries needed by a lookup are decoded.
+    Lookups have the same semantics as the HammerDatabase equivalents.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self.close()
+            raise ValueError("Database snapshot %s is truncated" % (path))
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.close()
+            raise ValueError("%s is not a database snapshot" % (path))
+        if version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError("Unsupported database snapshot version %d in %s" % (version, path))
+        self._count = count  # type: int
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> 'HammerDatabaseSnapshot':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int, int]:
+        return _INDEX_ENTRY.unpack_from(self._mmap, _HEADER.size + _INDEX_ENTRY.size * i)
+
+    def _key(self, i: int) -> bytes:
+        key_offset, key_length, _, _, _ = self._entry(i)
+        return self._mmap[key_offset:key_offset + key_length]
+
+    def _value(self, i: int) -> Any:
+        _, _, value_offset, value_length, flags = self._entry(i)
+        value = json.loads(self._mmap[value_offset:value_offset + value_length].decode("utf-8"))
+        if flags == _FLAG_TRANSCLUDE:
+            return TranscludedValue.open(value).value
+        return value
+
+    def _lower_bound(self, target: bytes) -> int:
+        """
+        Binary search for the first key which is not less than target.
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, key: str) -> int:
+        """
+        Binary search for the given key.
+
+        :return: Index of the key, or -1 if not present.
+        """
+        target = key.encode("utf-8")
+        i = self._lower_bound(target)
+        if i < self._count and self._key(i) == target:
+            return i
+        return -1
+
+    def keys(self) -> Iterator[str]:
+        """Iterate over all keys in sorted order."""
+        for i in range(self._count):
+            yield self._key(i).decode("utf-8")
+
+    def _indices_with_prefix(self, prefix: str) -> Iterator[Tuple[int, str]]:
+        target = prefix.encode("utf-8")
+        i = self._lower_bound(target)
+        while i < self._count:
+            key = self._key(i)
+            if not key.startswith(target):
+                break
+            yield i, key.decode("utf-8")
+            i += 1
+
+    def keys_with_prefix(self, prefix: str) -> Iterator[str]:
+        """
+        Iterate (in sorted order) over the keys which start with the given prefix.
+        Takes time proportional to the number of matching keys.
+        """
+        for _, key in self._indices_with_prefix(prefix):
+            yield key
+
+    def get_settings_with_prefix(self, prefix: str, nullvalue: Any = "null") -> Dict[str, Any]:
+        """
+        Retrieve all the settings whose keys start with the given prefix.
+
+        :param prefix: Prefix (e.g. "vlsi.inputs.").
+        :param nullvalue: Value to return out for nulls.
+        :return: Dictionary of the matching keys to their values.
+        """
+        settings = {}  # type: Dict[str, Any]
+        for i, key in self._indices_with_prefix(prefix):
+            value = self._value(i)
+            settings[key] = nullvalue if value is None else value
+        return settings
+
+    def get_setting(self, key: str, nullvalue: Any = "null") -> Any:
+        """
+        Retrieve the given key.
+
+        :param key: Desired key.
+        :param nullvalue: Value to return out for nulls.
+        :return: The given config
+        """
+        i = self._find(key)
+        if i < 0:
+            raise KeyError("Key " + key + " is missing")
+        value = self._value(i)
+        return nullvalue if value is None else value
+
+    def has_setting(self, key: str) -> bool:
+        """
+        Check if the given key exists in the snapshot.
+
+        :param key: Desired key.
+        :return: True if the given setting exists.
+        """
+        return self._find(key) >= 0
+
+    def __getitem__(self, key: str) -> Any:
+        """Alias for get_setting()."""
+        return self.get_setting(key)
+
+    def __contains__(self, item: str) -> bool:
+        """Alias for has_setting()."""
+        return self.has_setting(item)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  Memory benchmark for config layer storage.
+#  Compares the memory used by several copies (layers) of a synthetic config stored as:
+#  - the nested dict-of-dicts produced by the YAML/JSON parsers,
+#  - flat dicts with dotted keys built by string concatenation (unpack without interning),
+#  - CompactConfig with interned keys (what HammerDatabase stores),
+#  - a whole HammerDatabase with one layer per copy, including its merged caches (e.g. the cached layer prefixes).
+#
+#  Usage: memory_benchmark.py [--keys 100000] [--layers 7]
+#
+#  Copyright 2018 Edward Wang <edward.c.wang@compdigitec.com>
+
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Callable, List
+
+import hammer_config
+
+
+def synthetic_config_json(num_keys: int) -> str:
+    """
+    Generate a synthetic nested config with num_keys leaves, shaped like technology library settings
+    (e.g. "technology.lib12.cell345.pin6"), as a JSON string.
+    """
+    config = {}  # type: dict
+    for i in range(num_keys):
+        lib = config.setdefault("technology", {}).setdefault("lib{}".format(i // 10000), {})
+        cell = lib.setdefault("cell{}".format(i // 10), {})
+        cell["pin{}".format(i % 10)] = i
+    return json.dumps(config)
+
+
+def unpack_without_interning(config_dict: dict, prefix: str = "") -> dict:
+    """Flatten like hammer_config.unpack, but without interning keys."""
+    real_prefix = "" if prefix == "" else prefix + "."
+    output_dict = {}
+    for key, value in config_dict.items():
+        if isinstance(value, dict):
+            output_dict.update(unpack_without_interning(value, real_prefix + key))
+        else:
+            output_dict[real_prefix + key] = value
+    return output_dict
+
+
+def build_database(contents: str, num_layers: int) -> hammer_config.HammerDatabase:
+    """
+    Build a HammerDatabase with the config in each of its first num_layers (non-runtime) layers, and merge it.
+    """
+    db = hammer_config.HammerDatabase()
+    updates = [db.update_builtins, db.update_core, db.update_tools, db.update_technology, db.update_environment,
+               db.update_project]
+    for i in range(num_layers):
+        config = hammer_config.unpack(json.loads(contents))
+        if i < len(updates):
+            updates[i]([config])
+        else:
+            db.push_overlay(config)
+    db.get_config()
+    return db
+
+
+def measure(build: Callable[[], List[object]]) -> int:
+    """Return the bytes still allocated by the objects built by build()."""
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Memory benchmark for config layer storage")
+    parser.add_argument("--keys", type=int, default=100000, help="Number of keys in the config")
+    parser.add_argument("--layers", type=int, default=7, help="Number of copies of the config (e.g. layers)")
+    args = parser.parse_args()
+
+    contents = synthetic_config_json(args.keys)
+
+    # Each layer is parsed separately, like separate config files or processes would be.
+    layouts = [
+        ("nested dict-of-dicts", lambda: [json.loads(contents) for _ in range(args.layers)]),
+        ("flat dict (concatenated keys)",
+         lambda: [unpack_without_interning(json.loads(contents)) for _ in range(args.layers)]),
+        ("CompactConfig (interned keys)",
+         lambda: [hammer_config.CompactConfig(hammer_config.unpack(json.loads(contents)))
+                  for _ in range(args.layers)]),
+        ("HammerDatabase (with caches)", lambda: [build_database(contents, args.layers)]),
+    ]
+
+    print("{keys} keys x {layers} layers".format(keys=args.keys, layers=args.layers))
+    baseline = None
+    for name, build in layouts:
+        used = measure(build)
+        if baseline is None:
+            baseline = used
+        print("{name:32} {mib:10.1f} MiB {ratio:8.2f}x".format(name=name, mib=used / (1024 * 1024),
+                                                               ratio=used / baseline))
+
+
+if __name__ == '__main__':
+    main()
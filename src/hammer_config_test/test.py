@@ -4,11 +4,17 @@
 #  Unit tests for the hammer_config module.
 #
 #  Copyright 2017 Edward Wang <edward.c.wang@compdigitec.com>
+import json
+import pickle
+import shutil
 import tempfile
+import threading
+from typing import Any, List, Mapping, Sequence
 
 import hammer_config
 
 import unittest
+from unittest import mock
 
 import os
 
@@ -157,10 +163,7 @@ style: "waterfall"
 
     def test_meta_dynamicsubst_other_dynamicsubst(self):
         """
-        Check that a dynamicsubst which references other dynamicsubst errors for now.
-        """
-        """
-        Test that the meta attribute "dynamicsubst" works.
+        Check that a dynamicsubst which references other dynamicsubst gets resolved.
         """
         db = hammer_config.HammerDatabase()
         base = hammer_config.load_config_from_string("""
@@ -181,8 +184,61 @@ foo:
 """, is_yaml=False)
         db.update_core([base])
         db.update_project([project])
+        self.assertEqual(db.get_setting("foo.twelve"), "whatever")
+        self.assertEqual(db.get_setting("later"), "whatever")
+
+    def test_meta_dynamicsubst_cycle(self):
+        """
+        Check that a cycle of dynamicsubst settings is an error.
+        """
+        db = hammer_config.HammerDatabase()
+        base = hammer_config.load_config_from_string("""
+foo:
+    a: "${foo.b}"
+    a_meta: dynamicsubst
+    b: "${foo.c}-b"
+    b_meta: dynamicsubst
+    c: "${foo.a}-c"
+    c_meta: dynamicsubst
+    d: "fine"
+""", is_yaml=True)
+        db.update_core([base])
         with self.assertRaises(ValueError):
-            print(db.get_config())
+            db.get_config()
+
+    def test_meta_dynamicsubst_incremental(self):
+        """
+        Check that runtime changes only re-resolve the dynamicsubst settings which depend on them.
+        """
+        db = hammer_config.HammerDatabase()
+        base = hammer_config.load_config_from_string("""
+foo:
+    name: "chip"
+    corner: "ss"
+    lib: "${foo.name}_${foo.corner}.lib"
+    lib_meta: dynamicsubst
+    libs: ["${foo.lib}", "${foo.lib}.gz"]
+    libs_meta: dynamicsubst
+    title: "${foo.name}"
+    title_meta: dynamicsubst
+""", is_yaml=True)
+        db.update_core([base])
+        self.assertEqual(db.get_setting("foo.libs"), ["chip_ss.lib", "chip_ss.lib.gz"])
+        self.assertEqual(db.merge_stats.dynamic_keys_resolved, 3)
+
+        db.merge_stats.reset()
+        db.set_setting("foo.corner", "ff")
+        self.assertEqual(db.get_setting("foo.lib"), "chip_ff.lib")
+        self.assertEqual(db.get_setting("foo.libs"), ["chip_ff.lib", "chip_ff.lib.gz"])
+        self.assertEqual(db.get_setting("foo.title"), "chip")
+        self.assertEqual(db.merge_stats.dynamic_keys_resolved, 2)
+
+        # Lower layer changes resolve everything again.
+        db.merge_stats.reset()
+        db.update_project([{"foo.name": "soc"}])
+        self.assertEqual(db.get_setting("foo.libs"), ["soc_ff.lib", "soc_ff.lib.gz"])
+        self.assertEqual(db.get_setting("foo.title"), "soc")
+        self.assertEqual(db.merge_stats.dynamic_keys_resolved, 3)
 
     def test_meta_append(self):
         """
@@ -229,6 +285,202 @@ a.b.c_meta: append
         db.update_environment([])
         self.assertEqual(db.get_setting("a.b.c"), ["test"])
 
+    def test_inputs_not_modified(self) -> None:
+        """
+        Test that merging does not modify the input configs, since unchanged values are shared.
+        """
+        base = {"a.list": ["x"], "a.dict": {"k": "v"}, "a.str": "str"}
+        meta = {"a.list": ["y"], "a.list_meta": "append", "a.sub": "${a.str}", "a.sub_meta": "subst"}
+        combined = hammer_config.combine_configs([base, meta])
+        self.assertEqual(combined["a.list"], ["x", "y"])
+        self.assertEqual(combined["a.sub"], "str")
+        self.assertEqual(base, {"a.list": ["x"], "a.dict": {"k": "v"}, "a.str": "str"})
+        self.assertEqual(meta, {"a.list": ["y"], "a.list_meta": "append", "a.sub": "${a.str}", "a.sub_meta": "subst"})
+        # Untouched values are shared rather than copied.
+        self.assertIs(combined["a.dict"], base["a.dict"])
+
+        # Values returned by get_setting are copies, so changing them does not change the database.
+        db = hammer_config.HammerDatabase()
+        db.update_project([base])
+        db.get_setting("a.list").append("z")
+        db.get_setting("a.dict")["k"] = "changed"
+        self.assertEqual(db.get_setting("a.list"), ["x"])
+        self.assertEqual(db.get_setting("a.dict"), {"k": "v"})
+
+    def test_compact_config(self) -> None:
+        """
+        Test that CompactConfig behaves like a read-only dict and that keys are interned.
+        """
+        config = hammer_config.unpack({"b": {"x": 1}, "a": [1, 2], "c": None})
+        compact = hammer_config.CompactConfig(config)
+        self.assertEqual(compact, config)
+        self.assertEqual(list(compact), ["a", "b.x", "c"])
+        self.assertEqual(list(compact.items()), [("a", [1, 2]), ("b.x", 1), ("c", None)])
+        self.assertEqual(list(compact.values()), [[1, 2], 1, None])
+        self.assertEqual(compact["b.x"], 1)
+        self.assertTrue("c" in compact)
+        self.assertFalse("d" in compact)
+        self.assertFalse(1 in compact)
+        with self.assertRaises(KeyError):
+            compact["d"]
+        self.assertEqual(pickle.loads(pickle.dumps(compact)), compact)
+        self.assertIs(hammer_config.CompactConfig.from_config(compact), compact)
+
+        other = hammer_config.unpack({"b": {"x": 2}})
+        self.assertIs([k for k in other.keys()][0], [k for k in config.keys() if k == "b.x"][0])
+
+        db = hammer_config.HammerDatabase()
+        db.update_core([config])
+        self.assertIsInstance(db.core[0], hammer_config.CompactConfig)
+        self.assertEqual(db.get_setting("b.x"), 1)
+
+    def test_incremental_merge(self) -> None:
+        """
+        Test that changing the runtime settings only re-merges the runtime layer.
+        """
+        db = hammer_config.HammerDatabase()
+        db.update_core([{"a": "core", "b": "core"}])
+        db.update_technology([{"b": "tech", "c": "tech"}])
+        db.update_project([{"c": "project"}])
+        self.assertEqual(db.get_setting("c"), "project")
+        self.assertEqual(db.merge_stats.rebuilds, 1)
+        self.assertEqual(db.merge_stats.layers_merged, len(db.layer_names))
+
+        # No changes means no re-merging.
+        self.assertEqual(db.get_setting("b"), "tech")
+        self.assertEqual(db.merge_stats.rebuilds, 1)
+
+        # Runtime changes only re-merge the runtime layer.
+        db.merge_stats.reset()
+        db.set_setting("a", "runtime")
+        self.assertEqual(db.get_setting("a"), "runtime")
+        self.assertEqual(db.merge_stats.rebuilds, 1)
+        self.assertEqual(db.merge_stats.layers_merged, 1)
+        self.assertEqual(db.merge_stats.keys_merged, 1)
+
+        # Only the prefixes up to project and overlay are cached, so project changes re-merge every layer.
+        db.merge_stats.reset()
+        db.update_project([{"c": "project2", "d": "project2"}])
+        self.assertEqual(db.get_setting("c"), "project2")
+        self.assertEqual(db.get_setting("a"), "runtime")
+        self.assertEqual(db.merge_stats.layers_merged, len(db.layer_names))
+        self.assertEqual(db.merge_stats.keys_merged, 7)
+
+        # Lower layer changes still respect the precedence of the upper layers.
+        db.merge_stats.reset()
+        db.update_core([{"a": "core2", "b": "core2", "e": "core2"}])
+        self.assertEqual(db.get_setting("a"), "runtime")
+        self.assertEqual(db.get_setting("b"), "tech")
+        self.assertEqual(db.get_setting("e"), "core2")
+        self.assertEqual(db.merge_stats.layers_merged, len(db.layer_names))
+        layers = [db.builtins, db.core, db.tools, db.technology, db.environment, db.project, db.overlay,
+                  db.runtime]  # type: List[Sequence[Mapping[str, Any]]]
+        configs = [dict(config) for layer in layers for config in layer]  # type: List[dict]
+        self.assertEqual(db.get_config(), hammer_config.combine_configs(configs))
+
+    def test_overlay(self) -> None:
+        """
+        Test pushing and popping overlays on top of the project config.
+        """
+        db = hammer_config.HammerDatabase()
+        db.update_core([{"a": "core", "b": "core", "libs": ["core"]}])
+        db.update_project([{"b": "project"}])
+        db.set_setting("c", "runtime")
+        self.assertEqual(db.get_setting("b"), "project")
+
+        db.merge_stats.reset()
+        with db.overlay_config({"a": "module", "b": "module", "c": "module", "libs": ["module"], "libs_meta": "append"}):
+            self.assertEqual(db.get_setting("a"), "module")
+            self.assertEqual(db.get_setting("b"), "module")
+            self.assertEqual(db.get_setting("libs"), ["core", "module"])
+            # Runtime settings still take precedence.
+            self.assertEqual(db.get_setting("c"), "runtime")
+            # Only the overlay and runtime layers got merged.
+            self.assertEqual(db.merge_stats.layers_merged, 2)
+
+            db.push_overlay({"a": "nested"})
+            self.assertEqual(db.get_setting("a"), "nested")
+            self.assertEqual(db.get_setting("b"), "module")
+            self.assertEqual(db.pop_overlay()["a"], "nested")
+            self.assertEqual(db.get_setting("a"), "module")
+
+        self.assertEqual(db.get_setting("a"), "core")
+        self.assertEqual(db.get_setting("b"), "project")
+        self.assertEqual(db.get_setting("libs"), ["core"])
+        with self.assertRaises(ValueError):
+            db.pop_overlay()
+
+    def test_profiling(self) -> None:
+        """
+        Test the database profiling mode and its report.
+        """
+        db = hammer_config.HammerDatabase()
+        self.assertIsNone(db.profile)
+
+        report_path = os.path.join(tempfile.mkdtemp(), "profile.json")
+        profile = db.enable_profiling()
+        self.assertIs(db.profile, profile)
+        db.update_core([{"a": "core", "b": "core"}])
+        db.update_project([{"b": "project"}])
+        db.get_setting("a")
+        db.get_setting("a")
+        db.get_setting("b")
+        db.set_setting("a", "runtime")
+        db.get_setting("a")
+        db.get_config()
+
+        self.assertEqual(profile.get_counts, {"a": 3, "b": 1})
+        self.assertEqual(profile.get_config_calls, 1)
+        self.assertEqual([r["layer"] for r in profile.rebuilds], ["core", "runtime"])
+        self.assertEqual(profile.rebuilds[0]["keys_merged"], 3)
+        self.assertEqual(profile.rebuilds[1]["keys_merged"], 1)
+        self.assertGreater(profile.rebuilds[1]["entries_copied"], 0)
+
+        profile.write_report(report_path)
+        with open(report_path, "r") as f:
+            report = json.loads(f.read())
+        self.assertEqual(report["get_setting_calls"], 4)
+        self.assertEqual(report["rebuild_count"], 2)
+        self.assertEqual(report["rebuilds_by_layer"]["runtime"]["count"], 1)
+        self.assertEqual(report["entries_copied"], db.merge_stats.entries_copied)
+
+        # The exit handler is registered once, however many reports are requested.
+        config_src = hammer_config.config_src
+        with mock.patch.object(config_src, "_profile_reports_registered", False), \
+                mock.patch.dict(config_src._profile_reports, clear=True), \
+                mock.patch("atexit.register") as register:
+            db.enable_profiling(report_path)
+            hammer_config.HammerDatabase().enable_profiling(report_path + ".2")
+            db.enable_profiling(report_path)
+            register.assert_called_once_with(config_src._write_profile_reports)
+            os.remove(report_path)
+            config_src._write_profile_reports()
+            self.assertTrue(os.path.isfile(report_path))
+            self.assertTrue(os.path.isfile(report_path + ".2"))
+        shutil.rmtree(os.path.dirname(report_path))
+
+    def test_prefix_queries(self) -> None:
+        """
+        Test the prefix index, including after runtime changes.
+        """
+        db = hammer_config.HammerDatabase()
+        db.update_core([{"vlsi.inputs.a": 1, "vlsi.inputs.b": None, "vlsi.inputsx": 2, "vlsi.core.c": 3,
+                         "synthesis.tool.version": "1.0"}])
+        self.assertEqual(list(db.keys_with_prefix("vlsi.inputs")), ["vlsi.inputs.a", "vlsi.inputs.b", "vlsi.inputsx"])
+        self.assertEqual(db.get_settings_with_prefix("vlsi.inputs."), {"vlsi.inputs.a": 1, "vlsi.inputs.b": "null"})
+        self.assertEqual(list(db.iter_namespace("vlsi.inputs", nullvalue=None)), [("a", 1), ("b", None)])
+        self.assertEqual(db.get_settings_with_prefix("nothing."), {})
+
+        db.set_setting("vlsi.inputs.0", 0)
+        db.set_setting("vlsi.inputs.a", 10)
+        self.assertEqual(db.get_settings_with_prefix("vlsi.inputs."),
+                         {"vlsi.inputs.0": 0, "vlsi.inputs.a": 10, "vlsi.inputs.b": "null"})
+
+        db.update_project([{"vlsi.inputs.c": "c"}])
+        self.assertEqual(list(db.keys_with_prefix("vlsi.inputs.")),
+                         ["vlsi.inputs.0", "vlsi.inputs.a", "vlsi.inputs.b", "vlsi.inputs.c"])
+        self.assertEqual(list(db.keys_with_prefix("")), sorted(db.get_config().keys()))
+
     def test_meta_prependlocal(self):
         """
         Test that the meta attribute "prependlocal" works.
@@ -362,6 +614,49 @@ food:
 
         self.assertEqual(db.get_setting("food.announcement"), file_contents_sol)
 
+    def test_meta_transclude_lazy(self):
+        """
+        Test that transcluded values are lazy handles which are dumped by reference.
+        """
+        file_contents = "set x 1\nset y 2\n"
+        fd, path = tempfile.mkstemp(".tcl")
+        with open(path, "w") as f:
+            f.write(file_contents)
+
+        db = hammer_config.HammerDatabase()
+        db.update_core([{"tcl.snippet": path, "tcl.snippet_meta": "transclude"}])
+        db.update_project([{"other": "value"}])
+
+        handle = db.get_unresolved_config()["tcl.snippet"]
+        self.assertIsInstance(handle, hammer_config.TranscludedValue)
+        self.assertEqual(db.get_setting("tcl.snippet"), file_contents)
+        self.assertEqual(db.get_config()["tcl.snippet"], file_contents)
+        # Re-merging keeps the same handle instead of re-reading the file.
+        db.set_setting("other", "value2")
+        db.update_technology([])
+        self.assertIs(db.get_unresolved_config()["tcl.snippet"], handle)
+
+        # Dumping by reference gives the same settings once loaded back.
+        dumped = json.loads(db.get_database_json(transclude_by_reference=True))
+        self.assertEqual(dumped["tcl.snippet"], os.path.abspath(path))
+        db2 = hammer_config.HammerDatabase()
+        db2.update_project([dumped])
+        self.assertEqual(db2.get_config(), db.get_config())
+
+        fd, snapshot_path = tempfile.mkstemp(".hdb")
+        hammer_config.write_snapshot(db.get_unresolved_config(), snapshot_path)
+        with hammer_config.HammerDatabaseSnapshot(snapshot_path) as snapshot:
+            self.assertEqual(snapshot.get_setting("tcl.snippet"), file_contents)
+
+        # Once the file is gone, the contents get dumped instead.
+        os.remove(path)
+        self.assertEqual(db.get_setting("tcl.snippet"), file_contents)
+        self.assertEqual(json.loads(db.get_database_json(transclude_by_reference=True)), db.get_config())
+        hammer_config.write_snapshot(db.get_unresolved_config(), snapshot_path)
+        with hammer_config.HammerDatabaseSnapshot(snapshot_path) as snapshot:
+            self.assertEqual(snapshot.get_setting("tcl.snippet"), file_contents)
+        os.remove(snapshot_path)
+
     def test_meta_as_array_1(self):
         """
         Test that meta attributes that are an array.
@@ -444,5 +739,216 @@ foo:
         with self.assertRaises(TypeError):
             s.split(2)
 
+
+class LoadConfigFromPathsTest(unittest.TestCase):
+
+    def test_backends(self) -> None:
+        """
+        Test that all the loading backends keep the precedence order and error behaviour.
+        """
+        tmpdir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i in range(6):
+                ext = ".json" if i % 2 == 0 else ".yml"
+                path = os.path.join(tmpdir, "config{i}{ext}".format(i=i, ext=ext))
+                with open(path, "w") as f:
+                    f.write('{"index": %d}' % i)
+                paths.append(path)
+            missing = os.path.join(tmpdir, "missing.yml")
+
+            for backend in ["serial", "thread", "process"]:
+                configs = hammer_config.load_config_from_paths(paths, backend=backend)
+                # .yml files first, then .json files, each in argument order.
+                self.assertEqual([c["index"] for c in configs], [1, 3, 5, 0, 2, 4])
+                self.assertEqual(hammer_config.load_config_from_paths(paths + [missing], backend=backend)[3], {})
+                with self.assertRaises(FileNotFoundError):
+                    hammer_config.load_config_from_paths(paths + [missing], strict=True, backend=backend)
+
+            # A parse error in a later file raises the same error as loading the files one by one.
+            bad = os.path.join(tmpdir, "bad.json")
+            with open(bad, "w") as f:
+                f.write('{"index": ')
+            bad_paths = paths[:3] + [bad] + paths[3:]
+            with self.assertRaises(ValueError) as serial_error:
+                hammer_config.load_config_from_paths(bad_paths, backend="serial")
+            for backend in ["thread", "process"]:
+                with self.assertRaises(ValueError) as backend_error:
+                    hammer_config.load_config_from_paths(bad_paths, backend=backend)
+                self.assertEqual(type(backend_error.exception), type(serial_error.exception))
+                self.assertEqual(str(backend_error.exception), str(serial_error.exception))
+
+            with self.assertRaises(ValueError):
+                hammer_config.load_config_from_paths(paths, backend="bogus")
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+class HammerDatabaseSnapshotTest(unittest.TestCase):
+
+    def test_roundtrip(self) -> None:
+        """
+        Test that a snapshot returns the same settings as the database it was written from.
+        """
+        db = hammer_config.HammerDatabase()
+        db.update_core([{"b.list": ["x", "y"], "a.str": "str", "c.null": None, "d.num": 1.5,
+                         "e.unicode": "\u00b5m", "\u00e9.key": {"nested": [1, 2]}}])
+        fd, path = tempfile.mkstemp(suffix=".hdb")
+        os.close(fd)
+        try:
+            hammer_config.write_snapshot(db.get_config(), path)
+            self.assertTrue(hammer_config.is_snapshot(path))
+            # Readable by others, like the JSON dump.
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+            with hammer_config.HammerDatabaseSnapshot(path) as snapshot:
+                self.assertEqual(len(snapshot), len(db.get_config()))
+                self.assertEqual(list(snapshot.keys()), sorted(db.get_config().keys(), key=lambda k: k.encode("utf-8")))
+                for key in db.get_config():
+                    self.assertTrue(snapshot.has_setting(key))
+                    self.assertEqual(snapshot.get_setting(key), db.get_setting(key))
+                self.assertEqual(snapshot.get_setting("c.null", nullvalue="nil"), "nil")
+                self.assertEqual(snapshot.get_settings_with_prefix("b."), {"b.list": ["x", "y"]})
+                self.assertEqual(list(snapshot.keys_with_prefix("c")), ["c.null"])
+                self.assertEqual(list(snapshot.keys_with_prefix("z")), [])
+                self.assertFalse("a" in snapshot)
+                self.assertFalse("zzz" in snapshot)
+                with self.assertRaises(KeyError):
+                    snapshot.get_setting("a.missing")
+        finally:
+            os.remove(path)
+
+    def test_empty_and_invalid(self) -> None:
+        """
+        Test empty snapshots and files which are not snapshots.
+        """
+        fd, path = tempfile.mkstemp(suffix=".hdb")
+        os.close(fd)
+        try:
+            hammer_config.write_snapshot({}, path)
+            with hammer_config.HammerDatabaseSnapshot(path) as snapshot:
+                self.assertEqual(len(snapshot), 0)
+                self.assertFalse(snapshot.has_setting("a"))
+            with open(path, "w") as f:
+                f.write('{"a": 1, "b": 2, "c": 3, "d": 4}')
+            self.assertFalse(hammer_config.is_snapshot(path))
+            with self.assertRaises(ValueError):
+                hammer_config.HammerDatabaseSnapshot(path)
+        finally:
+            os.remove(path)
+
+
+class ConfigServerTest(unittest.TestCase):
+
+    def test_server(self) -> None:
+        """
+        Test querying a config server, including reloading after the database changes.
+        """
+        tmpdir = tempfile.mkdtemp()
+        db_path = os.path.join(tmpdir, "db.json")
+        socket_path = os.path.join(tmpdir, "config.sock")
+        with open(db_path, "w") as f:
+            f.write(json.dumps({"a.str": "str", "a.list": [1, 2], "b.null": None}))
+
+        server = hammer_config.ConfigServer(db_path, socket_path)
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+        thread.start()
+        try:
+            with self.assertRaises(ValueError):
+                hammer_config.ConfigServer(db_path, socket_path)
+            client = hammer_config.ConfigServerClient.connect(socket_path)
+            assert client is not None
+            with client:
+                self.assertEqual(client.db_location(), db_path)
+                self.assertEqual(client.get_setting("a.str"), "str")
+                self.assertEqual(client.get_setting("a.list"), [1, 2])
+                self.assertEqual(client.get_setting("b.null"), "null")
+                self.assertEqual(client.get_setting("b.null", nullvalue=""), "")
+                self.assertEqual(client.get_settings_with_prefix("a."), {"a.str": "str", "a.list": [1, 2]})
+                with self.assertRaises(KeyError):
+                    client.get_setting("missing")
+
+                with open(db_path, "w") as f:
+                    f.write(json.dumps({"a.str": "changed"}))
+                os.utime(db_path, ns=(0, 0))
+                self.assertEqual(client.get_setting("a.str"), "changed")
+                self.assertEqual(server.loads, 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+        self.assertFalse(os.path.exists(socket_path))
+        self.assertIsNone(hammer_config.ConfigServerClient.connect(socket_path))
+        shutil.rmtree(tmpdir)
+
+
+class HammerConfigCacheTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = hammer_config.ConfigParseCache(os.path.join(self.tmpdir, "cache"))
+        hammer_config.set_config_cache(self.cache)
+
+    def tearDown(self) -> None:
+        hammer_config.set_config_cache(None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_hits_and_misses(self) -> None:
+        """
+        Test that repeated loads hit the cache and that modified files miss it.
+        """
+        path = os.path.join(self.tmpdir, "config.yml")
+        with open(path, "w") as f:
+            f.write("foo:\n  bar: 1\n  baz: [a, b]\n")
+        first = hammer_config.load_config_from_file(path)
+        self.assertEqual(self.cache.stats.misses, 1)
+        second = hammer_config.load_config_from_file(path)
+        self.assertEqual(self.cache.stats.hits, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second, {"foo.bar": 1, "foo.baz": ["a", "b"],
+                                  hammer_config.CONFIG_PATH_KEY: self.tmpdir})
+        # Loaded configs are independent copies.
+        second["foo.baz"].append("c")
+        self.assertEqual(hammer_config.load_config_from_file(path)["foo.baz"], ["a", "b"])
+
+        with open(path, "w") as f:
+            f.write("foo:\n  bar: 2\n  baz: [a, b]\n")
+        self.assertEqual(hammer_config.load_config_from_file(path)["foo.bar"], 2)
+        self.assertEqual(self.cache.stats.misses, 2)
+
+    def test_eviction(self) -> None:
+        """
+        Test that the cache stays under its size limit.
+        """
+        self.cache.max_bytes = 0
+        path = os.path.join(self.tmpdir, "config.json")
+        with open(path, "w") as f:
+            f.write('{"foo": 1}')
+        hammer_config.load_config_from_file(path)
+        hammer_config.load_config_from_file(path)
+        self.assertEqual(self.cache.stats.hits, 0)
+        self.assertEqual(self.cache.stats.misses, 2)
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertEqual(os.listdir(self.cache.cache_dir), [])
+
+    def test_json_entries(self) -> None:
+        """
+        Test that entries are stored as JSON and that invalid entries are treated as misses.
+        """
+        path = os.path.join(self.tmpdir, "config.json")
+        with open(path, "w") as f:
+            f.write('{"foo": {"bar": [1, 2]}}')
+        hammer_config.load_config_from_file(path)
+        entries = os.listdir(self.cache.cache_dir)
+        self.assertEqual(len(entries), 1)
+        entry = os.path.join(self.cache.cache_dir, entries[0])
+        with open(entry, "r") as f:
+            self.assertEqual(json.load(f), {"foo.bar": [1, 2]})
+
+        with open(entry, "wb") as f:
+            f.write(b"\x80\x04not json")
+        self.assertEqual(hammer_config.load_config_from_file(path)["foo.bar"], [1, 2])
+        self.assertEqual(self.cache.stats.misses, 2)
+        self.assertEqual(self.cache.stats.hits, 0)
+
 if __name__ == '__main__':
     unittest.main()